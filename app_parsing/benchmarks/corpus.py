@@ -0,0 +1,219 @@
+# cv parsing 2/app_parsing/benchmarks/corpus.py
+
+import argparse
+import json
+import random
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+from xml.sax.saxutils import escape
+
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Camille", "Noah", "Lea", "Hugo", "Ines", "Louis", "Chloe", "Adam", "Emma")
+LAST_NAMES = ("Martin", "Bernard", "Dubois", "Durand", "Lefevre", "Moreau", "Laurent", "Simon", "Michel", "Garcia")
+TITLES = ("Software Engineer", "Senior Software Engineer", "Data Engineer", "Data Scientist", "DevOps Engineer",
+          "Product Manager", "Talent Specialist", "Backend Developer")
+COMPANIES = ("TechCorp", "DataWorks", "FinLab", "CloudNine", "Retailio", "MedSoft", "GreenGrid", "PayStream")
+INDUSTRIES = ("FinTech", "Retail", "Healthcare", "Energy", "SaaS", "Consulting")
+TECHNICAL_SKILLS = ("Python", "AWS", "Docker", "Kubernetes", "SQL", "Java", "Go", "React", "Terraform", "Spark",
+                    "Airflow", "PostgreSQL", "Microservices", "TypeScript", "Kafka", "Pandas")
+SOFT_SKILLS = ("Communication", "Leadership", "Teamwork", "Problem Solving", "Mentoring", "Ownership")
+SENIORITY = ("Junior", "Mid", "Senior", "Executive")
+FORMATS = (".pdf", ".docx", ".txt")
+ACHIEVEMENTS = (
+    "Reduced infrastructure costs by {n}% by moving batch jobs to spot instances",
+    "Led a team of {n} engineers to deliver a payments platform on schedule",
+    "Cut API latency by {n}% with caching and query tuning",
+    "Automated {n} manual reporting workflows, saving two days per month",
+    "Migrated {n} services to Kubernetes with zero downtime",
+)
+
+
+def synthetic_resume(rng: random.Random, experiences: int = 3) -> Dict[str, Any]:
+    """Builds a parsed resume with the layout PROMPT_TEMPLATE asks for."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    title = rng.choice(TITLES)
+    years = rng.randint(1, 20)
+    work = []
+    for index in range(experiences):
+        start = 2023 - years + index * max(1, years // max(1, experiences))
+        work.append({
+            "Title": title if index == 0 else rng.choice(TITLES),
+            "Company": rng.choice(COMPANIES),
+            "Company Industry": rng.choice(INDUSTRIES),
+            "Location": "Paris, France",
+            "Period": {"Start Date": f"{start}-0{rng.randint(1, 9)}", "End Date": "Present" if index == 0 else
+                       f"{start + 1}-0{rng.randint(1, 9)}"},
+            "Achievements": [rng.choice(ACHIEVEMENTS).format(n=rng.randint(2, 60)) for _ in range(2)],
+            "Technologies Used": rng.sample(TECHNICAL_SKILLS, 3),
+            "Management Scope": {"Team Size": rng.choice((None, 3, 8)), "Budget Responsibility": None}
+        })
+    return {
+        "Full Name": name,
+        "Professional Title": title,
+        "Contact Information": {
+            "Email": f"{name.lower().replace(' ', '.')}@example.com",
+            "Phone": f"+33 6 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+            "LinkedIn": f"https://www.linkedin.com/in/{name.lower().replace(' ', '-')}",
+            "Location": "Paris, France"
+        },
+        "Professional Summary": {
+            "Executive Summary": f"{title} with {years} years of experience building reliable products.",
+            "Years of Experience": years,
+            "Industry Focus": rng.sample(INDUSTRIES, 2)
+        },
+        "Work Experience": work,
+        "Education": [{"Degree": "MSc", "Field of Study": "Computer Science", "Institution": "Sorbonne University",
+                       "Location": "Paris", "Graduation Date": str(2023 - years), "GPA": None}],
+        "Skills": {
+            "Technical Skills": rng.sample(TECHNICAL_SKILLS, rng.randint(3, 8)),
+            "Soft Skills": rng.sample(SOFT_SKILLS, 3),
+            "Languages": [{"Language": "English", "Proficiency": "Fluent"},
+                          {"Language": "French", "Proficiency": "Native"}]
+        },
+        "Certifications": [{"Name": "AWS Certified Developer", "Issuer": "Amazon", "Date": "2021-06",
+                            "Expiry": "2024-06"}],
+        "HR Evaluation": {
+            "Key Strengths": ["Delivery", "Ownership", "Collaboration"],
+            "Potential Roles": [title],
+            "Seniority Level": SENIORITY[min(3, years // 5)],
+            "Cultural Indicators": ["Collaborative"],
+            "Development Areas": ["Public speaking"]
+        }
+    }
+
+
+def resume_lines(resume: Dict[str, Any], target_words: int, rng: random.Random) -> List[str]:
+    """Renders a resume as plain text lines of roughly target_words words."""
+    contact = resume["Contact Information"]
+    lines = [resume["Full Name"], resume["Professional Title"],
+             f"{contact['Email']} | {contact['Phone']} | {contact['LinkedIn']}", "",
+             "SUMMARY", resume["Professional Summary"]["Executive Summary"], "", "EXPERIENCE"]
+    for job in resume["Work Experience"]:
+        lines.append(f"{job['Title']} - {job['Company']} ({job['Period']['Start Date']} to {job['Period']['End Date']})")
+        lines.extend(f"- {achievement}" for achievement in job["Achievements"])
+        lines.append(f"Technologies: {', '.join(job['Technologies Used'])}")
+    lines += ["", "SKILLS", ", ".join(resume["Skills"]["Technical Skills"] + resume["Skills"]["Soft Skills"]),
+              "", "EDUCATION", "MSc Computer Science, Sorbonne University"]
+    words = sum(len(line.split()) for line in lines)
+    while words < target_words:
+        line = f"- {rng.choice(ACHIEVEMENTS).format(n=rng.randint(2, 60))}"
+        lines.insert(len(lines) - 6, line)
+        words += len(line.split())
+    return lines
+
+
+def write_txt(path: Path, lines: Sequence[str]) -> None:
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def write_docx(path: Path, lines: Sequence[str]) -> None:
+    """Writes a minimal WordprocessingML document, one paragraph per line."""
+    paragraphs = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>" for line in lines)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{paragraphs}</w:body></w:document>'))
+
+
+def write_pdf(path: Path, lines: Sequence[str], lines_per_page: int = 50) -> None:
+    """Writes a text-only PDF (Helvetica, Latin-1) with a correct xref table."""
+    def pdf_text(line: str) -> str:
+        line = line.encode("latin-1", "replace").decode("latin-1")
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    font_id = 3 + 2 * len(pages)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] "
+               f"/Count {len(pages)} >>"]
+    for index, page in enumerate(pages):
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({pdf_text(line)}) Tj T*" for line in page) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * index} 0 R >>")
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    body = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{content}\nendobj\n".encode("latin-1")
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(body))
+
+
+WRITERS = {".pdf": write_pdf, ".docx": write_docx, ".txt": write_txt}
+
+
+def generate_corpus(output_dir: Union[str, Path], count: int = 50, formats: Sequence[str] = FORMATS,
+                    words: int = 400, seed: Optional[int] = 0) -> List[Path]:
+    """Writes a synthetic CV corpus, cycling through the given formats.
+
+    Args:
+        output_dir: Directory of the generated files
+        count: Number of CVs
+        formats: File extensions to generate (.pdf, .docx, .txt)
+        words: Approximate number of words per CV
+        seed: Random seed, so that a corpus can be regenerated identically
+
+    Returns:
+        List[Path]: Paths of the generated files
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(count):
+        extension = formats[index % len(formats)]
+        resume = synthetic_resume(rng)
+        path = output_dir / f"cv_{index:05d}{extension}"
+        WRITERS[extension](path, resume_lines(resume, words, rng))
+        paths.append(path)
+    return paths
+
+
+def write_parsed_resumes(output_path: Union[str, Path], count: int = 100, seed: Optional[int] = 0) -> Path:
+    """Writes a parsed_resumes.json of synthetic successful parses, for email benchmarks."""
+    rng = random.Random(seed)
+    resumes = []
+    for index in range(count):
+        resume = synthetic_resume(rng)
+        resume["_metadata"] = {"filename": f"cv_{index:05d}.txt", "source_path": f"cv_{index:05d}.txt",
+                               "file_type": ".txt", "success": True}
+        resumes.append(resume)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w") as f:
+        json.dump({"resumes": resumes, "statistics": {}}, f)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CV corpus for benchmarks.")
+    parser.add_argument("output_dir", help="Directory of the generated CVs")
+    parser.add_argument("--count", type=int, default=50, help="Number of CVs")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated extensions to cycle through")
+    parser.add_argument("--words", type=int, default=400, help="Approximate words per CV")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    cli_args = parser.parse_args()
+    written = generate_corpus(cli_args.output_dir, cli_args.count, cli_args.formats.split(","), cli_args.words,
+                              cli_args.seed)
+    print(f"Wrote {len(written)} CVs to {cli_args.output_dir}")
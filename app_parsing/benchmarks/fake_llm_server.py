@@ -0,0 +1,250 @@
+# cv parsing 2/app_parsing/benchmarks/fake_llm_server.py
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from app_parsing.benchmarks.corpus import synthetic_resume
+from app_parsing.services.compact_schema import CompactSchema
+from app_parsing.utils.json_repair import repair_json
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+PACKED_RESUME_RE = re.compile(r"^=== RESUME (\S+) ===", re.MULTILINE)
+
+
+@dataclass
+class FakeLLMConfig:
+    """Behaviour of the stub server.
+
+    Attributes:
+        latency (str): Distribution of the base latency, one of LATENCY_DISTRIBUTIONS
+        latency_mean (float): Mean base latency in seconds
+        latency_sigma (float): Spread: half-width for "uniform", sigma of the
+            underlying normal for "lognormal"
+        seconds_per_output_token (float): Generation time added per completion token
+        rate_429 (float): Fraction of requests answered with HTTP 429
+        rate_malformed (float): Fraction of answers sent as fenced JSON with a
+            trailing comma, to exercise JSON repair
+        retry_after (float): Retry-After header of 429 responses, in seconds
+        completion_tokens (Optional[int]): Reported completion tokens, estimated
+            from the response length when None
+        model (str): Model name reported in responses to requests naming none
+        seed (Optional[int]): Random seed of latencies, 429s and generated content
+    """
+    latency: str = "lognormal"
+    latency_mean: float = 0.5
+    latency_sigma: float = 0.5
+    seconds_per_output_token: float = 0.0
+    rate_429: float = 0.0
+    rate_malformed: float = 0.0
+    retry_after: float = 1.0
+    completion_tokens: Optional[int] = None
+    model: str = "gpt-3.5-turbo-0125"
+    seed: Optional[int] = 0
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeLLM:
+    """Answers chat completion requests like the prompts of this project expect.
+
+    Parse prompts get a synthetic resume (a JSON array of them for packed
+    prompts, the compact layout for compact prompts), email prompts a valid email JSON and skeleton prompts an email
+    with slots. Counters of what was served are kept for the benchmark report.
+    """
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.malformed = 0
+        self.completion_tokens = 0
+
+    def _random(self) -> Tuple[float, float, random.Random]:
+        with self._lock:
+            return self._rng.random(), self._base_latency(), random.Random(self._rng.random())
+
+    def _base_latency(self) -> float:
+        config, rng = self.config, self._rng
+        if config.latency == "fixed":
+            return config.latency_mean
+        if config.latency == "uniform":
+            return max(0.0, rng.uniform(config.latency_mean - config.latency_sigma,
+                                        config.latency_mean + config.latency_sigma))
+        if config.latency == "exponential":
+            return rng.expovariate(1 / config.latency_mean) if config.latency_mean > 0 else 0.0
+        # Lognormal with the requested mean
+        mu = -config.latency_sigma ** 2 / 2
+        return config.latency_mean * rng.lognormvariate(mu, config.latency_sigma)
+
+    def content_for(self, prompt: str, rng: random.Random) -> str:
+        if "Fix the syntax only" in prompt:
+            return repair_json(prompt.split("Text:\n", 1)[-1])
+        if "=== RESUME" in prompt:
+            return json.dumps([{"resume_id": resume_id, "data": synthetic_resume(rng)}
+                               for resume_id in PACKED_RESUME_RE.findall(prompt)])
+        if "Compact form:" in prompt:
+            return json.dumps(CompactSchema.compress(synthetic_resume(rng)))
+        if "Applicant Tracking System" in prompt:
+            return json.dumps(synthetic_resume(rng))
+        if "{first_name}" in prompt:
+            return json.dumps({
+                "subject_line": "Exciting opportunity for {first_name}",
+                "email_body": "Hey {first_name} 👋\n\nI noticed your work as {current_title} at {current_company} "
+                              "and your skills in {top_skills}.\n\n{achievement}\n\nBest regards,\nRecruiter"
+            }, ensure_ascii=False)
+        return json.dumps({
+            "subject_line": "Exciting opportunity at TechCorp😊",
+            "email_body": "Hey there 👋\n\nI noticed your strong background.\n\nLet's talk.\n\nBest regards,\nRecruiter",
+            "personalization_points": ["Experience", "Achievements", "Skills"],
+            "highlight_skills": ["Python", "AWS", "Docker"]
+        }, ensure_ascii=False)
+
+    def complete(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any], float, Dict[str, str]]:
+        """Builds a response.
+
+        Returns:
+            tuple: (HTTP status, JSON body, seconds to wait before answering, extra headers)
+        """
+        draw, latency, rng = self._random()
+        with self._lock:
+            self.requests += 1
+            if draw < self.config.rate_429:
+                self.rate_limited += 1
+                return 429, {"error": {"message": "Rate limit reached (fake server)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}}, 0.0, \
+                    {"retry-after": str(self.config.retry_after)}
+
+        prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+        content = self.content_for(prompt, rng)
+        if rng.random() < self.config.rate_malformed:
+            content = "```json\n" + content[:-1] + "," + content[-1] + "\n```"
+            with self._lock:
+                self.malformed += 1
+        completion_tokens = self.config.completion_tokens or _estimate_tokens(content)
+        prompt_tokens = _estimate_tokens(prompt)
+        with self._lock:
+            self.completion_tokens += completion_tokens
+        latency += completion_tokens * self.config.seconds_per_output_token
+        return 200, {
+            "id": f"chatcmpl-fake-{rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model") or self.config.model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }, latency, {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "rate_limited": self.rate_limited, "malformed": self.malformed,
+                    "completion_tokens": self.completion_tokens, "config": asdict(self.config)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        status, payload, delay, headers = self.server.llm.complete(request)
+        time.sleep(delay)
+        self._send(status, payload, headers)
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLLMServer:
+    """OpenAI-compatible stub server running on a background thread.
+
+    Point the client at it with ``OPENAI_BASE_URL=server.base_url``.
+
+    Usage:
+        with FakeLLMServer(FakeLLMConfig(latency_mean=0.2)) as server:
+            ...
+    """
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.llm = FakeLLM(config or FakeLLMConfig())
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.llm = self.llm
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an OpenAI-compatible stub server for benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mean base latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--seconds-per-token", type=float, default=0.0, help="Added per completion token")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="Fraction of answers with broken JSON")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="Reported completion tokens")
+    cli_args = parser.parse_args()
+    server = FakeLLMServer(FakeLLMConfig(
+        latency=cli_args.latency,
+        latency_mean=cli_args.latency_mean,
+        latency_sigma=cli_args.latency_sigma,
+        seconds_per_output_token=cli_args.seconds_per_token,
+        rate_429=cli_args.rate_429,
+        rate_malformed=cli_args.rate_malformed,
+        completion_tokens=cli_args.completion_tokens
+    ), port=cli_args.port)
+    print(f"Fake LLM listening on {server.base_url} (set OPENAI_BASE_URL to it)")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,271 @@
+# cv parsing 2/app_parsing/benchmarks/throughput.py
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+OUTPUT_DIR = PROJECT_ROOT / "app_parsing" / "data" / "output" / "benchmarks"
+
+BENCHMARK_ROLE = {
+    "title": "Senior Software Engineer",
+    "company": "TechCorp",
+    "requirements": {
+        "must_have": ["Python", "AWS"],
+        "nice_to_have": ["Microservices", "Docker"],
+        "experience_level": "3-5 years",
+    },
+    "culture": "Fast-paced, innovative startup environment",
+    "team_size": "10-15 people",
+    "remote_policy": "Hybrid",
+    "industry": "FinTech"
+}
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process and of its finished children."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * unit / (1024 * 1024), 1)
+
+
+def _parse_metrics(output_path: Path) -> Dict[str, Any]:
+    from app_parsing.utils.jsonl import read_summary
+
+    statistics = read_summary(output_path)["statistics"]
+    api_usage = statistics["api_usage"]
+    total = statistics["total_processed"]
+    return {
+        "items": total,
+        "successful": statistics["successful"],
+        "api_calls": api_usage["total_api_calls"],
+        "output_tokens_per_item": round(api_usage["output_tokens"] / total, 1) if total else 0,
+        "latency_p95_seconds": api_usage["latency_seconds"].get("parse", {}).get("p95")
+    }
+
+
+def _parse_scenario(engine: str, compact: bool = False) -> Callable[[Dict[str, Any], Path], Dict[str, Any]]:
+    def run(settings: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+        from app_parsing.services.compact_schema import CompactSchema
+        from app_parsing.services.resume_processor import process_resumes, process_resumes_async
+
+        paths = [str(path) for path in sorted(Path(settings["corpus_dir"]).iterdir())]
+        output_path = workdir / "parsed_resumes.json"
+        if engine == "threaded":
+            output_path = process_resumes(paths, str(output_path), max_workers=settings["llm_workers"],
+                                          compact_schema=CompactSchema() if compact else None)
+        elif engine == "async":
+            output_path = asyncio.run(process_resumes_async(paths, str(output_path),
+                                                            concurrency=settings["concurrency"]))
+        else:
+            from app_parsing.services.pipeline import process_resumes_pipelined
+
+            output_path = process_resumes_pipelined(paths, str(output_path), llm_workers=settings["llm_workers"])
+        return _parse_metrics(Path(output_path))
+    return run
+
+
+def _email_scenario(concurrency_setting: Optional[str], mode: str = "full") -> Callable:
+    def run(settings: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+        from app_parsing.services.email_personalizer import EmailPersonalizer
+        from app_parsing.utils.jsonl import read_summary
+
+        output_dir = workdir / "emails"
+        EmailPersonalizer(cache_dir=None).process_batch(
+            settings["parsed_resumes"], BENCHMARK_ROLE, output_dir=str(output_dir),
+            concurrency=settings[concurrency_setting] if concurrency_setting else 1, mode=mode
+        )
+        statistics = read_summary(next(output_dir.glob("generated_emails_*.json")))["statistics"]
+        api_usage = statistics["api_usage"]
+        return {
+            "items": statistics["successful"],
+            "successful": statistics["successful"],
+            "api_calls": api_usage["total_api_calls"],
+            "latency_p95_seconds": api_usage["latency_seconds"].get("email", {}).get("p95")
+        }
+    return run
+
+
+# Name -> (unit of the throughput, runner)
+SCENARIOS: Dict[str, tuple] = {
+    "parse_threaded": ("cvs", _parse_scenario("threaded")),
+    "parse_async": ("cvs", _parse_scenario("async")),
+    "parse_pipelined": ("cvs", _parse_scenario("pipelined")),
+    "parse_compact": ("cvs", _parse_scenario("threaded", compact=True)),
+    "email_serial": ("emails", _email_scenario(None)),
+    "email_concurrent": ("emails", _email_scenario("concurrency")),
+    "email_hybrid": ("emails", _email_scenario("concurrency", mode="hybrid")),
+}
+
+
+def run_scenario(name: str, settings: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    """Runs one scenario in this process and measures it.
+
+    Meant to run in a fresh interpreter (see measure) so that peak memory
+    belongs to the scenario alone.
+    """
+    unit, runner = SCENARIOS[name]
+    start = time.perf_counter()
+    metrics = runner(settings, workdir)
+    seconds = time.perf_counter() - start
+    return {
+        **metrics,
+        "seconds": round(seconds, 3),
+        f"{unit}_per_sec": round(metrics["items"] / seconds, 3) if seconds else 0,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def measure(name: str, settings: Dict[str, Any], base_url: str, workdir: Path) -> Dict[str, Any]:
+    """Runs a scenario in a subprocess pointed at the fake server."""
+    workdir.mkdir(parents=True, exist_ok=True)
+    result_file = workdir / "result.json"
+    env = {**os.environ, "OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "sk-benchmark",
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")]))}
+    process = subprocess.run(
+        [sys.executable, "-m", "app_parsing.benchmarks.throughput", "--run-scenario", name,
+         "--settings", json.dumps(settings), "--result-file", str(result_file)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if process.returncode != 0 or not result_file.exists():
+        print(f"Warning: scenario {name} failed (exit code {process.returncode})")
+        print(process.stderr[-2000:])
+        return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "no result"}
+    with result_file.open("r") as f:
+        return json.load(f)
+
+
+def run_benchmark(scenarios: List[str], settings: Dict[str, Any], server_config: Dict[str, Any],
+                  baseline: Optional[str] = None) -> Path:
+    """Generates the inputs, starts the fake server, runs every scenario and saves the results.
+
+    Args:
+        scenarios: Keys of SCENARIOS to run
+        settings: Corpus and engine settings (count, words, formats, llm_workers, concurrency, emails)
+        server_config: Keyword arguments of FakeLLMConfig
+        baseline: Previous results file to compare against
+
+    Returns:
+        Path: Path of the saved results file
+    """
+    from app_parsing.benchmarks.corpus import generate_corpus, write_parsed_resumes
+    from app_parsing.benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "settings": settings,
+        "server": server_config,
+        "scenarios": {}
+    }
+    with tempfile.TemporaryDirectory(prefix="cv_benchmark_") as tmp:
+        tmp = Path(tmp)
+        run_settings = dict(settings)
+        if any(name.startswith("parse") for name in scenarios):
+            generate_corpus(tmp / "corpus", settings["count"], settings["formats"], settings["words"])
+            run_settings["corpus_dir"] = str(tmp / "corpus")
+        if any(name.startswith("email") for name in scenarios):
+            run_settings["parsed_resumes"] = str(write_parsed_resumes(tmp / "parsed_resumes.json",
+                                                                      settings["emails"]))
+        for name in scenarios:
+            with FakeLLMServer(FakeLLMConfig(**server_config)) as server:
+                result = measure(name, run_settings, server.base_url, tmp / name)
+                result["server"] = {key: value for key, value in server.llm.get_stats().items() if key != "config"}
+            results["scenarios"][name] = result
+
+    previous = {}
+    if baseline:
+        with open(baseline, "r") as f:
+            previous = json.load(f).get("scenarios", {})
+
+    print("\n=== THROUGHPUT REPORT ===")
+    print("-" * 50)
+    for name, stats in results["scenarios"].items():
+        if "error" in stats:
+            print(f"{name:18}: failed ({stats['error']})")
+            continue
+        unit = SCENARIOS[name][0]
+        rate = stats[f"{unit}_per_sec"]
+        line = (f"{name:18}: {rate:8.2f} {unit}/s, p95 {stats['latency_p95_seconds'] or 0:.2f}s, "
+                f"peak RSS {stats['peak_rss_mb']:.0f} MB, {stats['api_calls']} calls")
+        if "output_tokens_per_item" in stats:
+            line += f", {stats['output_tokens_per_item']:.0f} output tokens/CV"
+        full_layout = results["scenarios"].get("parse_threaded", {})
+        if name == "parse_compact" and full_layout.get("output_tokens_per_item"):
+            stats["output_token_reduction"] = round(
+                1 - stats["output_tokens_per_item"] / full_layout["output_tokens_per_item"], 3)
+            line += f" ({stats['output_token_reduction']:.0%} fewer than parse_threaded)"
+        if f"{unit}_per_sec" in previous.get(name, {}) and previous[name][f"{unit}_per_sec"]:
+            change = (rate / previous[name][f"{unit}_per_sec"] - 1) * 100
+            line += f" ({change:+.1f}% vs baseline)"
+        print(line)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = OUTPUT_DIR / f"throughput_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure parsing and email throughput against a local fake LLM.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--count", type=int, default=30, help="CVs in the synthetic corpus")
+    parser.add_argument("--words", type=int, default=400, help="Approximate words per CV")
+    parser.add_argument("--formats", default=".pdf,.docx,.txt", help="Comma-separated CV formats")
+    parser.add_argument("--emails", type=int, default=100, help="Candidates in the email scenarios")
+    parser.add_argument("--llm-workers", type=int, default=3, help="API threads of the threaded/pipelined engines")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight for async/concurrent scenarios")
+    parser.add_argument("--latency", default="lognormal", help="fixed, uniform, exponential or lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="Mean base latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--seconds-per-token", type=float, default=0.0, help="Latency added per completion token")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-malformed", type=float, default=0.0, help="Fraction of answers with broken JSON")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="Reported completion tokens")
+    parser.add_argument("--baseline", default=None, help="Previous throughput_*.json to compare against")
+    parser.add_argument("--run-scenario", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--settings", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", default=None, help=argparse.SUPPRESS)
+    cli_args = parser.parse_args()
+
+    if cli_args.run_scenario:
+        # Child process started by measure()
+        scenario_result = run_scenario(cli_args.run_scenario, json.loads(cli_args.settings), Path.cwd())
+        with open(cli_args.result_file, "w") as f:
+            json.dump(scenario_result, f)
+        sys.exit(0)
+
+    run_benchmark(
+        [name.strip() for name in cli_args.scenarios.split(",") if name.strip()],
+        {
+            "count": cli_args.count,
+            "words": cli_args.words,
+            "formats": cli_args.formats.split(","),
+            "emails": cli_args.emails,
+            "llm_workers": cli_args.llm_workers,
+            "concurrency": cli_args.concurrency
+        },
+        {
+            "latency": cli_args.latency,
+            "latency_mean": cli_args.latency_mean,
+            "latency_sigma": cli_args.latency_sigma,
+            "seconds_per_output_token": cli_args.seconds_per_token,
+            "rate_429": cli_args.rate_429,
+            "rate_malformed": cli_args.rate_malformed,
+            "completion_tokens": cli_args.completion_tokens
+        },
+        cli_args.baseline
+    )
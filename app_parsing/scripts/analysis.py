@@ -1,36 +1,141 @@
 # cv parsing 2/app_parsing/scripts/analysis.py
 
-import pandas as pd
+import argparse
 import json
 from pathlib import Path
 import time
 from typing import Dict
 
+from app_parsing.services.analytics_aggregators import ParsingAggregator
+from app_parsing.utils.jsonl import iter_records, read_summary
+
+
+def _load_store_failures(store) -> list:
+    """Failed resumes of a columnar store, selected with a boolean mask."""
+    failed = ~store["success"]
+    return [
+        {"_metadata": {"filename": str(filename), "source_path": str(source), "error": str(error) or None,
+                       "success": False}}
+        for filename, source, error in zip(store["filename"][failed], store["source_path"][failed],
+                                           store["error"][failed])
+    ]
+
+
+def _store_statistics(store) -> Dict:
+    """Record counts, format success and token usage computed from a columnar store."""
+    import numpy as np
+
+    success, file_types = store["success"], store["file_type"]
+    format_statistics = {}
+    for file_type in np.unique(file_types):
+        rows = file_types == file_type
+        format_statistics[str(file_type)] = {"total": int(rows.sum()), "successful": int(success[rows].sum())}
+    return {
+        "total_processed": len(success),
+        "successful": int(success.sum()),
+        "failed": int((~success).sum()),
+        "format_statistics": format_statistics,
+        "api_usage": {"total_tokens": int(store["tokens_used"].sum()), "input_tokens": int(store["input_tokens"].sum()),
+                      "output_tokens": int(store["output_tokens"].sum())}
+    }
+
+
+def _aggregator_statistics(aggregator: ParsingAggregator) -> Dict:
+    """Record counts, format success and token usage computed from streamed records."""
+    stats = aggregator.get_stats()
+    return {
+        "total_processed": stats["total_processed"],
+        "successful": stats["successful"],
+        "failed": stats["failed"],
+        "format_statistics": {file_type: {"total": format_stats["total"], "successful": format_stats["successful"]}
+                              for file_type, format_stats in stats["format_statistics"].items()},
+        "api_usage": {"total_tokens": stats["usage"]["tokens_used"], "input_tokens": stats["usage"]["input_tokens"],
+                      "output_tokens": stats["usage"]["output_tokens"]}
+    }
+
+
+def _print_store_profile(store) -> None:
+    """Candidate profile of the successful resumes of a columnar store."""
+    import numpy as np
+
+    success = store["success"]
+    years = store["years_experience"][success]
+    years = years[~np.isnan(years)]
+    print("\nCANDIDATE PROFILE:")
+    print("-" * 50)
+    if len(years):
+        p25, p50, p75 = np.percentile(years, [25, 50, 75])
+        print(f"Years of experience : mean {years.mean():.1f}, median {p50:.1f} (p25 {p25:.1f}, p75 {p75:.1f})")
+    levels = store["seniority_levels"]
+    counts = np.bincount(store["seniority"][success].astype(np.int64) + 1, minlength=len(levels) + 1)
+    for level, count in zip(["Unknown"] + [str(level) for level in levels], counts):
+        print(f"{level:10} : {count}")
+    print("\nMOST COMMON TECHNICAL SKILLS:")
+    print("-" * 50)
+    for skill, count in list(store.skill_counts(success, "Technical Skills").items())[:10]:
+        print(f"{skill:20}: {count}")
+
+def _print_aggregator_profile(aggregator: ParsingAggregator) -> None:
+    """Candidate profile of the successful resumes, from streaming aggregates."""
+    years = aggregator.years
+    print("\nCANDIDATE PROFILE:")
+    print("-" * 50)
+    if years.count:
+        print(f"Years of experience : mean {years.mean:.1f}, median ~{years.quantile(0.5):.1f} "
+              f"(p25 ~{years.quantile(0.25):.1f}, p75 ~{years.quantile(0.75):.1f})")
+    for level, count in sorted(aggregator.seniority.items(), key=lambda entry: -entry[1]):
+        print(f"{level:10} : {count}")
+    print("\nMOST COMMON TECHNICAL SKILLS:")
+    print("-" * 50)
+    for skill, count in aggregator.skills.most_common(10):
+        print(f"{skill:20}: {count}")
+
 def analyze_parsing_results(json_path: str = "app_parsing/data/output/parsed_resumes.json") -> Dict:
     """Analyze CV parsing results and provide detailed statistics.
+
+    When the run summary is missing (a JSONL run interrupted before writing
+    it, or an output without a statistics block), counts, format success
+    and token usage are computed from the records; timing and costs, which
+    only the summary has, are then left out.
     
     Args:
-        json_path: Path to the parsing results JSON file
+        json_path: Path to the parsing results file (.json, streamed .jsonl
+            or a columnar .npz store from columnar_store.export_resumes)
         
     Returns:
         Dict containing analysis results
     """
-    # Read JSON file
-    with open(json_path, "r") as f:
-        data = json.load(f)
+    store = aggregator = None
+    if Path(json_path).suffix == ".npz":
+        # Imported here: numpy is only needed for columnar stores
+        from app_parsing.services.columnar_store import ColumnarStore
 
-    # Create DataFrame from CVs
-    resumes_df = pd.DataFrame(data["resumes"])
+        store = ColumnarStore(json_path)
+        data = store.summary
+        failed_resumes = _load_store_failures(store)
+    else:
+        # Read the statistics block, then stream the records once
+        data = read_summary(json_path)
+        aggregator = ParsingAggregator()
+
+        # Find CVs with success = False
+        failed_resumes = []
+        for resume in iter_records(json_path, key="resumes"):
+            aggregator.add(resume)
+            if not resume.get("_metadata", {}).get("success", False):
+                failed_resumes.append(resume)
 
-    print(resumes_df.columns)# Find CVs with success = False
-    failed_resumes = resumes_df[resumes_df["_metadata"].apply(lambda x: not x["success"])]
+    statistics = data.get("statistics")
+    from_records = not statistics
+    if from_records:
+        statistics = _store_statistics(store) if store is not None else _aggregator_statistics(aggregator)
 
     # Print results
     print("\n=== PARSING ANALYSIS REPORT ===")
     print("\nFAILED CVs:")
     print("-" * 50)
     if len(failed_resumes) > 0:
-        for _, row in failed_resumes.iterrows():
+        for row in failed_resumes:
             print(f"File: {row['_metadata']['filename']}")
             print(f"Error: {row['_metadata'].get('error', 'Not specified')}")
             print("-" * 30)
@@ -39,36 +144,59 @@ def analyze_parsing_results(json_path: str = "app_parsing/data/output/parsed_res
 
     print("\nGLOBAL STATISTICS:")
     print("-" * 50)
-    print(f"Total processed  : {data['statistics']['total_processed']}")
-    print(f"Successful      : {data['statistics']['successful']}")
-    print(f"Failed          : {data['statistics']['failed']}")
-    print(f"Success rate    : {(data['statistics']['successful']/data['statistics']['total_processed']*100):.2f}%")
-    
-    print("\nPERFORMANCE:")
-    print("-" * 50)
-    print(f"Total time      : {data['statistics']['processing_time']}")
-    print(f"Average time/CV : {data['statistics']['processing_time_seconds']/data['statistics']['total_processed']:.2f} seconds")
+    if from_records:
+        print("No run summary found: statistics computed from the records, without timing and costs")
+    total = statistics['total_processed']
+    print(f"Total processed  : {total}")
+    print(f"Successful      : {statistics['successful']}")
+    print(f"Failed          : {statistics['failed']}")
+    if total:
+        print(f"Success rate    : {(statistics['successful']/total*100):.2f}%")
+
+    if 'processing_time_seconds' in statistics:
+        print("\nPERFORMANCE:")
+        print("-" * 50)
+        print(f"Total time      : {statistics['processing_time']}")
+        if total:
+            print(f"Average time/CV : {statistics['processing_time_seconds']/total:.2f} seconds")
     
     print("\nAPI COSTS AND USAGE:")
     print("-" * 50)
-    api_stats = data['statistics']['api_usage']
+    api_stats = statistics['api_usage']
     print(f"Tokens used     : {api_stats['total_tokens']:,}")
-    print(f"Total cost      : ${api_stats['total_cost_usd']:.2f}")
-    print(f"Average cost/CV : ${api_stats['total_cost_usd']/data['statistics']['total_processed']:.4f}")
+    if 'total_cost_usd' in api_stats:
+        print(f"Total cost      : ${api_stats['total_cost_usd']:.2f}")
+        if total:
+            print(f"Average cost/CV : ${api_stats['total_cost_usd']/total:.4f}")
+    if 'input_tokens' in api_stats:
+        print(f"Input / output  : {api_stats['input_tokens']:,} / {api_stats['output_tokens']:,} tokens")
+    for model, model_stats in api_stats.get('by_model', {}).items():
+        print(f"  {model:22}: {model_stats['calls']} calls, ${model_stats['cost_usd']:.4f}")
+    for stage, latency in api_stats.get('latency_seconds', {}).items():
+        print(f"Latency {stage:8}: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, p99 {latency['p99']:.2f}s")
 
     print("\nSTATISTICS BY FORMAT:")
     print("-" * 50)
-    for fmt, stats in data['statistics']['format_statistics'].items():
+    for fmt, stats in statistics['format_statistics'].items():
         success_rate = (stats['successful'] / stats['total'] * 100)
         print(f"{fmt:5} : {stats['successful']}/{stats['total']} ({success_rate:.1f}% success)")
 
+    if store is not None:
+        _print_store_profile(store)
+        store.close()
+    else:
+        _print_aggregator_profile(aggregator)
+
     return {
-        "failed_resumes": failed_resumes.to_dict('records'),
-        "statistics": data['statistics']
+        "failed_resumes": failed_resumes,
+        "statistics": statistics
     }
 
 
 
 if __name__ == "__main__":
-    analyze_parsing_results()
+    parser = argparse.ArgumentParser(description="Report on CV parsing results.")
+    parser.add_argument("path", nargs="?", default="app_parsing/data/output/parsed_resumes.json",
+                        help="parsed_resumes.json(l) or a .npz columnar store")
+    analyze_parsing_results(parser.parse_args().path)
 
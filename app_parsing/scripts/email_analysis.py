@@ -1,34 +1,93 @@
-import pandas as pd
+import argparse
 import json
+from datetime import datetime
 from pathlib import Path
 import time
 from typing import Dict
 
+from app_parsing.services.analytics_aggregators import SCORE_EDGES, EmailAggregator, Histogram
+from app_parsing.utils.jsonl import iter_records, read_summary
+
 def analyze_email_results(json_path: str = "app_parsing/data/output/emails/generated_emails_20241130_223043.json") -> Dict:
-    """Analyze email generation results and provide detailed statistics."""
-    # Read JSON file
-    with open(json_path, "r") as f:
-        data = json.load(f)
+    """Analyze email generation results and provide detailed statistics.
 
-    # Create DataFrame from emails
-    emails_df = pd.DataFrame(data["emails"])
-    
-    # Calculate match score statistics
-    match_scores = []
-    for email in data['emails']:
-        match_score = email['email_data'].get('match_score', '0%')
-        score = float(match_score.strip('%'))
-        match_scores.append(score)
+    Works on both the JSON output and the streamed JSONL output; emails are
+    read one at a time into an EmailAggregator, whose memory is bounded. A
+    columnar .npz store (columnar_store.export_emails) is analyzed with
+    array operations instead.
+
+    The returned "match_scores" only lists the scores of the sample emails
+    (EmailAggregator.SAMPLE_SIZE); "match_score_statistics" describes all
+    of them.
+    """
+    if Path(json_path).suffix == ".npz":
+        return _analyze_store(json_path)
+
+    data = read_summary(json_path)
+
+    # Single pass over the emails, keeping only bounded aggregates
+    aggregator = EmailAggregator()
+    for email in iter_records(json_path, key="emails"):
+        aggregator.add(email)
+    return _report(data, aggregator)
+
+
+def _analyze_store(store_path: str) -> Dict:
+    """analyze_email_results over a columnar store."""
+    # Imported here: numpy is only needed for columnar stores
+    import numpy as np
+
+    from app_parsing.services.columnar_store import ColumnarStore
 
+    with ColumnarStore(store_path) as store:
+        scores = np.nan_to_num(store["match_score"], nan=0.0)
+        clipped = np.clip(scores, SCORE_EDGES[0], SCORE_EDGES[-1])
+        histogram = Histogram.from_counts(
+            SCORE_EDGES, np.histogram(clipped, bins=SCORE_EDGES)[0].tolist(), float(scores.sum()),
+            float(scores.min()) if len(scores) else None, float(scores.max()) if len(scores) else None
+        )
+        timestamps = store["timestamp"]
+        timestamps = timestamps[~np.isnat(timestamps)]
+        first_timestamp = timestamps.min().astype(datetime).isoformat() if len(timestamps) else None
+        last_timestamp = timestamps.max().astype(datetime).isoformat() if len(timestamps) else None
+
+        raw_scores, skill_rows, skill_ids, vocab = (store["match_score"], store["skill_row"], store["skill_id"],
+                                                    store["skill_vocab"])
+        samples = [
+            {
+                "candidate_name": str(store["candidate_name"][row]),
+                "email_data": {
+                    "match_score": "N/A" if np.isnan(raw_scores[row]) else f"{raw_scores[row]}%",
+                    "match_details": {"matched_skills": [str(vocab[i]) for i in skill_ids[skill_rows == row]]}
+                }
+            }
+            for row in range(min(EmailAggregator.SAMPLE_SIZE, len(store)))
+        ]
+        aggregator = EmailAggregator.from_counts(len(store), histogram, store.skill_counts(),
+                                                 first_timestamp, last_timestamp, samples)
+        return _report(store.summary, aggregator)
+
+
+def _sample_score(email: Dict) -> float:
+    """Match score of a sample email; a missing one counts as 0, as in the histogram."""
+    try:
+        return float(str(email['email_data'].get('match_score', '0%')).strip('%'))
+    except ValueError:
+        return 0.0
+
+
+def _report(data: Dict, aggregator: EmailAggregator) -> Dict:
+    total_emails = aggregator.total
+    scores = aggregator.scores
     print("\n=== EMAIL GENERATION ANALYSIS REPORT ===")
     print("-" * 50)
     
     print("\nMATCH SCORE STATISTICS:")
     print("-" * 50)
-    if match_scores:
-        print(f"Average Match Score : {sum(match_scores)/len(match_scores):.2f}%")
-        print(f"Qualified Matches (≥50%) : {len([s for s in match_scores if s >= 50])}")
-        print(f"Unqualified Matches (<50%) : {len([s for s in match_scores if s < 50])}")
+    if scores.count:
+        print(f"Average Match Score : {scores.mean:.2f}%")
+        print(f"Qualified Matches (≥50%) : {aggregator.qualified}")
+        print(f"Unqualified Matches (<50%) : {scores.count - aggregator.qualified}")
     else:
         print("No match scores available.")
 
@@ -36,26 +95,18 @@ def analyze_email_results(json_path: str = "app_parsing/data/output/emails/gener
     print("-" * 50)
     
     # Check if there are any emails processed
-    total_emails = len(data['emails'])
     print(f"Total CVs Processed : {total_emails}")
-    print(f"Emails Generated   : {len(emails_df)}")
+    print(f"Emails Generated   : {total_emails}")
     
     # Check to avoid division by zero
     if total_emails > 0:
-        print(f"Generation Rate    : {(len(emails_df) / total_emails * 100):.2f}%")
+        print(f"Generation Rate    : {(total_emails / total_emails * 100):.2f}%")
     else:
         print("No emails generated. Cannot calculate generation rate.")
 
-    # Group by matched skills
-    skills_mentioned = []
-    for email in data['emails']:
-        if 'match_details' in email['email_data']:
-            skills_mentioned.extend(email['email_data']['match_details'].get('matched_skills', []))
-    
     print("\nMOST COMMON MATCHED SKILLS:")
     print("-" * 50)
-    skill_counts = pd.Series(skills_mentioned).value_counts()
-    for skill, count in skill_counts.head().items():
+    for skill, count in aggregator.skills.most_common(5):
         print(f"{skill:20}: {count} times")
 
     # API Usage Statistics
@@ -66,25 +117,25 @@ def analyze_email_results(json_path: str = "app_parsing/data/output/emails/gener
         print(f"Tokens used     : {api_stats['total_tokens']:,}")
         print(f"Total cost      : ${api_stats['total_cost_usd']:.2f}")
         
-        # Check if emails_df is empty before calculating average cost per email
-        if len(emails_df) > 0:
-            print(f"Average cost/email : ${api_stats['total_cost_usd'] / len(emails_df):.4f}")
+        # Check if there are emails before calculating average cost per email
+        if total_emails > 0:
+            print(f"Average cost/email : ${api_stats['total_cost_usd'] / total_emails:.4f}")
         else:
             print("No emails generated, cannot calculate average cost per email.")
 
     # Time Analysis
-    if 'timestamp' in emails_df.columns:
-        emails_df['timestamp'] = pd.to_datetime(emails_df['timestamp'])
-        total_time = (emails_df['timestamp'].max() - emails_df['timestamp'].min()).total_seconds()
+    if aggregator.first_timestamp is not None:
+        total_time = (datetime.fromisoformat(aggregator.last_timestamp) -
+                      datetime.fromisoformat(aggregator.first_timestamp)).total_seconds()
         print("\nPERFORMANCE:")
         print("-" * 50)
         print(f"Total time        : {total_time/60:.2f} minutes")
-        print(f"Average time/email: {total_time/len(emails_df):.2f} seconds" if len(emails_df) > 0 else "No emails generated, cannot calculate average time per email.")
+        print(f"Average time/email: {total_time/total_emails:.2f} seconds")
 
     # Generate candidates summary
     print("\nCANDIDATES SUMMARY:")
     print("-" * 50)
-    for email in data['emails'][:5]:
+    for email in aggregator.samples:
         score = email['email_data'].get('match_score', 'N/A')
         name = email['candidate_name']
         matched = []
@@ -92,16 +143,20 @@ def analyze_email_results(json_path: str = "app_parsing/data/output/emails/gener
             matched = email['email_data']['match_details'].get('matched_skills', [])
         matched_str = ', '.join(matched[:3])
         print(f"{name:30} | Match: {score} | Matched Skills: {matched_str}")
-    if len(data['emails']) > 5:
-        print(f"... and {len(data['emails'])-5} more candidates")
+    if total_emails > len(aggregator.samples):
+        print(f"... and {total_emails - len(aggregator.samples)} more candidates")
 
     return {
-        "total_processed": len(data['emails']),
-        "emails_generated": len(emails_df),
-        "match_scores": match_scores,
-        "skill_statistics": skill_counts.to_dict(),
+        "total_processed": total_emails,
+        "emails_generated": total_emails,
+        "match_scores": [_sample_score(email) for email in aggregator.samples],
+        "match_score_statistics": aggregator.get_stats()["match_score"],
+        "skill_statistics": dict(aggregator.skills.most_common()),
         "api_usage": data.get('api_usage', {})
     }
 
 if __name__ == "__main__":
-    analyze_email_results()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Report on email generation results.")
+    parser.add_argument("path", nargs="?", default="app_parsing/data/output/emails/generated_emails_20241130_223043.json",
+                        help="generated_emails_*.json(l) or a .npz columnar store")
+    analyze_email_results(parser.parse_args().path)
\ No newline at end of file
@@ -0,0 +1,133 @@
+# cv parsing 2/app_parsing/scripts/startup_benchmark.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+OUTPUT_DIR = PROJECT_ROOT / "app_parsing" / "data" / "output" / "benchmarks"
+
+# Cold-start commands: what a cron-triggered invocation pays before any work starts
+TARGETS = {
+    "main": [str(PROJECT_ROOT / "main.py"), "--help"],
+    "email_personalizer": ["-c", "import app_parsing.services.email_personalizer"],
+}
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Extracts cumulative import times of top-level imports.
+
+    Args:
+        stderr: Output of ``python -X importtime``
+
+    Returns:
+        Dict mapping module name to cumulative import time in microseconds
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the module that triggered them
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure(target: str, runs: int = 5) -> Dict:
+    """Runs a start-up target several times in fresh interpreters.
+
+    The targets run in a scratch directory, so that whatever they write to
+    the working directory does not land in the project.
+
+    Args:
+        target: Key of TARGETS
+        runs: Number of cold starts to measure
+
+    Returns:
+        Dict with median wall and import times and the slowest imports
+    """
+    wall_times: List[float] = []
+    import_times: List[float] = []
+    slowest: Dict[str, int] = {}
+    env = {**os.environ,
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")]))}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="startup_") as workdir:
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", *TARGETS[target]],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+        wall_times.append(time.perf_counter() - start)
+        modules = parse_importtime(result.stderr)
+        import_times.append(sum(modules.values()) / 1e6)
+        for name, microseconds in modules.items():
+            slowest[name] = max(slowest.get(name, 0), microseconds)
+        if result.returncode != 0:
+            print(f"Warning: {target} exited with code {result.returncode}")
+
+    top = sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "runs": runs,
+        "wall_seconds_median": round(statistics.median(wall_times), 3),
+        "wall_seconds_min": round(min(wall_times), 3),
+        "import_seconds_median": round(statistics.median(import_times), 3),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in top}
+    }
+
+
+def run_benchmark(runs: int = 5, baseline: Optional[str] = None) -> Path:
+    """Measures every target, saves the results and compares with a baseline.
+
+    Args:
+        runs: Number of cold starts per target
+        baseline: Previous results file to compare against
+
+    Returns:
+        Path: Path of the saved results file
+    """
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "targets": {target: measure(target, runs) for target in TARGETS}
+    }
+
+    previous = {}
+    if baseline:
+        with open(baseline, "r") as f:
+            previous = json.load(f).get("targets", {})
+
+    print("\n=== STARTUP TIME REPORT ===")
+    print("-" * 50)
+    for target, stats in results["targets"].items():
+        line = f"{target:20}: {stats['wall_seconds_median']:.3f}s wall, {stats['import_seconds_median']:.3f}s imports"
+        if target in previous:
+            delta = stats["wall_seconds_median"] - previous[target]["wall_seconds_median"]
+            line += f" ({delta:+.3f}s vs baseline)"
+        print(line)
+        for name, ms in list(stats["slowest_imports_ms"].items())[:5]:
+            print(f"    {name:30} {ms:8.1f} ms")
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = OUTPUT_DIR / f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the CLI entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per target")
+    parser.add_argument("--baseline", default=None, help="Previous startup_*.json to compare against")
+    cli_args = parser.parse_args()
+    run_benchmark(cli_args.runs, cli_args.baseline)
@@ -2,20 +2,18 @@ import json
 from pathlib import Path
 from datetime import datetime
 
+from app_parsing.utils.jsonl import is_summary_file, iter_records
+
 def view_formatted_emails(json_path: str):
-    """View formatted emails from the generated JSON file."""
+    """View formatted emails from the generated JSON or JSONL file."""
     try:
-        # Read the JSON file
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-
         output_dir = Path("app_parsing/data/output/emails")
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = output_dir / f"formatted_emails_{timestamp}.txt"    
      
         # For each email in the file
         with open(output_file, 'w') as file:
-            for email in data['emails']:
+            for email in iter_records(json_path, key="emails"):
                 file.write("=" * 50 + "\n")
                 file.write(f"Candidate: {email['candidate_name']}\n")
                 file.write(f"Match Score: {email['email_data'].get('match_score', 'N/A')}\n")
@@ -34,9 +32,12 @@ def view_formatted_emails(json_path: str):
         print(f"Error reading file: {str(e)}")
 
 def list_json_files(directory: str):
-    """List all JSON files in the specified directory."""
+    """List all email output files (JSON or JSONL) in the specified directory."""
     path = Path(directory)
-    return list(path.glob("*.json"))
+    return [
+        file for file in list(path.glob("*.json")) + list(path.glob("*.jsonl"))
+        if not is_summary_file(file)
+    ]
 
 if __name__ == "__main__":
     email_directory = "app_parsing/data/output/emails"
@@ -0,0 +1,601 @@
+#cv parsing 2/app_parsing/services/analytics_aggregators.py
+
+import argparse
+import bisect
+import copy
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app_parsing.utils.hashing import text_sha256
+from app_parsing.utils.jsonl import iter_records, resolve_records_path
+
+STATE_VERSION = 3
+# Match scores are percentages: ten bins of 10 points, 100 falls in the last one
+SCORE_EDGES = tuple(range(0, 101, 10))
+YEARS_EDGES = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30)
+
+
+class HeavyHitters:
+    """Top-k counter with bounded memory (Space-Saving sketch).
+
+    At most ``capacity`` items are tracked. When a new item arrives and the
+    sketch is full, it replaces the least counted item and inherits its
+    count, which is remembered as the item's maximum overestimate. Items
+    occurring more than total/capacity times are always tracked.
+
+    Attributes:
+        capacity (int): Maximum number of tracked items
+        counts (Dict[str, int]): Estimated count of each tracked item
+        errors (Dict[str, int]): Maximum overestimate of each count
+        total (int): Number of items seen
+    """
+    DEFAULT_CAPACITY = 200
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        evicted = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(evicted)
+        del self.errors[evicted]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+
+    def merge(self, other: "HeavyHitters") -> None:
+        """Adds another sketch; the result keeps the ``capacity`` largest counts."""
+        own_floor = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        other_floor = min(other.counts.values()) if len(other.counts) >= other.capacity else 0
+        counts, errors = {}, {}
+        for item in set(self.counts) | set(other.counts):
+            # An item missing from a full sketch may have been counted up to its floor there
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            errors[item] = (self.errors.get(item, own_floor) + other.errors.get(item, other_floor))
+        kept = sorted(counts, key=counts.get, reverse=True)[:self.capacity]
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+        self.total += other.total
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda entry: (-entry[1], entry[0]))[:n]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "total": self.total,
+                "items": [[item, count, self.errors[item]] for item, count in self.most_common()]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HeavyHitters":
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        for item, count, error in data["items"]:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+        return sketch
+
+
+class Histogram:
+    """Fixed-bin histogram with running count, sum, minimum and maximum.
+
+    Values below the first edge go to the first bin and values above the
+    last edge to the last one.
+
+    Attributes:
+        edges (Tuple[float, ...]): Bin edges, bins[i] covers [edges[i], edges[i + 1])
+        bins (List[int]): Count per bin
+    """
+
+    def __init__(self, edges: Tuple[float, ...]):
+        self.edges = tuple(edges)
+        self.bins = [0] * (len(self.edges) - 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @classmethod
+    def from_counts(cls, edges: Tuple[float, ...], bins: List[int], total: float,
+                    minimum: Optional[float], maximum: Optional[float]) -> "Histogram":
+        """Builds a histogram from precomputed bin counts.
+
+        Args:
+            edges: Bin edges
+            bins: Count per bin, len(edges) - 1 values
+            total: Sum of the values
+            minimum: Smallest value, None when the bins are empty
+            maximum: Largest value, None when the bins are empty
+
+        Returns:
+            Histogram: The histogram, as if the values had been added one by one
+        """
+        histogram = cls(edges)
+        if len(bins) != len(histogram.bins):
+            raise ValueError(f"Expected {len(histogram.bins)} bins, got {len(bins)}")
+        histogram.bins = [int(count) for count in bins]
+        histogram.count = sum(histogram.bins)
+        histogram.sum = float(total)
+        histogram.min, histogram.max = minimum, maximum
+        return histogram
+
+    def add(self, value: float) -> None:
+        index = bisect.bisect_right(self.edges, value) - 1
+        self.bins[min(max(index, 0), len(self.bins) - 1)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def count_at_least(self, threshold: float) -> int:
+        """Values >= threshold; exact when threshold is one of the edges."""
+        start = bisect.bisect_left(self.edges, threshold)
+        return sum(self.bins[start:])
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile, interpolated linearly inside its bin."""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for index, bin_count in enumerate(self.bins):
+            if bin_count and seen + bin_count >= target:
+                low, high = self.edges[index], self.edges[index + 1]
+                estimate = low + (high - low) * (target - seen) / bin_count
+                return min(max(estimate, self.min), self.max)
+            seen += bin_count
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different bin edges")
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"edges": list(self.edges), "bins": self.bins, "count": self.count, "sum": self.sum,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls(tuple(data["edges"]))
+        histogram.bins = list(data["bins"])
+        histogram.count, histogram.sum = data["count"], data["sum"]
+        histogram.min, histogram.max = data["min"], data["max"]
+        return histogram
+
+
+def _merge_counts(target: Dict[str, int], source: Dict[str, int]) -> None:
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fingerprint(record: Dict[str, Any]) -> str:
+    return text_sha256(json.dumps(record, sort_keys=True, default=str))
+
+
+class _Aggregator(ABC):
+    """Shared persistence of the aggregators.
+
+    ``sources`` remembers, for each file, how many records were consumed,
+    fingerprints of the first and last of them and the statistics of that
+    file alone, so consume_file() only reads what a streaming run appended
+    since. A file rewritten in place (a new run, or an incremental run
+    rewriting its output) no longer starts with the same records: its old
+    statistics are replaced by those of the new content, and the totals are
+    rebuilt from the per-file statistics. A rebuild only keeps what came
+    from files, not records passed to add() directly.
+    """
+    KIND = ""
+
+    def __init__(self, skills_capacity: int = HeavyHitters.DEFAULT_CAPACITY):
+        self.skills_capacity = skills_capacity
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    @abstractmethod
+    def add(self, record: Dict[str, Any]) -> None:
+        """Adds one record to the statistics."""
+
+    @abstractmethod
+    def merge(self, other: "_Aggregator") -> None:
+        """Adds the statistics of another aggregator of the same kind."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """The statistics as a JSON-serializable dictionary."""
+
+    def consume_file(self, path: Union[str, Path]) -> int:
+        """Adds the records of a .json/.jsonl output not consumed yet.
+
+        Args:
+            path: Output file, or the base path of a JSON/JSONL output
+
+        Returns:
+            int: Records read into the statistics; for a rewritten file all
+                of its records, which replace those consumed before
+        """
+        path = resolve_records_path(path)
+        key = str(path.resolve())
+        source = self.sources.get(key)
+        delta = self._empty()
+        consumed = delta._consume(path, source)
+        rewritten = consumed is None
+        if rewritten:
+            # Its new records replace the old ones instead of adding to them
+            source = None
+            delta = self._empty()
+            consumed = delta._consume(path, None)
+
+        if consumed["records"]:
+            partial = self._partial(source) if source else self._empty()
+            partial.merge(delta)
+            self.sources[key] = {**consumed, "partial": partial._fields()}
+        else:
+            self.sources.pop(key, None)
+        if rewritten:
+            self._rebuild()
+        else:
+            self.merge(delta)
+        return delta.total
+
+    def _consume(self, path: Path, source: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Adds the records after those recorded in source.
+
+        Returns:
+            dict: The new source entry without statistics ("records",
+                "first", "last"), or None (before adding any) when the file
+                does not start with the records source describes
+        """
+        skip = source["records"] if source else 0
+        first = last = None
+        seen = 0
+        for position, record in enumerate(iter_records(path, key=self.KIND)):
+            seen += 1
+            fingerprint = _fingerprint(record) if position in (0, skip - 1) or position >= skip else None
+            if position == 0:
+                first = fingerprint
+            if position < skip:
+                expected = {0: source["first"], skip - 1: source["last"]}
+                if expected.get(position, fingerprint) != fingerprint:
+                    return None
+                last = fingerprint
+                continue
+            self.add(record)
+            last = fingerprint
+        if seen < skip:
+            return None
+        return {"records": seen, "first": first, "last": last}
+
+    def _empty(self) -> "_Aggregator":
+        return type(self)(self.skills_capacity)
+
+    def _partial(self, source: Dict[str, Any]) -> "_Aggregator":
+        """The statistics of one source file alone."""
+        partial = self._empty()
+        partial._load_fields(copy.deepcopy(source["partial"]))
+        return partial
+
+    def _rebuild(self) -> None:
+        """Recomputes the statistics as the sum of the per-file statistics."""
+        rebuilt = self._empty()
+        for source in self.sources.values():
+            rebuilt.merge(self._partial(source))
+        self._load_fields(rebuilt._fields())
+
+    def _merge_sources(self, other: "_Aggregator") -> None:
+        """Takes over the sources of another aggregator after its statistics were added.
+
+        A file consumed by both was counted twice; the entry with more
+        records wins and the totals are rebuilt.
+        """
+        shared = False
+        for key, source in other.sources.items():
+            shared = shared or key in self.sources
+            if source["records"] > self.sources.get(key, {"records": -1})["records"]:
+                self.sources[key] = copy.deepcopy(source)
+        if shared:
+            self._rebuild()
+
+    @abstractmethod
+    def _fields(self) -> Dict[str, Any]:
+        """The statistics to persist, besides kind, version and sources."""
+
+    @abstractmethod
+    def _load_fields(self, data: Dict[str, Any]) -> None:
+        """Restores the statistics written by _fields()."""
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Atomically writes the aggregator state as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"kind": self.KIND, "version": STATE_VERSION, "sources": self.sources,
+                       **self._fields()}, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "_Aggregator":
+        """Reads a saved state, or starts an empty aggregator when the file is missing.
+
+        States written before per-file statistics were kept are rebuilt by
+        reading their source files again; files gone since are dropped.
+        """
+        aggregator = cls()
+        path = Path(path)
+        if path.exists():
+            with path.open("r") as f:
+                data = json.load(f)
+            if data.get("kind") != cls.KIND:
+                raise ValueError(f"{path} holds {data.get('kind')} analytics, not {cls.KIND}")
+            if data.get("version", 1) >= STATE_VERSION:
+                aggregator.sources = data["sources"]
+                aggregator._load_fields(data)
+                return aggregator
+            for key in data["sources"]:
+                if Path(key).exists():
+                    aggregator.consume_file(key)
+                else:
+                    logging.warning(f"{key} no longer exists, its records are dropped from {path}")
+        return aggregator
+
+
+class ParsingAggregator(_Aggregator):
+    """Streaming statistics of parsed resume records.
+
+    Keeps counters, per-format success, API usage totals, a years of
+    experience histogram, seniority counts and the top technical skills;
+    memory does not grow with the number of records.
+    """
+    KIND = "resumes"
+    USAGE_FIELDS = ("tokens_used", "input_tokens", "output_tokens", "api_calls")
+
+    def __init__(self, skills_capacity: int = HeavyHitters.DEFAULT_CAPACITY):
+        super().__init__(skills_capacity)
+        self.total = 0
+        self.successful = 0
+        self.cache_hits = 0
+        self.format_stats: Dict[str, Dict[str, int]] = {}
+        self.usage = {name: 0 for name in self.USAGE_FIELDS}
+        self.seniority: Dict[str, int] = {}
+        self.years = Histogram(YEARS_EDGES)
+        self.skills = HeavyHitters(skills_capacity)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        metadata = record.get("_metadata") or {}
+        success = bool(metadata.get("success", False))
+        self.total += 1
+        self.successful += success
+        self.cache_hits += bool(metadata.get("cache_hit"))
+        if file_type := metadata.get("file_type"):
+            stats = self.format_stats.setdefault(file_type, {"total": 0, "successful": 0})
+            stats["total"] += 1
+            stats["successful"] += success
+        for name in self.USAGE_FIELDS:
+            self.usage[name] += int(metadata.get(name) or 0)
+        if not success:
+            return
+
+        summary = record.get("Professional Summary")
+        if isinstance(summary, dict) and (years := _to_float(summary.get("Years of Experience"))) is not None:
+            self.years.add(years)
+        evaluation = record.get("HR Evaluation")
+        level = evaluation.get("Seniority Level") if isinstance(evaluation, dict) else None
+        level = level.strip() if isinstance(level, str) and level.strip() else "Unknown"
+        self.seniority[level] = self.seniority.get(level, 0) + 1
+        skills = record.get("Skills")
+        technical = skills.get("Technical Skills") if isinstance(skills, dict) else None
+        for skill in set(technical) if isinstance(technical, list) else ():
+            if isinstance(skill, str) and skill.strip():
+                self.skills.add(skill.strip())
+
+    def merge(self, other: "ParsingAggregator") -> None:
+        self.total += other.total
+        self.successful += other.successful
+        self.cache_hits += other.cache_hits
+        for file_type, stats in other.format_stats.items():
+            _merge_counts(self.format_stats.setdefault(file_type, {"total": 0, "successful": 0}), stats)
+        _merge_counts(self.usage, other.usage)
+        _merge_counts(self.seniority, other.seniority)
+        self.years.merge(other.years)
+        self.skills.merge(other.skills)
+        self._merge_sources(other)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "total_processed": self.total,
+            "successful": self.successful,
+            "failed": self.total - self.successful,
+            "success_rate": round(self.successful / self.total * 100, 2) if self.total else 0,
+            "cache_hits": self.cache_hits,
+            "format_statistics": {
+                file_type: {**stats, "success_rate": round(stats["successful"] / stats["total"] * 100, 2)}
+                for file_type, stats in self.format_stats.items()
+            },
+            "usage": dict(self.usage),
+            "years_of_experience": {"mean": self.years.mean, "p50": self.years.quantile(0.5),
+                                    "histogram": self.years.to_dict()},
+            "seniority": dict(self.seniority),
+            "top_technical_skills": dict(self.skills.most_common(20))
+        }
+
+    def _fields(self) -> Dict[str, Any]:
+        return {"total": self.total, "successful": self.successful, "cache_hits": self.cache_hits,
+                "format_stats": self.format_stats, "usage": self.usage, "seniority": self.seniority,
+                "years": self.years.to_dict(), "skills": self.skills.to_dict()}
+
+    def _load_fields(self, data: Dict[str, Any]) -> None:
+        self.total, self.successful, self.cache_hits = data["total"], data["successful"], data["cache_hits"]
+        self.format_stats, self.usage, self.seniority = data["format_stats"], data["usage"], data["seniority"]
+        self.years = Histogram.from_dict(data["years"])
+        self.skills = HeavyHitters.from_dict(data["skills"])
+
+
+class EmailAggregator(_Aggregator):
+    """Streaming statistics of generated email records.
+
+    Keeps the match score histogram, the top matched skills, the first and
+    last timestamps, how many emails were rendered from a skeleton and the
+    first few emails as samples.
+    """
+    KIND = "emails"
+    QUALIFYING_SCORE = 50
+    SAMPLE_SIZE = 5
+
+    def __init__(self, skills_capacity: int = HeavyHitters.DEFAULT_CAPACITY):
+        super().__init__(skills_capacity)
+        self.total = 0
+        self.skeleton_emails = 0
+        self.scores = Histogram(SCORE_EDGES)
+        self.skills = HeavyHitters(skills_capacity)
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]) -> None:
+        email_data = record.get("email_data") or {}
+        self.total += 1
+        self.skeleton_emails += email_data.get("rendering") == "skeleton"
+        # Emails without a readable score count as 0, as analyze_email_results always did
+        score = _to_float(email_data.get("match_score", "0%"))
+        self.scores.add(score if score is not None else 0.0)
+        details = email_data.get("match_details") or {}
+        # Older outputs and the analysis scripts use "matched_skills"
+        matched = details.get("matched_skills", details.get("matching_skills", []))
+        for skill in matched:
+            self.skills.add(skill)
+        if timestamp := record.get("timestamp"):
+            self._add_timestamp(timestamp)
+        if len(self.samples) < self.SAMPLE_SIZE:
+            self.samples.append({
+                "candidate_name": record.get("candidate_name"),
+                "email_data": {"match_score": email_data.get("match_score", "N/A"),
+                               "match_details": {"matched_skills": list(matched)}}
+            })
+
+    @classmethod
+    def from_counts(cls, total: int, scores: Histogram, skill_counts: Dict[str, int],
+                    first_timestamp: Optional[str] = None, last_timestamp: Optional[str] = None,
+                    samples: Optional[List[Dict[str, Any]]] = None) -> "EmailAggregator":
+        """Builds an aggregator from statistics computed elsewhere (e.g. a columnar store).
+
+        Args:
+            total: Number of emails
+            scores: Match score histogram, with SCORE_EDGES
+            skill_counts: Exact count of each matched skill; the sketch is
+                sized so that all of them are kept
+            first_timestamp: Earliest timestamp, ISO format
+            last_timestamp: Latest timestamp, ISO format
+            samples: Sample email records, as add() keeps them
+
+        Returns:
+            EmailAggregator: The aggregator
+        """
+        if scores.edges != SCORE_EDGES:
+            raise ValueError("Match score histogram must use SCORE_EDGES")
+        aggregator = cls(skills_capacity=max(HeavyHitters.DEFAULT_CAPACITY, len(skill_counts)))
+        aggregator.total = total
+        aggregator.scores = scores
+        for skill, count in skill_counts.items():
+            aggregator.skills.add(skill, count)
+        aggregator.first_timestamp, aggregator.last_timestamp = first_timestamp, last_timestamp
+        aggregator.samples = list(samples or [])[:cls.SAMPLE_SIZE]
+        return aggregator
+
+    def _add_timestamp(self, timestamp: str) -> None:
+        value = datetime.fromisoformat(timestamp)
+        if self.first_timestamp is None or value < datetime.fromisoformat(self.first_timestamp):
+            self.first_timestamp = timestamp
+        if self.last_timestamp is None or value > datetime.fromisoformat(self.last_timestamp):
+            self.last_timestamp = timestamp
+
+    @property
+    def qualified(self) -> int:
+        return self.scores.count_at_least(self.QUALIFYING_SCORE)
+
+    def merge(self, other: "EmailAggregator") -> None:
+        self.total += other.total
+        self.skeleton_emails += other.skeleton_emails
+        self.scores.merge(other.scores)
+        self.skills.merge(other.skills)
+        for timestamp in (other.first_timestamp, other.last_timestamp):
+            if timestamp is not None:
+                self._add_timestamp(timestamp)
+        self.samples = (self.samples + other.samples)[:self.SAMPLE_SIZE]
+        self._merge_sources(other)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "emails": self.total,
+            "skeleton_emails": self.skeleton_emails,
+            "match_score": {"mean": self.scores.mean, "p50": self.scores.quantile(0.5),
+                            "p95": self.scores.quantile(0.95), "qualified": self.qualified,
+                            "unqualified": self.scores.count - self.qualified,
+                            "histogram": self.scores.to_dict()},
+            "top_matched_skills": dict(self.skills.most_common(20)),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp
+        }
+
+    def _fields(self) -> Dict[str, Any]:
+        return {"total": self.total, "skeleton_emails": self.skeleton_emails, "scores": self.scores.to_dict(),
+                "skills": self.skills.to_dict(), "first_timestamp": self.first_timestamp,
+                "last_timestamp": self.last_timestamp, "samples": self.samples}
+
+    def _load_fields(self, data: Dict[str, Any]) -> None:
+        self.total, self.skeleton_emails = data["total"], data["skeleton_emails"]
+        self.scores = Histogram.from_dict(data["scores"])
+        self.skills = HeavyHitters.from_dict(data["skills"])
+        self.first_timestamp, self.last_timestamp = data["first_timestamp"], data["last_timestamp"]
+        self.samples = data["samples"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update persisted analytics with new parsing or email records, without rereading the corpus."
+    )
+    parser.add_argument("records", nargs="+", help="parsed_resumes.json(l) or generated_emails_*.json(l) files")
+    parser.add_argument("--emails", action="store_true", help="The records are generated emails")
+    parser.add_argument("--state", default=None,
+                        help="Aggregator state file (default: app_parsing/data/output/<resumes|emails>_analytics.json)")
+    args = parser.parse_args()
+
+    aggregator_class = EmailAggregator if args.emails else ParsingAggregator
+    state_path = args.state or f"app_parsing/data/output/{aggregator_class.KIND}_analytics.json"
+    aggregator = aggregator_class.load(state_path)
+    for records_path in args.records:
+        print(f"{records_path}: {aggregator.consume_file(records_path)} new records")
+    aggregator.save(state_path)
+    print(json.dumps(aggregator.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,320 @@
 #cv parsing 2/app_parsing/services/api_tracker.py
 
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# USD per 1k tokens as (input, output). Model names returned by the API
+# carry a date suffix ("gpt-3.5-turbo-0125"), so lookups match by prefix.
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4": (0.03, 0.06),
+}
+DEFAULT_PRICING = (0.002, 0.002)
+
+
+def get_model_pricing(model: Optional[str]) -> Tuple[float, float]:
+    """Returns the (input, output) USD price per 1k tokens of a model."""
+    if model:
+        for name in sorted(MODEL_PRICING, key=len, reverse=True):
+            if model.startswith(name):
+                return MODEL_PRICING[name]
+    return DEFAULT_PRICING
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with bounded memory.
+
+    Percentiles are interpolated inside the bucket that contains them,
+    which is accurate to within a bucket width.
+    """
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.BUCKETS[index - 1] if index > 0 else 0.0
+                upper = self.BUCKETS[index] if index < len(self.BUCKETS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": list(self.counts), "count": self.count, "sum": self.sum, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls()
+        if len(data["counts"]) != len(histogram.counts):
+            raise ValueError("Cannot load a latency histogram with different buckets")
+        histogram.counts = list(data["counts"])
+        histogram.count, histogram.sum, histogram.max = data["count"], data["sum"], data["max"]
+        return histogram
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max, 3)
+        }
+
+
 class APIUsageTracker:
     """Tracks OpenAI API usage and costs.
 
     This class keeps track of API calls, tokens used,
-    and associated costs.
+    and associated costs. Usage is broken down by model (each with its own
+    input/output price) and latency is recorded per stage ("parse",
+    "email", ...). All updates take a lock, so one tracker can be shared by
+    worker threads and asyncio tasks alike.
 
     Attributes:
         total_tokens (int): Total number of tokens used
         total_cost (float): Total cost in USD
         total_calls (int): Total number of API calls
+        input_tokens (int): Prompt tokens used
+        output_tokens (int): Completion tokens used
     """
     def __init__(self):
         self.total_tokens = 0
         self.total_cost = 0
         self.total_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.by_model: Dict[str, Dict[str, float]] = {}
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def update(self, tokens, calls=1):
+        """Records usage known only as a token total, priced at the default rate."""
+        with self._lock:
+            self.total_tokens += tokens
+            self.total_cost += (tokens / 1000) * DEFAULT_PRICING[0]
+            self.total_calls += calls
+
+    def record_call(self, model: str, input_tokens: int, output_tokens: int,
+                    latency_seconds: Optional[float] = None, stage: str = "parse", calls: int = 1,
+                    price_factor: float = 1.0) -> float:
+        """Records one (or several aggregated) API calls.
+
+        Args:
+            model: Model that served the call
+            input_tokens: Prompt tokens
+            output_tokens: Completion tokens
+            latency_seconds: Wall-clock duration of the call, if measured
+            stage: Pipeline stage that made the call
+            calls: Number of calls the usage covers
+            price_factor: Discount applied to list prices (0.5 for the Batch API)
+
+        Returns:
+            float: Cost of the call in USD
+        """
+        input_price, output_price = get_model_pricing(model)
+        cost = (input_tokens / 1000 * input_price + output_tokens / 1000 * output_price) * price_factor
+        with self._lock:
+            self.total_tokens += input_tokens + output_tokens
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.total_cost += cost
+            self.total_calls += calls
 
-    def update(self, tokens):
-        self.total_tokens += tokens
-        self.total_cost += (tokens / 1000) * 0.002
-        self.total_calls += 1
+            model_stats = self.by_model.setdefault(
+                model, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+            )
+            model_stats["calls"] += calls
+            model_stats["input_tokens"] += input_tokens
+            model_stats["output_tokens"] += output_tokens
+            model_stats["cost_usd"] += cost
+
+            if latency_seconds is not None:
+                self.latency.setdefault(stage, LatencyHistogram()).observe(latency_seconds)
+        return cost
+
+    def record_response(self, response, latency_seconds: Optional[float] = None, stage: str = "parse") -> float:
+        """Records a chat completion response; see record_call."""
+        usage = response.usage
+        return self.record_call(
+            getattr(response, "model", None) or "unknown",
+            getattr(usage, "prompt_tokens", None) or 0,
+            getattr(usage, "completion_tokens", None) or 0,
+            latency_seconds,
+            stage
+        )
+
+    def merge(self, other: "APIUsageTracker") -> None:
+        """Adds the usage of another tracker, e.g. one of another worker process."""
+        self._add_state(other.to_dict())
+
+    def _add_state(self, other_state: Dict[str, Any]) -> None:
+        with self._lock:
+            self.total_tokens += other_state["total_tokens"]
+            self.total_cost += other_state["total_cost"]
+            self.total_calls += other_state["total_calls"]
+            self.input_tokens += other_state["input_tokens"]
+            self.output_tokens += other_state["output_tokens"]
+            for model, stats in other_state["by_model"].items():
+                model_stats = self.by_model.setdefault(
+                    model, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+                )
+                for key, value in stats.items():
+                    model_stats[key] += value
+            for stage, histogram in other_state["latency"].items():
+                self.latency.setdefault(stage, LatencyHistogram()).merge(LatencyHistogram.from_dict(histogram))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full state of the tracker (unrounded, with latency buckets), see from_dict."""
+        with self._lock:
+            return {
+                "total_tokens": self.total_tokens,
+                "total_cost": self.total_cost,
+                "total_calls": self.total_calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "by_model": {model: dict(stats) for model, stats in self.by_model.items()},
+                "latency": {stage: histogram.to_dict() for stage, histogram in self.latency.items()}
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "APIUsageTracker":
+        tracker = cls()
+        tracker._add_state(data)
+        return tracker
 
     def get_stats(self):
-        return {
-            "total_tokens": self.total_tokens,
-            "total_cost_usd": round(self.total_cost, 2),
-            "total_api_calls": self.total_calls,
-            
-        }
\ No newline at end of file
+        with self._lock:
+            return {
+                "total_tokens": self.total_tokens,
+                "total_cost_usd": round(self.total_cost, 4),
+                "total_api_calls": self.total_calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "by_model": {
+                    model: {**stats, "cost_usd": round(stats["cost_usd"], 4)}
+                    for model, stats in self.by_model.items()
+                },
+                "latency_seconds": {stage: histogram.get_stats() for stage, histogram in self.latency.items()}
+            }
+
+    def to_prometheus(self, prefix: str = "cv_parser") -> str:
+        """Renders the current metrics in the Prometheus text exposition format.
+
+        Each metric family is one block: its HELP and TYPE lines followed by
+        all of its samples, for every model or stage.
+        """
+        calls, tokens, cost, latency = [], [], [], []
+        with self._lock:
+            for model, stats in self.by_model.items():
+                calls.append(f'{prefix}_api_calls_total{{model="{model}"}} {stats["calls"]}')
+                tokens.append(f'{prefix}_tokens_total{{model="{model}",direction="input"}} {stats["input_tokens"]}')
+                tokens.append(f'{prefix}_tokens_total{{model="{model}",direction="output"}} {stats["output_tokens"]}')
+                cost.append(f'{prefix}_cost_usd_total{{model="{model}"}} {stats["cost_usd"]:.6f}')
+            for stage, histogram in self.latency.items():
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    latency.append(f'{prefix}_api_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                latency.append(f'{prefix}_api_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                latency.append(f'{prefix}_api_latency_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                latency.append(f'{prefix}_api_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines = []
+        for name, kind, description, samples in (
+            ("api_calls_total", "counter", "API calls made", calls),
+            ("tokens_total", "counter", "Tokens used, by model and direction", tokens),
+            ("cost_usd_total", "counter", "Estimated API cost in USD", cost),
+            ("api_latency_seconds", "histogram", "API call latency by stage", latency),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: Union[str, Path]) -> None:
+        """Atomically writes the metrics to a file.
+
+        ``.json`` files get get_stats(); anything else (e.g. ``.prom`` for
+        the node_exporter textfile collector) gets the Prometheus format.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with tmp_path.open("w") as f:
+            if path.suffix == ".json":
+                json.dump(self.get_stats(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+class MetricsFileExporter:
+    """Periodically writes a tracker's metrics to a file during long runs.
+
+    Usage:
+        with MetricsFileExporter(api_tracker, "metrics/cv_parser.prom"):
+            process_resumes(...)
+    """
+    def __init__(self, api_tracker: APIUsageTracker, path: Union[str, Path], interval_seconds: float = 15.0):
+        self.api_tracker = api_tracker
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self._export()
+
+    def _export(self) -> None:
+        try:
+            self.api_tracker.write_metrics(self.path)
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {self.path}: {str(e)}")
+
+    def start(self) -> "MetricsFileExporter":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._export()
+
+    def __enter__(self) -> "MetricsFileExporter":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
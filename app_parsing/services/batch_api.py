@@ -0,0 +1,250 @@
+#cv parsing 2/app_parsing/services/batch_api.py
+
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from app_parsing.services.api_tracker import APIUsageTracker
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.disk_cache import DiskCache
+from app_parsing.services.document_loader import DocumentLoader
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.resume_processor import (
+    PARSE_MAX_TOKENS,
+    PARSE_MODEL,
+    PERMANENT,
+    TRANSIENT,
+    MalformedResponseError,
+    ResultRecorder,
+    _build_messages,
+    _cache_variants,
+    _failure_record,
+    _run_fast_path,
+    _success_record,
+    compute_cache_key,
+    load_parsed_response
+)
+from app_parsing.services.text_preprocessor import TextPreprocessor
+from app_parsing.utils.jsonl import JsonlWriter, read_summary, summary_path, write_summary
+from app_parsing.utils.prompts import PROMPT_TEMPLATE
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# The Batch API bills at half the synchronous price
+BATCH_PRICE_FACTOR = 0.5
+# Limits of one Batch API input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_FILE_BYTES = 200 * 1024 * 1024
+
+
+def batch_file_path(requests_path: Union[str, Path], index: int) -> Path:
+    """Path of the index-th requests file of a batch submission (the first is requests_path)."""
+    requests_path = Path(requests_path)
+    if index == 0:
+        return requests_path
+    return requests_path.with_name(f"{requests_path.stem}.part{index + 1:03d}{requests_path.suffix}")
+
+
+def write_batch_requests(cv_file_paths: List[str], requests_path: Union[str, Path],
+                         preprocessor: Optional[TextPreprocessor] = None,
+                         fast_extractor: Optional[FastExtractor] = None,
+                         max_requests: int = MAX_BATCH_REQUESTS, max_bytes: int = MAX_BATCH_FILE_BYTES) -> List[Path]:
+    """Writes one Batch API request per resume.
+
+    Requests go to requests_path and, when they exceed the per-file limits
+    of the Batch API, to further ``<name>.partNNN.jsonl`` files; each file
+    is uploaded as its own batch with ``purpose="batch"``. A
+    ``<name>.summary.json`` file next to the first one maps each custom_id
+    to its resume and records the resumes whose text could not be
+    extracted, so that ingest_batch_results can rebuild the full run
+    output from the outputs of all the batches.
+
+    Args:
+        cv_file_paths: Resume files to parse
+        requests_path: Batch input JSONL file to write
+        preprocessor: Cleans the extracted text before prompting, as in
+            process_resumes
+        fast_extractor: Extracts fields locally, as in process_resumes; they
+            are kept in the summary and merged back at ingestion
+        max_requests: Maximum requests per file
+        max_bytes: Maximum size of a file
+
+    Returns:
+        List[Path]: The requests files, one per batch to create
+    """
+    requests_path = Path(requests_path)
+    requests_path.parent.mkdir(parents=True, exist_ok=True)
+    variants = _cache_variants({"preprocessor": preprocessor, "fast_extractor": fast_extractor})
+    resumes: Dict[str, dict] = {}
+    files = [requests_path]
+    file_bytes = 0
+
+    writer = JsonlWriter(requests_path)
+    try:
+        for index, path in enumerate(Path(path) for path in cv_file_paths):
+            custom_id = f"cv-{index:06d}"
+            entry = {"source_path": str(path)}
+            try:
+                resume_text = DocumentLoader.load_document(path)
+                fast_fields = _run_fast_path(fast_extractor, resume_text, entry)
+                if fast_fields is not None:
+                    entry["fast_fields"] = fast_fields
+                if preprocessor is not None:
+                    resume_text, entry["preprocessing"] = preprocessor.process(resume_text)
+                entry["cache_key"] = compute_cache_key(path, PROMPT_TEMPLATE, PARSE_MODEL, *variants)
+            except Exception as e:
+                logging.error(f"Extraction failed for {path.name}. Error: {str(e)}")
+                entry["error"] = str(e)
+                resumes[custom_id] = entry
+                continue
+
+            request = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": PARSE_MODEL,
+                    "messages": _build_messages(resume_text, fast_fields),
+                    "max_tokens": PARSE_MAX_TOKENS,
+                    "temperature": 0
+                }
+            }
+            # Same encoding as JsonlWriter.write
+            size = len(json.dumps(request, ensure_ascii=False).encode("utf-8")) + 1
+            if writer.count and (writer.count >= max_requests or file_bytes + size > max_bytes):
+                writer.close()
+                files.append(batch_file_path(requests_path, len(files)))
+                writer = JsonlWriter(files[-1])
+                file_bytes = 0
+            writer.write(request)
+            file_bytes += size
+            resumes[custom_id] = entry
+    finally:
+        writer.close()
+
+    requests_written = sum(1 for entry in resumes.values() if "error" not in entry)
+    write_summary(requests_path, {
+        "created_at": datetime.now().isoformat(),
+        "model": PARSE_MODEL,
+        "total_requests": requests_written,
+        "files": [str(path) for path in files],
+        "requests": resumes
+    })
+    logging.info(f"Wrote {requests_written} batch requests to {len(files)} file(s) starting at {requests_path}")
+    return files
+
+
+def _iter_results(results_paths: Iterable[Union[str, Path]]):
+    """Yields the lines of Batch API output files (JSONL, whatever their suffix)."""
+    for results_path in results_paths:
+        with Path(results_path).open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _result_record(result: dict, path: Path, entry: dict, api_tracker: APIUsageTracker,
+                   cache: Optional[DiskCache]) -> dict:
+    """Turns one line of a Batch API output file into a parse record."""
+    response = result.get("response") or {}
+    body = response.get("body") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        error = result.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+        return _failure_record(path, RuntimeError(json.dumps(error) if isinstance(error, dict) else str(error)),
+                               error_class=TRANSIENT)
+
+    usage = body.get("usage") or {}
+    input_tokens, output_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    api_tracker.record_call(body.get("model") or PARSE_MODEL, input_tokens, output_tokens,
+                            stage="parse", price_factor=BATCH_PRICE_FACTOR)
+    record_usage = {
+        "tokens_used": usage.get("total_tokens", input_tokens + output_tokens),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "api_calls": 1
+    }
+    try:
+        # Repair is local only: a fix-up call would defeat the batch discount
+        parsed_data, repaired = load_parsed_response(body["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError) as e:
+        return _failure_record(path, MalformedResponseError(f"Unexpected batch result: {str(e)}"), record_usage)
+    except MalformedResponseError as e:
+        return _failure_record(path, e, record_usage)
+
+    if "fast_fields" in entry:
+        FastExtractor.merge(parsed_data, entry["fast_fields"])
+    if cache is not None and entry.get("cache_key"):
+        cache.put(entry["cache_key"], parsed_data)
+    extra_metadata = {"batch_custom_id": result.get("custom_id")}
+    if repaired:
+        extra_metadata["json_repair"] = "local"
+    for key in ("preprocessing", "fast_path"):
+        if key in entry:
+            extra_metadata[key] = entry[key]
+    return _success_record(parsed_data, path, record_usage, extra_metadata)
+
+
+def ingest_batch_results(results_paths: Union[str, Path, List[Union[str, Path]]], requests_path: Union[str, Path],
+                         output_json_path: str = "parsed_resumes.json", cache_dir: Optional[str] = None,
+                         output_format: str = "json", repository: Optional[CandidateRepository] = None) -> Path:
+    """Builds the parsing output of a run from Batch API output files.
+
+    Produces the same records and statistics as process_resumes. Resumes
+    whose extraction failed at submission, whose request failed or that
+    are missing from the output files are reported as failures.
+
+    Args:
+        results_paths: Batch output JSONL file downloaded from the API, or
+            one per batch when the requests were split over several files
+        requests_path: Requests file written by write_batch_requests
+        output_json_path: Path for the output JSON file
+        cache_dir: Parse cache to fill with the results, None to skip
+        output_format: "json" or "jsonl", see process_resumes
+        repository: Candidate repository to fill, see process_resumes
+
+    Returns:
+        Path: Path of the generated JSON file
+    """
+    start_time = time.time()
+    if isinstance(results_paths, (str, Path)):
+        results_paths = [results_paths]
+    if not summary_path(requests_path).exists():
+        raise FileNotFoundError(f"No batch summary next to {requests_path}; was it written by write_batch_requests?")
+    resumes: Dict[str, dict] = read_summary(requests_path)["requests"]
+    api_tracker = APIUsageTracker()
+    cache = DiskCache(cache_dir) if cache_dir else None
+    recorder = ResultRecorder(output_json_path, output_format, repository)
+    seen = set()
+    unknown = 0
+
+    for result in _iter_results(results_paths):
+        custom_id = result.get("custom_id")
+        entry = resumes.get(custom_id)
+        if entry is None or custom_id in seen:
+            unknown += 1
+            continue
+        seen.add(custom_id)
+        recorder.add(_result_record(result, Path(entry["source_path"]), entry, api_tracker, cache))
+
+    missing = 0
+    for custom_id, entry in resumes.items():
+        if custom_id in seen:
+            continue
+        if "error" not in entry:
+            missing += 1
+        recorder.add(_failure_record(Path(entry["source_path"]),
+                                     ValueError(entry.get("error", "No result in the batch output")),
+                                     error_class=PERMANENT if "error" in entry else TRANSIENT))
+
+    if unknown:
+        logging.warning(f"Ignored {unknown} results with unknown or duplicate custom_id")
+    return recorder.finish(time.time() - start_time, api_tracker, cache, batch={
+        "results_files": [str(path) for path in results_paths],
+        "requests_file": str(requests_path),
+        "results": len(seen),
+        "missing_results": missing,
+        "ignored_results": unknown,
+        "price_factor": BATCH_PRICE_FACTOR
+    })
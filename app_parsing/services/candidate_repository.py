@@ -0,0 +1,310 @@
+#cv parsing 2/app_parsing/services/candidate_repository.py
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from app_parsing.utils.jsonl import iter_records, read_summary
+
+REPOSITORY_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+SKILL_KINDS = ("Technical Skills", "Soft Skills")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resumes (
+    id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL UNIQUE,
+    filename TEXT,
+    file_type TEXT,
+    success INTEGER NOT NULL,
+    error TEXT,
+    full_name TEXT,
+    professional_title TEXT COLLATE NOCASE,
+    seniority TEXT COLLATE NOCASE,
+    years_experience REAL,
+    record_json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS skills (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS resume_skills (
+    resume_id INTEGER NOT NULL REFERENCES resumes(id) ON DELETE CASCADE,
+    skill_id INTEGER NOT NULL REFERENCES skills(id),
+    kind INTEGER NOT NULL,
+    PRIMARY KEY (resume_id, skill_id, kind)
+);
+CREATE TABLE IF NOT EXISTS run_summary (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resumes_success ON resumes(success);
+CREATE INDEX IF NOT EXISTS idx_resumes_title ON resumes(professional_title);
+CREATE INDEX IF NOT EXISTS idx_resumes_seniority ON resumes(seniority);
+CREATE INDEX IF NOT EXISTS idx_resumes_years ON resumes(years_experience);
+CREATE INDEX IF NOT EXISTS idx_resume_skills_skill ON resume_skills(skill_id, resume_id);
+"""
+
+
+def _years(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value: Any) -> Optional[str]:
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+class CandidateRepository:
+    """SQLite store of parsed resumes, indexed for candidate lookups.
+
+    Each record is kept whole (as JSON) next to normalised columns: skills
+    in their own table, case-insensitive indexes on professional title and
+    seniority level, and indexes on years of experience and parse success.
+    A record is keyed by its source path, so writing a resume again
+    replaces it.
+
+    Records passed to add() are buffered and written in one transaction
+    per ``batch_size`` records. The repository is safe to share between
+    threads.
+
+    Attributes:
+        db_path (Path): SQLite database file
+        batch_size (int): Records written per transaction
+        written (int): Records written by this instance
+    """
+    DEFAULT_BATCH_SIZE = 100
+    # Records read per query by find_candidates
+    PAGE_SIZE = 500
+
+    def __init__(self, db_path: Union[str, Path], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._skill_ids: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def is_repository(path: Union[str, Path]) -> bool:
+        return Path(path).suffix.lower() in REPOSITORY_SUFFIXES
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Buffers a parsed resume record, writing the buffer when it is full."""
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Writes records in batched transactions and returns how many were written."""
+        count = 0
+        for record in records:
+            self.add(record)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self) -> None:
+        """Writes the buffered records in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            try:
+                with self._conn:
+                    for record in self._pending:
+                        self._write(record)
+            except Exception:
+                # Skills inserted by the rolled back transaction do not exist
+                self._skill_ids.clear()
+                raise
+            self.written += len(self._pending)
+            self._pending = []
+
+    def _skill_id(self, name: str) -> int:
+        key = name.lower()
+        if key not in self._skill_ids:
+            self._conn.execute("INSERT OR IGNORE INTO skills (name) VALUES (?)", (name,))
+            self._skill_ids[key] = self._conn.execute("SELECT id FROM skills WHERE name = ?", (name,)).fetchone()[0]
+        return self._skill_ids[key]
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        metadata = record.get("_metadata") or {}
+        source_path = metadata.get("source_path") or metadata.get("filename")
+        if not source_path:
+            logging.warning("Skipping a record without source path or filename")
+            return
+        summary = record.get("Professional Summary")
+        evaluation = record.get("HR Evaluation")
+        self._conn.execute("DELETE FROM resumes WHERE source_path = ?", (source_path,))
+        resume_id = self._conn.execute(
+            "INSERT INTO resumes (source_path, filename, file_type, success, error, full_name, professional_title,"
+            " seniority, years_experience, record_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                source_path,
+                metadata.get("filename"),
+                metadata.get("file_type"),
+                int(bool(metadata.get("success", False))),
+                metadata.get("error"),
+                _text(record.get("Full Name")),
+                _text(record.get("Professional Title")),
+                _text(evaluation.get("Seniority Level")) if isinstance(evaluation, dict) else None,
+                _years(summary.get("Years of Experience")) if isinstance(summary, dict) else None,
+                json.dumps(record, ensure_ascii=False)
+            )
+        ).lastrowid
+
+        skills = record.get("Skills")
+        rows = set()
+        for kind, key in enumerate(SKILL_KINDS):
+            values = skills.get(key) if isinstance(skills, dict) else None
+            for skill in values if isinstance(values, list) else []:
+                if name := _text(skill):
+                    rows.add((resume_id, self._skill_id(name), kind))
+        self._conn.executemany("INSERT INTO resume_skills (resume_id, skill_id, kind) VALUES (?, ?, ?)", rows)
+
+    def remove(self, source_paths: Iterable[str]) -> int:
+        """Deletes the records of the given source paths and returns how many existed."""
+        with self._lock:
+            self.flush()
+            with self._conn:
+                cursor = self._conn.executemany("DELETE FROM resumes WHERE source_path = ?",
+                                                ((str(path),) for path in source_paths))
+            return cursor.rowcount
+
+    def find_candidates(self, any_skills: Optional[Iterable[str]] = None,
+                        all_skills: Optional[Iterable[str]] = None, min_years: Optional[float] = None,
+                        max_years: Optional[float] = None, seniority: Optional[str] = None,
+                        title: Optional[str] = None, successful_only: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yields the records matching every given criterion, in insertion order.
+
+        Records are read PAGE_SIZE at a time (keyset pagination on the row
+        id), so memory does not grow with the number of matches and writers
+        are not blocked while the caller consumes them.
+
+        Skill, title and seniority comparisons are case-insensitive; titles
+        must match exactly. Resumes without years of experience never match
+        min_years or max_years.
+
+        Args:
+            any_skills: Keep resumes listing at least one of these skills
+            all_skills: Keep resumes listing all of these skills
+            min_years: Minimum years of experience
+            max_years: Maximum years of experience
+            seniority: HR evaluation seniority level, e.g. "Senior"
+            title: Professional title
+            successful_only: Skip failed parses
+
+        Yields:
+            dict: One parsed resume record at a time
+        """
+        clauses, params = [], []
+        if successful_only:
+            clauses.append("r.success = 1")
+        if any_skills is not None:
+            any_skills = list(dict.fromkeys(any_skills))
+            clauses.append(
+                "r.id IN (SELECT rs.resume_id FROM resume_skills rs JOIN skills s ON s.id = rs.skill_id"
+                f" WHERE s.name IN ({', '.join('?' * len(any_skills))}))"
+            )
+            params.extend(any_skills)
+        if all_skills is not None:
+            all_skills = list({skill.lower(): skill for skill in all_skills}.values())
+            if all_skills:
+                clauses.append(
+                    "r.id IN (SELECT rs.resume_id FROM resume_skills rs JOIN skills s ON s.id = rs.skill_id"
+                    f" WHERE s.name IN ({', '.join('?' * len(all_skills))})"
+                    " GROUP BY rs.resume_id HAVING COUNT(DISTINCT rs.skill_id) = ?)"
+                )
+                params.extend(all_skills + [len(all_skills)])
+        for clause, value in (("r.years_experience >= ?", min_years), ("r.years_experience <= ?", max_years),
+                              ("r.seniority = ?", seniority), ("r.professional_title = ?", title)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+
+        query = "SELECT r.id, r.record_json FROM resumes r WHERE " + " AND ".join(clauses + ["r.id > ?"])
+        query += " ORDER BY r.id LIMIT ?"
+        last_id = 0
+        while True:
+            with self._lock:
+                self.flush()
+                rows = self._conn.execute(query, params + [last_id, self.PAGE_SIZE]).fetchall()
+            for last_id, record_json in rows:
+                yield json.loads(record_json)
+            if len(rows) < self.PAGE_SIZE:
+                return
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yields every record, failed parses included."""
+        return self.find_candidates(successful_only=False)
+
+    def set_statistics(self, statistics: Dict[str, Any]) -> None:
+        """Stores the statistics block of the last run written to the repository."""
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO run_summary (key, value) VALUES ('statistics', ?)",
+                                   (json.dumps(statistics),))
+
+    def read_summary(self) -> Dict[str, Any]:
+        """Returns {"statistics": ...} of the last run, like utils.jsonl.read_summary."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM run_summary WHERE key = 'statistics'").fetchone()
+        return {"statistics": json.loads(row[0])} if row else {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self.flush()
+            resumes, successful = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(success), 0) FROM resumes").fetchone()
+            skills = self._conn.execute("SELECT COUNT(*) FROM skills").fetchone()[0]
+        return {"path": str(self.db_path), "resumes": resumes, "successful": successful, "skills": skills}
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def __enter__(self) -> "CandidateRepository":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def import_records(records_path: Union[str, Path], db_path: Union[str, Path]) -> Dict[str, Any]:
+    """Loads an existing parsing output (.json or .jsonl) into a repository.
+
+    Returns:
+        dict: Repository statistics after the import
+    """
+    with CandidateRepository(db_path) as repository:
+        repository.add_many(iter_records(records_path, key="resumes"))
+        if statistics := read_summary(records_path).get("statistics"):
+            repository.set_statistics(statistics)
+        return repository.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load parsing results into a SQLite candidate repository.")
+    parser.add_argument("records", nargs="?", default="app_parsing/data/output/parsed_resumes.json",
+                        help="parsed_resumes.json(l)")
+    parser.add_argument("--db", default="app_parsing/data/output/candidates.db", help="Repository file")
+    args = parser.parse_args()
+    print(f"Repository: {import_records(args.records, args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#cv parsing 2/app_parsing/services/columnar_store.py
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from app_parsing.utils.jsonl import iter_records, read_summary, resolve_records_path
+
+STORE_SUFFIX = ".npz"
+STORE_VERSION = 1
+SENIORITY_LEVELS = ("Junior", "Mid", "Senior", "Executive")
+SKILL_KINDS = ("Technical Skills", "Soft Skills")
+# Code of a missing or unrecognised seniority level
+UNKNOWN = -1
+
+
+class _Vocabulary:
+    """Assigns ids to strings, case-insensitively; the first spelling seen is kept."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def id(self, name: str) -> int:
+        key = name.strip().lower()
+        if key not in self.ids:
+            self.ids[key] = len(self.names)
+            self.names.append(name.strip())
+        return self.ids[key]
+
+
+def _str_column(values: List[str]) -> np.ndarray:
+    # Fixed-width unicode keeps the file loadable without pickle
+    return np.array(values, dtype=str) if values else np.zeros(0, dtype="U1")
+
+
+def _years(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _seniority(value: Any) -> int:
+    if isinstance(value, str):
+        for code, level in enumerate(SENIORITY_LEVELS):
+            if value.strip().lower() == level.lower():
+                return code
+    return UNKNOWN
+
+
+def _timestamp(value: Any) -> str:
+    """ISO timestamp for a datetime64 column: aware values in UTC, naive ones as written."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return "NaT"
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def _write(store_path: Path, kind: str, summary: Dict[str, Any], columns: Dict[str, np.ndarray]) -> Path:
+    """Atomically writes a store file."""
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.with_name(f"{store_path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        np.savez_compressed(
+            f,
+            store_kind=np.array(kind),
+            store_version=np.array(STORE_VERSION),
+            summary_json=np.array(json.dumps(summary)),
+            **columns
+        )
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def export_resumes(records_path: Union[str, Path], store_path: Optional[Union[str, Path]] = None) -> Path:
+    """Flattens a parsing output into a columnar store.
+
+    The records (.json or streamed .jsonl) are read one at a time. The
+    store holds one typed column per field for the resumes table, an
+    exploded skills table (one row per resume and skill) and the run
+    statistics.
+
+    Resume columns: filename, source_path, file_type, success, error,
+    cache_hit, tokens_used, input_tokens, output_tokens, api_calls,
+    full_name, professional_title, years_experience (NaN when missing),
+    seniority (code into seniority_levels, -1 when unknown).
+
+    Skills table: skill_row (row of the resume), skill_id (into
+    skill_vocab, case-insensitive) and skill_kind (into skill_kinds).
+
+    Args:
+        records_path: parsed_resumes.json or .jsonl
+        store_path: Output file, the records path with a .npz suffix by default
+
+    Returns:
+        Path: Path of the store
+    """
+    records_path = resolve_records_path(records_path)
+    store_path = Path(store_path) if store_path else records_path.with_suffix(STORE_SUFFIX)
+    text = {name: [] for name in ("filename", "source_path", "file_type", "error", "full_name",
+                                  "professional_title")}
+    numbers = {name: [] for name in ("tokens_used", "input_tokens", "output_tokens", "api_calls")}
+    flags = {name: [] for name in ("success", "cache_hit")}
+    years, seniority = [], []
+    skill_rows, skill_ids, skill_kinds = [], [], []
+    vocabulary = _Vocabulary()
+
+    for row, resume in enumerate(iter_records(records_path, key="resumes")):
+        metadata = resume.get("_metadata") or {}
+        for name in ("filename", "source_path", "file_type", "error"):
+            text[name].append(str(metadata.get(name) or ""))
+        for name in numbers:
+            numbers[name].append(int(metadata.get(name) or 0))
+        for name in flags:
+            flags[name].append(bool(metadata.get(name, False)))
+        text["full_name"].append(str(resume.get("Full Name") or ""))
+        text["professional_title"].append(str(resume.get("Professional Title") or ""))
+
+        summary = resume.get("Professional Summary")
+        years.append(_years(summary.get("Years of Experience")) if isinstance(summary, dict) else np.nan)
+        evaluation = resume.get("HR Evaluation")
+        seniority.append(_seniority(evaluation.get("Seniority Level")) if isinstance(evaluation, dict) else UNKNOWN)
+
+        skills = resume.get("Skills")
+        for kind, key in enumerate(SKILL_KINDS):
+            values = skills.get(key) if isinstance(skills, dict) else None
+            seen = set()
+            for skill in values if isinstance(values, list) else []:
+                if isinstance(skill, str) and skill.strip():
+                    skill_id = vocabulary.id(skill)
+                    if skill_id not in seen:
+                        seen.add(skill_id)
+                        skill_rows.append(row)
+                        skill_ids.append(skill_id)
+                        skill_kinds.append(kind)
+
+    columns = {name: _str_column(values) for name, values in text.items()}
+    columns.update({name: np.array(values, dtype=np.int64) for name, values in numbers.items()})
+    columns.update({name: np.array(values, dtype=bool) for name, values in flags.items()})
+    columns.update({
+        "years_experience": np.array(years, dtype=np.float64),
+        "seniority": np.array(seniority, dtype=np.int8),
+        "seniority_levels": _str_column(list(SENIORITY_LEVELS)),
+        "skill_row": np.array(skill_rows, dtype=np.int64),
+        "skill_id": np.array(skill_ids, dtype=np.int32),
+        "skill_kind": np.array(skill_kinds, dtype=np.int8),
+        "skill_kinds": _str_column(list(SKILL_KINDS)),
+        "skill_vocab": _str_column(vocabulary.names)
+    })
+    _write(store_path, "resumes", read_summary(records_path), columns)
+    logging.info(f"Exported {len(text['filename'])} resumes and {len(skill_rows)} skills to {store_path}")
+    return store_path
+
+
+def export_emails(records_path: Union[str, Path], store_path: Optional[Union[str, Path]] = None) -> Path:
+    """Flattens an email generation output into a columnar store.
+
+    Email columns: candidate_name, match_score (NaN when missing),
+    timestamp (datetime64, NaT when missing; timestamps with an offset are
+    converted to UTC). Matched skills are exploded into skill_row /
+    skill_id over skill_vocab, as for resumes.
+
+    Args:
+        records_path: generated_emails_<timestamp>.json or .jsonl
+        store_path: Output file, the records path with a .npz suffix by default
+
+    Returns:
+        Path: Path of the store
+    """
+    records_path = resolve_records_path(records_path)
+    store_path = Path(store_path) if store_path else records_path.with_suffix(STORE_SUFFIX)
+    names, scores, timestamps = [], [], []
+    skill_rows, skill_ids = [], []
+    vocabulary = _Vocabulary()
+
+    for row, email in enumerate(iter_records(records_path, key="emails")):
+        email_data = email.get("email_data") or {}
+        names.append(str(email.get("candidate_name") or ""))
+        try:
+            scores.append(float(str(email_data.get("match_score", "")).strip("%")))
+        except ValueError:
+            scores.append(np.nan)
+        timestamps.append(_timestamp(email.get("timestamp")))
+        # calculate_match_score writes "matching_skills"; older outputs "matched_skills"
+        details = email_data.get("match_details") or {}
+        for skill in details.get("matching_skills", details.get("matched_skills", [])):
+            skill_rows.append(row)
+            skill_ids.append(vocabulary.id(skill))
+
+    _write(store_path, "emails", read_summary(records_path), {
+        "candidate_name": _str_column(names),
+        "match_score": np.array(scores, dtype=np.float64),
+        "timestamp": np.array(timestamps, dtype="datetime64[us]"),
+        "skill_row": np.array(skill_rows, dtype=np.int64),
+        "skill_id": np.array(skill_ids, dtype=np.int32),
+        "skill_vocab": _str_column(vocabulary.names)
+    })
+    logging.info(f"Exported {len(names)} emails to {store_path}")
+    return store_path
+
+
+class ColumnarStore:
+    """Read access to a store written by export_resumes or export_emails.
+
+    Columns are NumPy arrays, loaded lazily by name (``store["success"]``).
+
+    Attributes:
+        path (Path): Store file
+        kind (str): "resumes" or "emails"
+        summary (dict): Run statistics of the exported output
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._data = np.load(self.path, allow_pickle=False)
+        self.kind = str(self._data["store_kind"])
+        self.summary = json.loads(str(self._data["summary_json"]))
+
+    @staticmethod
+    def is_store(path: Union[str, Path]) -> bool:
+        return Path(path).suffix == STORE_SUFFIX
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self._data[column]
+
+    def __len__(self) -> int:
+        return len(self["candidate_name" if self.kind == "emails" else "filename"])
+
+    @property
+    def columns(self) -> List[str]:
+        return [name for name in self._data.files
+                if name not in ("store_kind", "store_version", "summary_json")]
+
+    def skill_counts(self, rows: Optional[np.ndarray] = None, kind: Optional[str] = None) -> Dict[str, int]:
+        """Number of records listing each skill, most common first.
+
+        Args:
+            rows: Boolean mask over the records to count, all by default
+            kind: "Technical Skills" or "Soft Skills" (resume stores only)
+        """
+        skill_rows, skill_ids = self["skill_row"], self["skill_id"]
+        keep = np.ones(len(skill_ids), dtype=bool)
+        if rows is not None:
+            keep &= rows[skill_rows]
+        if kind is not None:
+            keep &= self["skill_kind"] == SKILL_KINDS.index(kind)
+        vocab = self["skill_vocab"]
+        counts = np.bincount(skill_ids[keep], minlength=len(vocab))
+        order = np.argsort(-counts, kind="stable")
+        return {str(vocab[i]): int(counts[i]) for i in order if counts[i]}
+
+    def close(self) -> None:
+        self._data.close()
+
+    def __enter__(self) -> "ColumnarStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export parsing or email results to a columnar .npz store.")
+    parser.add_argument("records", nargs="?", default="app_parsing/data/output/parsed_resumes.json",
+                        help="parsed_resumes.json(l) or generated_emails_*.json(l)")
+    parser.add_argument("--emails", action="store_true", help="The records are generated emails")
+    parser.add_argument("--output", default=None, help="Store file (default: the records path with .npz)")
+    args = parser.parse_args()
+
+    export = export_emails if args.emails else export_resumes
+    print(f"Store written to {export(args.records, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
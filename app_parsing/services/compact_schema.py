@@ -0,0 +1,209 @@
+#cv parsing 2/app_parsing/services/compact_schema.py
+
+import json
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from app_parsing.utils.prompts import PROMPT_TEMPLATE
+
+VALUE, LIST = "value", "list"
+
+
+class Group(NamedTuple):
+    """An object written as a positional array of its slots."""
+    slots: Tuple[Tuple[str, Any], ...]
+
+
+class Rows(NamedTuple):
+    """A list of objects, each written as a positional array of its slots."""
+    slots: Tuple[Tuple[str, Any], ...]
+
+
+# Slots are (path in the full record, kind); "/" nests, so "Period/Start
+# Date" flattens the Period object into the work experience row
+WORK_EXPERIENCE = Rows((
+    ("Title", VALUE), ("Company", VALUE), ("Location", VALUE),
+    ("Period/Start Date", VALUE), ("Period/End Date", VALUE),
+    ("Achievements", LIST), ("Technologies Used", LIST),
+    ("Management Scope/Team Size", VALUE), ("Management Scope/Budget Responsibility", VALUE)
+))
+EDUCATION = Rows((
+    ("Degree", VALUE), ("Field of Study", VALUE), ("Institution", VALUE), ("Location", VALUE),
+    ("Graduation Date", VALUE), ("GPA", VALUE)
+))
+LANGUAGES = Rows((("Language", VALUE), ("Proficiency", VALUE)))
+CERTIFICATIONS = Rows((("Name", VALUE), ("Issuer", VALUE), ("Date", VALUE), ("Expiry", VALUE)))
+
+# (short key, full key, kind), in the order of PROMPT_TEMPLATE
+COMPACT_LAYOUT = (
+    ("n", "Full Name", VALUE),
+    ("t", "Professional Title", VALUE),
+    ("c", "Contact Information", Group((("Email", VALUE), ("Phone", VALUE), ("LinkedIn", VALUE),
+                                        ("Location", VALUE)))),
+    ("s", "Professional Summary", Group((("Executive Summary", VALUE), ("Years of Experience", VALUE),
+                                         ("Industry Focus", LIST)))),
+    ("w", "Work Experience", WORK_EXPERIENCE),
+    ("e", "Education", EDUCATION),
+    ("k", "Skills", Group((("Technical Skills", LIST), ("Soft Skills", LIST), ("Languages", LANGUAGES)))),
+    ("r", "Certifications", CERTIFICATIONS),
+    ("h", "HR Evaluation", Group((("Key Strengths", LIST), ("Potential Roles", LIST), ("Seniority Level", VALUE),
+                                  ("Cultural Indicators", LIST), ("Development Areas", LIST))))
+)
+
+# Models that accept a JSON schema response format; the others only get JSON mode
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+JSON_MODE_MODELS = ("gpt-3.5-turbo", "gpt-4-turbo")
+
+
+def _describe(kind, name: str) -> str:
+    """Placeholder text of one slot in the layout shown to the model."""
+    label = name.split("/")[-1]
+    if kind == VALUE:
+        return json.dumps(label)
+    if kind == LIST:
+        return f"[{json.dumps(label)}, ...]"
+    row = ", ".join(_describe(slot_kind, slot_name) for slot_name, slot_kind in kind.slots)
+    return f"[[{row}], ...]" if isinstance(kind, Rows) else f"[{row}]"
+
+
+def describe_layout() -> str:
+    """The compact layout as the JSON-like sketch used in the prompt."""
+    lines = [f'  "{short}": {_describe(kind, name)}' for short, name, kind in COMPACT_LAYOUT]
+    return "{\n" + ",\n".join(lines) + "\n}"
+
+
+COMPACT_PROMPT_TEMPLATE = PROMPT_TEMPLATE.split("Resume Text:")[0].rstrip() + """
+7. Answer in the compact form below, never with the field names above: one-letter keys, and positional arrays whose elements follow exactly the order shown. Keep every position; use null for a missing value and [] for a missing list
+
+Compact form:
+""" + describe_layout().replace("{", "{{").replace("}", "}}") + """
+
+Resume Text:
+{resume_text}
+"""
+
+
+def _get_path(record: Any, path: str) -> Any:
+    for name in path.split("/"):
+        record = record.get(name) if isinstance(record, dict) else None
+    return record
+
+
+def _expand(value: Any, kind) -> Any:
+    if kind == VALUE:
+        return value
+    if kind == LIST:
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+    if isinstance(kind, Rows):
+        return [_expand_row(row, kind.slots) for row in value or [] if isinstance(row, (list, dict))]
+    return _expand_row(value, kind.slots)
+
+
+def _expand_row(values: Any, slots) -> Dict[str, Any]:
+    if isinstance(values, dict):
+        # The model used the full field names for this object
+        return values
+    values = values if isinstance(values, list) else []
+    record: Dict[str, Any] = {}
+    for index, (path, kind) in enumerate(slots):
+        *parents, name = path.split("/")
+        target = record
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = _expand(values[index] if index < len(values) else None, kind)
+    return record
+
+
+def _compress(value: Any, kind) -> Any:
+    if kind in (VALUE, LIST):
+        return value
+    if isinstance(kind, Rows):
+        return [[_compress(_get_path(row, path), slot_kind) for path, slot_kind in kind.slots]
+                for row in value or [] if isinstance(row, dict)]
+    return [_compress(_get_path(value, path), slot_kind) for path, slot_kind in kind.slots]
+
+
+def _slot_schema(kind) -> Dict[str, Any]:
+    if kind == VALUE:
+        return {"type": ["string", "number", "null"]}
+    if kind == LIST:
+        return {"type": "array", "items": {"type": "string"}}
+    row = {"type": "array", "prefixItems": [_slot_schema(slot_kind) for _, slot_kind in kind.slots],
+           "items": False}
+    return {"type": "array", "items": row} if isinstance(kind, Rows) else row
+
+
+class CompactSchema:
+    """Compact output mode of the parse prompt.
+
+    The full layout repeats long field names such as "Technologies Used"
+    or "Budget Responsibility" in every work experience, and completion
+    tokens dominate parse latency. In compact mode the model answers with
+    one-letter keys and positional arrays (see COMPACT_LAYOUT); ``expand``
+    rebuilds the exact record layout of the normal prompt, so everything
+    downstream (EmailPersonalizer, analysis scripts, caches) is unchanged.
+
+    Where the model supports it, the request also carries the layout as a
+    JSON schema response format, or at least enables JSON mode.
+    """
+
+    @property
+    def signature(self) -> str:
+        """Identifies the prompt variant; part of the parse cache key."""
+        return "compact-output-v1"
+
+    @property
+    def prompt_template(self) -> str:
+        return COMPACT_PROMPT_TEMPLATE
+
+    @staticmethod
+    def json_schema() -> Dict[str, Any]:
+        """JSON schema of a compact answer."""
+        return {
+            "type": "object",
+            "properties": {short: _slot_schema(kind) for short, _, kind in COMPACT_LAYOUT},
+            "required": [short for short, _, _ in COMPACT_LAYOUT],
+            "additionalProperties": False
+        }
+
+    def response_format(self, model: str) -> Optional[Dict[str, Any]]:
+        """Response format enforcing the compact answer, None if unsupported.
+
+        Args:
+            model: Model the request is sent to
+
+        Returns:
+            dict: A "json_schema" response format for models with structured
+                outputs, "json_object" for models with JSON mode only
+        """
+        if model.startswith(STRUCTURED_OUTPUT_MODELS):
+            # Not strict: strict mode does not accept positional (prefixItems) arrays
+            return {"type": "json_schema",
+                    "json_schema": {"name": "compact_resume", "schema": self.json_schema(), "strict": False}}
+        if model.startswith(JSON_MODE_MODELS):
+            return {"type": "json_object"}
+        return None
+
+    @staticmethod
+    def expand(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuilds the full record layout from a compact answer.
+
+        Every field of the layout is present in the result; missing values
+        are None and missing lists empty. An answer already written with
+        the full field names is returned unchanged.
+
+        Args:
+            data: Decoded compact answer
+
+        Returns:
+            dict: Parsed resume with the field names of PROMPT_TEMPLATE
+        """
+        if "Full Name" in data:
+            return data
+        return {name: _expand(data.get(short), kind) for short, name, kind in COMPACT_LAYOUT}
+
+    @staticmethod
+    def compress(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Writes a full parsed resume in the compact layout; inverse of expand."""
+        return {short: _compress(record.get(name), kind) for short, name, kind in COMPACT_LAYOUT}
@@ -0,0 +1,205 @@
+#cv parsing 2/app_parsing/services/corpus_manifest.py
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Union
+
+from app_parsing.services.document_loader import DocumentLoader
+from app_parsing.services.resume_processor import compute_format_statistics
+from app_parsing.utils.hashing import file_sha256
+
+
+def iter_resume_files(root: Union[str, Path]) -> Iterator[os.DirEntry]:
+    """Recursively yields supported resume files below a directory.
+
+    Args:
+        root: Directory to scan
+
+    Yields:
+        os.DirEntry: Entry of each supported file
+    """
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and Path(entry.name).suffix.lower() in DocumentLoader.SUPPORTED_FORMATS:
+                    yield entry
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing a directory scan with the stored manifest.
+
+    Attributes:
+        added (List[str]): Paths not present in the manifest
+        changed (List[str]): Paths whose content hash differs
+        deleted (List[str]): Manifest paths no longer on disk
+        unchanged (int): Number of files that need no processing
+        scanned (Dict[str, dict]): Fresh manifest records of added/changed files
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    scanned: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def to_process(self) -> List[str]:
+        return self.added + self.changed
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "deleted": len(self.deleted),
+            "unchanged": self.unchanged
+        }
+
+
+class CorpusManifest:
+    """Manifest of already-parsed resume files.
+
+    Each record stores the size, modification time and SHA-256 of a file.
+    Files whose size and mtime are unchanged are skipped without hashing;
+    otherwise the hash decides whether the content really changed.
+
+    Attributes:
+        manifest_path (Path): Location of the manifest JSON file
+        files (Dict[str, dict]): Records keyed by file path
+    """
+
+    def __init__(self, manifest_path: Union[str, Path]):
+        self.manifest_path = Path(manifest_path)
+        self.files: Dict[str, dict] = {}
+        if self.manifest_path.exists():
+            with self.manifest_path.open("r") as f:
+                self.files = json.load(f).get("files", {})
+
+    def scan(self, root: Union[str, Path]) -> ManifestDiff:
+        """Compares the files below root with the manifest.
+
+        Args:
+            root: Resume directory to scan recursively
+
+        Returns:
+            ManifestDiff: New, changed and deleted files
+        """
+        diff = ManifestDiff()
+        seen: Set[str] = set()
+
+        for entry in iter_resume_files(root):
+            path = entry.path
+            seen.add(path)
+            stat = entry.stat()
+            record = self.files.get(path)
+
+            if record and record["size"] == stat.st_size and record["mtime"] == stat.st_mtime:
+                diff.unchanged += 1
+                continue
+
+            content_hash = file_sha256(path)
+            fresh = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": content_hash}
+            if record is None:
+                diff.added.append(path)
+                diff.scanned[path] = fresh
+            elif record["sha256"] != content_hash:
+                diff.changed.append(path)
+                diff.scanned[path] = fresh
+            else:
+                # Touched but identical: refresh the stat fields only
+                self.files[path] = fresh
+                diff.unchanged += 1
+
+        diff.deleted = [path for path in self.files if path not in seen]
+        logging.info(f"Manifest scan of {root}: {diff.summary()}")
+        return diff
+
+    def apply(self, diff: ManifestDiff, resumes: List[dict]) -> None:
+        """Records successfully parsed files and forgets deleted ones.
+
+        Files that failed to parse are left out so the next run retries them.
+
+        Args:
+            diff: Scan result the resumes were produced from
+            resumes: Records returned by process_resumes for diff.to_process
+        """
+        for path in diff.deleted:
+            self.files.pop(path, None)
+        for data in resumes:
+            metadata = data.get("_metadata", {})
+            path = metadata.get("source_path")
+            if path in diff.scanned:
+                if metadata.get("success", False):
+                    self.files[path] = diff.scanned[path]
+                else:
+                    self.files.pop(path, None)
+
+    def save(self) -> None:
+        """Atomically writes the manifest to disk."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def merge_parsed_resumes(output_json_path: Union[str, Path], run_data: dict, diff: ManifestDiff) -> dict:
+    """Merges an incremental run into the existing parsing output.
+
+    Records of changed and deleted files are dropped from the existing output
+    and the freshly parsed records are appended. Corpus-level statistics are
+    recomputed over the merged records, while timing, API usage and cache
+    figures describe the incremental run only.
+
+    Args:
+        output_json_path: Existing parsed_resumes.json (may not exist yet)
+        run_data: Output of process_resumes for diff.to_process
+        diff: Scan result the run was produced from
+
+    Returns:
+        dict: Merged output, also written to output_json_path
+    """
+    output_path = Path(output_json_path)
+    existing = []
+    if output_path.exists():
+        with output_path.open("r") as f:
+            existing = json.load(f).get("resumes", [])
+
+    replaced = set(diff.to_process) | set(diff.deleted)
+    # Outputs written before source_path existed only carry the file name
+    replaced_names = {Path(path).name for path in replaced}
+
+    def is_replaced(data: dict) -> bool:
+        metadata = data.get("_metadata", {})
+        if "source_path" in metadata:
+            return metadata["source_path"] in replaced
+        return metadata.get("filename") in replaced_names
+
+    merged = [data for data in existing if not is_replaced(data)] + run_data.get("resumes", [])
+
+    successful = sum(1 for data in merged if data.get("_metadata", {}).get("success", False))
+    statistics = {
+        "processing_time": "0m 0s",
+        "processing_time_seconds": 0,
+        "api_usage": {"total_tokens": 0, "total_cost_usd": 0, "total_api_calls": 0}
+    }
+    statistics.update(run_data.get("statistics", {}))
+    statistics.update({
+        "total_processed": len(merged),
+        "successful": successful,
+        "failed": len(merged) - successful,
+        "format_statistics": compute_format_statistics(merged),
+        "incremental": {**diff.summary(), "run_processed": len(run_data.get("resumes", []))}
+    })
+    output_data = {"resumes": merged, "statistics": statistics}
+
+    tmp_path = output_path.with_suffix(".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(output_data, f, indent=2)
+    os.replace(tmp_path, output_path)
+    return output_data
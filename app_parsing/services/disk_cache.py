@@ -0,0 +1,149 @@
+#cv parsing 2/app_parsing/services/disk_cache.py
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+class DiskCache:
+    """Persistent JSON cache stored as one file per entry.
+
+    Entries live under ``cache_dir/<key[:2]>/<key>.json``. An entry's
+    modification time is when it was written and its access time when it
+    was last read: reads refresh only the access time, so size-based
+    eviction removes the least recently used entries first while entries
+    written more than ``max_age_days`` ago are still treated as misses and
+    deleted, however often they are read.
+
+    Attributes:
+        cache_dir (Path): Root directory of the cache
+        max_size_bytes (int): Maximum total size before eviction kicks in
+        max_age_seconds (float): Maximum age of an entry, 0 disables expiry
+        hits (int): Number of successful lookups
+        misses (int): Number of failed lookups
+    """
+    DEFAULT_MAX_SIZE_MB = 512
+    DEFAULT_MAX_AGE_DAYS = 30
+
+    def __init__(self, cache_dir: Union[str, Path],
+                 max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: Dict[Path, int] = {}
+        self._total_size = 0
+        self._load_index()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> None:
+        """Scans the cache directory once, dropping expired entries."""
+        now = time.time()
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                path = Path(entry.path)
+                if self._is_expired(stat.st_mtime, now):
+                    self._unlink(path)
+                    continue
+                self._index[path] = stat.st_size
+                self._total_size += stat.st_size
+
+    def _is_expired(self, mtime: float, now: float) -> bool:
+        return self.max_age_seconds > 0 and now - mtime > self.max_age_seconds
+
+    def _unlink(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _forget(self, path: Path) -> None:
+        self._total_size -= self._index.pop(path, 0)
+        self._unlink(path)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for a key, or None on a miss."""
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                stat = path.stat()
+                if self._is_expired(stat.st_mtime, time.time()):
+                    self._forget(path)
+                    self.misses += 1
+                    return None
+                with path.open("r") as f:
+                    value = json.load(f)
+                # Set explicitly: mounts with noatime/relatime would not update it
+                os.utime(path, (time.time(), stat.st_mtime))
+                self.hits += 1
+                return value
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Dropping unreadable cache entry {path.name}: {str(e)}")
+                self._forget(path)
+                self.misses += 1
+                return None
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores a JSON-serialisable value, evicting old entries if needed."""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique across threads and processes sharing the cache directory
+        fd, tmp_name = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=path.parent)
+        tmp_path = Path(tmp_name)
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f)
+        size = tmp_path.stat().st_size
+        with self._lock:
+            os.replace(tmp_path, path)
+            self._total_size += size - self._index.get(path, 0)
+            self._index[path] = size
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until under the size budget."""
+        target = int(self.max_size_bytes * 0.9)
+        by_age = []
+        for path in self._index:
+            try:
+                by_age.append((path.stat().st_atime, path))
+            except FileNotFoundError:
+                by_age.append((0.0, path))
+        by_age.sort()
+        for _, path in by_age:
+            if self._total_size <= target:
+                break
+            self._forget(path)
+            self.evictions += 1
+        logging.info(f"Cache eviction: {len(self._index)} entries remain ({self._total_size} bytes)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "size_bytes": self._total_size
+        }
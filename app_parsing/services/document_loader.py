@@ -2,8 +2,6 @@
 
 from pathlib import Path
 import logging
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import Docx2txtLoader, TextLoader
 from typing import Set
 
 
@@ -13,12 +11,16 @@ class DocumentLoader:
     """Resume document loader manager for different formats.
 
     This class provides methods to load and extract content
-    from resumes in PDF, DOCX, and TXT formats.
+    from resumes in PDF, DOCX, and TXT formats. The langchain loaders are
+    imported on first use so that importing this module, or processing
+    only TXT files, does not pay for loading langchain_community.
 
     Attributes:
         SUPPORTED_FORMATS (set): Set of supported file extensions
     """
     SUPPORTED_FORMATS = {'.pdf', '.docx', '.txt'}
+    # Separates PDF pages so later stages can spot repeated headers/footers
+    PAGE_BREAK = "\n\n\f"
 
     @classmethod
     def load_document(cls, file_path: Path) -> str:
@@ -44,15 +46,18 @@ class DocumentLoader:
 
         try:
             if file_extension == '.pdf':
+                from langchain_community.document_loaders import PyPDFLoader
                 loader = PyPDFLoader(str(file_path))
                 pages = loader.load()
-                return "\n\n".join([page.page_content for page in pages])
+                return cls.PAGE_BREAK.join([page.page_content for page in pages])
             elif file_extension == '.docx':
+                from langchain_community.document_loaders import Docx2txtLoader
                 loader = Docx2txtLoader(str(file_path))
                 return loader.load()[0].page_content
             elif file_extension == '.txt':
-                loader = TextLoader(str(file_path))
-                return loader.load()[0].page_content
+                # Same behaviour as langchain's TextLoader, without importing it
+                with open(file_path) as f:
+                    return f.read()
                 
         except Exception as e:
             logging.error(f"Error loading document {file_path}: {str(e)}")
@@ -1,16 +1,27 @@
 # cv parsing 2/app_parsing/services/email_personalizer.py
 
+import argparse
+import asyncio
+import heapq
 import os
+import re
 import json
 import logging
-from typing import Dict, Any, List, Set, Optional
-from openai import OpenAI
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
 from app_parsing.services.api_tracker import APIUsageTracker
-from app_parsing.scripts.email_analysis import analyze_email_results
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.disk_cache import DiskCache
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.rate_limiter import MAX_RATE_LIMIT_RETRIES, AsyncRateLimiter, quota_exhausted, retry_after
+from app_parsing.services.text_preprocessor import count_tokens
+from app_parsing.utils.hashing import text_sha256
+from app_parsing.utils.json_repair import loads_repaired
+from app_parsing.utils.jsonl import JsonlWriter, iter_records, write_summary
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
@@ -18,12 +29,45 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 # Load the .env file located outside the app_parsing folder
 load_dotenv(dotenv_path=Path(__file__).parent.parent.parent / '.env')
 
+EMAIL_MODEL = "gpt-3.5-turbo"
+# Rough size of a generated email, used to reserve tokens per minute
+EMAIL_EXPECTED_COMPLETION_TOKENS = 300
+EMAIL_MODES = ("full", "hybrid")
+SKELETON_SLOTS = ("first_name", "current_title", "current_company", "top_skills", "achievement")
+SLOT_RE = re.compile(r"\{(\w+)\}")
+
+
 class EmailPersonalizer:
     """Service for generating personalized emails based on CV data and job requirements."""
     
-    def __init__(self, api_key: str = None):
-        """Initialize with OpenAI client."""
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+    def __init__(self, api_key: str = None, cache_dir: Optional[str] = None,
+                 cache_max_size_mb: float = DiskCache.DEFAULT_MAX_SIZE_MB, regenerate: bool = False,
+                 router: Optional[ModelRouter] = None):
+        """Initialize with OpenAI client.
+
+        Args:
+            api_key: OpenAI API key, read from OPENAI_API_KEY if omitted
+            cache_dir: Directory of the persistent email cache, None disables
+                caching. An email is reused as long as the formatted
+                candidate info, role info, match score, template and model
+                are unchanged.
+            cache_max_size_mb: Size budget of the email cache (least recently
+                used emails are evicted first)
+            regenerate: Ignore cached emails and generate them again; the new
+                emails replace the cached ones
+            router: Picks the model of each email and escalates answers
+                without a subject line or body to a stronger one; EMAIL_MODEL
+                is used for every email without a router
+        """
+        # Imported here: the openai package dominates this module's import time
+        from openai import OpenAI
+
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.client = OpenAI(api_key=self.api_key)
+        # Expiry is disabled: the size budget alone bounds the cache
+        self.cache = DiskCache(cache_dir, cache_max_size_mb, max_age_days=0) if cache_dir else None
+        self.regenerate = regenerate
+        self.router = router
 
         self.EMAIL_TEMPLATES = {
             'standard': """
@@ -66,6 +110,37 @@ IMPORTANT: Return your response in the exact JSON format shown below. Do not inc
 }}
 
 Note: Replace placeholders with actual content. Ensure all keys and structure remain exactly as shown above.
+""",
+            'skeleton': """
+You are an expert recruiter writing an outreach email that will be sent to many candidates for the same role.
+Write it once, with named slots that are filled in for each candidate afterwards.
+
+Available slots (write them exactly like this, braces included):
+- {{first_name}}: the candidate's first name
+- {{current_title}}: their current job title
+- {{current_company}}: their current employer
+- {{top_skills}}: a comma-separated list of their skills that match the role
+- {{achievement}}: one achievement copied from their resume, as a full sentence
+
+Key Requirements:
+1. Use a warm, conversational tone that reflects the company culture.
+2. Structure the email in three parts:
+   - Greeting: "Hey {{first_name}} 👋"
+   - Body: Two short paragraphs (2-3 sentences each) using the other slots
+   - Closing: "Best regards,\\n[Recruiter Name]"
+3. Every sentence must read naturally whatever the slot values are; put {{achievement}} in a sentence of its own.
+4. Keep the email concise (around 20-30 words in body).
+5. Use "\\n" for line breaks between paragraphs.
+6. Do not use any other slot or placeholder.
+
+Role Information:
+{role_info}
+
+IMPORTANT: Return your response in the exact JSON format shown below. Do not include any additional text or formatting:
+{{
+    "subject_line": "Exciting [Position] opportunity at [Company Name]😊",
+    "email_body": "Hey {{first_name}} 👋\\n\\n..."
+}}
 """
         }
 
@@ -190,102 +265,482 @@ Note: Replace placeholders with actual content. Ensure all keys and structure re
             logging.error(f"Error calculating match score: {str(e)}")
             return {'total_score': 0, 'breakdown': {}, 'matching_skills': [], 'bonus_skills': []}
 
-    def generate_email(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any], api_tracker: APIUsageTracker) -> Optional[Dict[str, Any]]:
-        """Generate personalized email based on candidate-role match."""
+    def _qualifying_match(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any],
+                          match_results: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Returns the match results of a pair that should get an email, None otherwise."""
+        # Basic validation
+        if not self._validate_role_data(role_data) or not self._validate_candidate_data(candidate_data):
+            return None
+
+        # Calculate match score
+        if match_results is None:
+            match_results = self.calculate_match_score(candidate_data, role_data)
+        total_score = match_results['total_score']
+
+        # Do not generate email if the score is too low
+        if total_score < 50:  # Changed to 50% for standard
+            logging.info(f"Score too low ({total_score}%) for candidate: {candidate_data['Full Name']}")
+            return None
+        return match_results
+
+    def _prepare_email(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any],
+                       match_results: Optional[Dict[str, Any]] = None) -> Optional[tuple]:
+        """Validates the pair and builds the email prompt.
+
+        Returns:
+            tuple: (prompt, match_results, cache_key), or None when no email
+                should be sent; cache_key is None when caching is disabled
+        """
+        match_results = self._qualifying_match(candidate_data, role_data, match_results)
+        if match_results is None:
+            return None
+        total_score = match_results['total_score']
+
+        # Use the standard template for all candidates with a score of 50% or higher
+        template = self.EMAIL_TEMPLATES['standard']
+
+        # Prepare context
+        context = {
+            'candidate_info': self._format_candidate_info(candidate_data),
+            'role_info': self._format_role_info(role_data),
+            'match_score': total_score,
+            'matching_skills': ', '.join(match_results['matching_skills'])
+        }
+        cache_key = None
+        if self.cache is not None:
+            cache_key = text_sha256(self._model_key, template, context['candidate_info'], context['role_info'],
+                                    str(total_score))
+        return template.format(**context), match_results, cache_key
+
+    def _cached_email(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if cache_key is None or self.regenerate:
+            return None
+        return self.cache.get(cache_key)
+
+    @property
+    def _model_key(self) -> str:
+        """Model part of the email cache keys."""
+        return EMAIL_MODEL if self.router is None else self.router.signature
+
+    def _email_models(self, prompt: str) -> List[str]:
+        """Models to try for a prompt, cheapest first."""
+        if self.router is None:
+            return [EMAIL_MODEL]
+        return self.router.models_for("email", count_tokens(prompt))
+
+    def _record_answer(self, model: str, valid: bool, latency_seconds: float, cost_usd: float) -> None:
+        if self.router is not None:
+            self.router.record("email", model, valid, latency_seconds, cost_usd)
+
+    def _escalate(self, models: List[str], model_index: int, error: Exception) -> bool:
+        """Moves on to the next model after an invalid answer; False when none is left."""
+        if model_index + 1 >= len(models):
+            return False
+        self.router.record_escalation("email")
+        logging.warning(f"Invalid email from {models[model_index]}, escalating to {models[model_index + 1]}. "
+                        f"Error: {str(error)}")
+        return True
+
+    @staticmethod
+    def _validate_email(email_data: Any) -> None:
+        """Raises ValueError unless the answer has a subject line and a body."""
+        if not isinstance(email_data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(email_data).__name__}")
+        for key in ('subject_line', 'email_body'):
+            if not isinstance(email_data.get(key), str) or not email_data[key].strip():
+                raise ValueError(f"Email without {key}")
+
+    def _email_from_response(self, response, match_results: Dict[str, Any],
+                             cache_key: Optional[str]) -> Dict[str, Any]:
+        email_data, _ = loads_repaired(response.choices[0].message.content or "")
+        if self.router is not None:
+            self._validate_email(email_data)
+        if cache_key is not None:
+            self.cache.put(cache_key, email_data)
+        return self._with_match_details(dict(email_data), match_results)
+
+    @staticmethod
+    def _with_match_details(email_data: Dict[str, Any], match_results: Dict[str, Any]) -> Dict[str, Any]:
+        email_data.update({
+            'match_score': f"{match_results['total_score']}%",
+            'match_details': match_results
+        })
+        return email_data
+
+    def generate_email(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any], api_tracker: APIUsageTracker,
+                       match_results: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Generate personalized email based on candidate-role match.
+
+        match_results can be passed when the score was already computed,
+        e.g. by match_roles.
+        """
         try:
-            # Basic validation
-            if not self._validate_role_data(role_data) or not self._validate_candidate_data(candidate_data):
+            prepared = self._prepare_email(candidate_data, role_data, match_results)
+            if prepared is None:
                 return None
+            prompt, match_results, cache_key = prepared
+            if (cached := self._cached_email(cache_key)) is not None:
+                return self._with_match_details(cached, match_results)
+
+            # Generate the email, escalating invalid answers when routing
+            models = self._email_models(prompt)
+            for model_index, model in enumerate(models):
+                start = time.perf_counter()
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[{
+                        "role": "user", 
+                        "content": prompt
+                    }],
+                    temperature=0.7
+                )
+
+                latency = time.perf_counter() - start
+                cost = api_tracker.record_response(response, latency, stage="email")
+                try:
+                    email_data = self._email_from_response(response, match_results, cache_key)
+                except ValueError as e:
+                    self._record_answer(model, False, latency, cost)
+                    if not self._escalate(models, model_index, e):
+                        raise
+                    continue
+                self._record_answer(model, True, latency, cost)
+                return email_data
 
-            # Calculate match score
-            match_results = self.calculate_match_score(candidate_data, role_data)
-            total_score = match_results['total_score']
+        except Exception as e:
+            logging.error(f"Error generating email: {str(e)}")
+            return None
+
+    async def generate_email_async(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any],
+                                   api_tracker: APIUsageTracker, client, limiter: AsyncRateLimiter,
+                                   match_results: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Asynchronous counterpart of generate_email.
 
-            # Do not generate email if the score is too low
-            if total_score < 50:  # Changed to 50% for standard
-                logging.info(f"Score too low ({total_score}%) for candidate: {candidate_data['Full Name']}")
+        The call first acquires request and token budget from the shared
+        rate limiter; 429 responses slow the limiter down and are retried, up
+        to MAX_RATE_LIMIT_RETRIES times (never when the quota is exhausted).
+
+        Args:
+            client: AsyncOpenAI client
+            limiter: Rate limiter shared by all concurrent calls
+        """
+        from openai import RateLimitError
+
+        try:
+            prepared = self._prepare_email(candidate_data, role_data, match_results)
+            if prepared is None:
                 return None
+            prompt, match_results, cache_key = prepared
+            if cache_key is not None:
+                cached = await asyncio.to_thread(self._cached_email, cache_key)
+                if cached is not None:
+                    return self._with_match_details(cached, match_results)
+            estimated_tokens = len(prompt) // 4 + EMAIL_EXPECTED_COMPLETION_TOKENS
+            models = self._email_models(prompt)
+            model_index = rate_limited = 0
+
+            while True:
+                model = models[model_index]
+                await limiter.acquire(estimated_tokens)
+                start = time.perf_counter()
+                try:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.7
+                    )
+                except RateLimitError as e:
+                    limiter.release(estimated_tokens)
+                    rate_limited += 1
+                    if quota_exhausted(e) or rate_limited > MAX_RATE_LIMIT_RETRIES:
+                        raise
+                    await asyncio.sleep(limiter.on_rate_limited(retry_after(e)))
+                    continue
+                except Exception:
+                    limiter.release(estimated_tokens)
+                    raise
+                limiter.settle(estimated_tokens, response.usage.total_tokens)
+                latency = time.perf_counter() - start
+                cost = api_tracker.record_response(response, latency, stage="email")
+                try:
+                    email_data = await asyncio.to_thread(self._email_from_response, response, match_results,
+                                                         cache_key)
+                except ValueError as e:
+                    self._record_answer(model, False, latency, cost)
+                    if not self._escalate(models, model_index, e):
+                        raise
+                    model_index += 1
+                    continue
+                self._record_answer(model, True, latency, cost)
+                return email_data
 
-            # Use the standard template for all candidates with a score of 50% or higher
-            template = self.EMAIL_TEMPLATES['standard']
+        except Exception as e:
+            logging.error(f"Error generating email: {str(e)}")
+            return None
 
-            # Prepare context
-            context = {
-                'candidate_info': self._format_candidate_info(candidate_data),
-                'role_info': self._format_role_info(role_data),
-                'match_score': total_score,
-                'matching_skills': ', '.join(match_results['matching_skills'])
-            }
+    def generate_skeleton(self, role_data: Dict[str, Any], api_tracker: APIUsageTracker) -> Optional[Dict[str, str]]:
+        """Generate the role-level email skeleton used by render_from_skeleton.
 
-            # Generate the email
+        Returns:
+            dict: "subject_line" and "email_body" containing slots such as
+                {first_name}, or None if generation failed
+        """
+        try:
+            if not self._validate_role_data(role_data):
+                return None
+            template = self.EMAIL_TEMPLATES['skeleton']
+            role_info = self._format_role_info(role_data)
+            cache_key = text_sha256(self._model_key, template, role_info) if self.cache is not None else None
+            if (cached := self._cached_email(cache_key)) is not None:
+                return cached
+
+            prompt = template.format(role_info=role_info)
+            start = time.perf_counter()
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{
-                    "role": "user", 
-                    "content": template.format(**context)
-                }],
+                model=self._email_models(prompt)[0],
+                messages=[{"role": "user", "content": prompt}],
                 temperature=0.7
             )
+            api_tracker.record_response(response, time.perf_counter() - start, stage="email")
 
-            api_tracker.update(response.usage.total_tokens)
+            skeleton, _ = loads_repaired(response.choices[0].message.content or "")
+            skeleton = {key: skeleton[key] for key in ('subject_line', 'email_body')}
+            slots = set(SLOT_RE.findall(skeleton['subject_line'] + skeleton['email_body']))
+            if unknown := slots - set(SKELETON_SLOTS):
+                raise ValueError(f"Unknown slots in skeleton: {', '.join(sorted(unknown))}")
+            if cache_key is not None:
+                self.cache.put(cache_key, skeleton)
+            return skeleton
 
-            email_data = json.loads(response.choices[0].message.content)
-            email_data.update({
-                'match_score': f"{total_score}%",
-                'match_details': match_results
-            })
+        except Exception as e:
+            logging.error(f"Error generating email skeleton: {str(e)}")
+            return None
 
-            return email_data
+    def _candidate_slots(self, candidate_data: Dict[str, Any], match_results: Dict[str, Any]) -> Dict[str, str]:
+        """Per-candidate slot values, from the fields used by _format_candidate_info."""
+        slots = {
+            'first_name': candidate_data['Full Name'].split()[0] if candidate_data['Full Name'].split() else 'there',
+            'current_title': candidate_data['Professional Title'] or 'your current role',
+            'current_company': 'your current company',
+            'achievement': 'Your recent work stood out to us.'
+        }
+        if work_experience := candidate_data.get('Work Experience'):
+            current_role = work_experience[0]
+            slots['current_company'] = current_role.get('Company') or slots['current_company']
+            slots['current_title'] = current_role.get('Title') or slots['current_title']
+            if achievements := current_role.get('Achievements', []):
+                slots['achievement'] = achievements[0]
+
+        # Matched skills are lower-cased; show them as the candidate wrote them
+        skills = candidate_data.get('Skills', {})
+        candidate_skills = skills.get('Technical Skills', []) + skills.get('Soft Skills', [])
+        matched = set(match_results['matching_skills'] + match_results['bonus_skills'])
+        top_skills = [skill for skill in candidate_skills if skill.lower() in matched]
+        slots['top_skills'] = ', '.join((top_skills or skills.get('Technical Skills', []))[:3]) or 'your background'
+        return slots
+
+    def render_from_skeleton(self, candidate_data: Dict[str, Any], role_data: Dict[str, Any],
+                             skeleton: Dict[str, str],
+                             match_results: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Fill a role skeleton locally for one candidate, without an API call.
+
+        Applies the same validation and score threshold as generate_email.
+        """
+        try:
+            match_results = self._qualifying_match(candidate_data, role_data, match_results)
+            if match_results is None:
+                return None
+            slots = self._candidate_slots(candidate_data, match_results)
+            fill = lambda text: SLOT_RE.sub(lambda match: str(slots[match.group(1)]), text)
+            return self._with_match_details({
+                'subject_line': fill(skeleton['subject_line']),
+                'email_body': fill(skeleton['email_body']),
+                'personalization_points': [],
+                'highlight_skills': slots['top_skills'].split(', ') if slots['top_skills'] != 'your background' else [],
+                'rendering': 'skeleton'
+            }, match_results)
 
         except Exception as e:
-            logging.error(f"Error generating email: {str(e)}")
+            logging.error(f"Error rendering email: {str(e)}")
             return None
 
-    def process_batch(self, cv_file: str, role_data: Dict[str, Any], output_dir: str = "app_parsing/data/output/emails") -> None:
-        """Process a batch of CVs and generate personalized emails."""
+    @staticmethod
+    def _candidate_query(role_data: Dict[str, Any], candidate_query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Repository query of a role: its must-have skills unless a query is given, as in process_roles."""
+        if candidate_query is not None:
+            return candidate_query
+        must_have = role_data.get('requirements', {}).get('must_have', [])
+        return {'any_skills': must_have} if must_have else {}
+
+    @staticmethod
+    def _iter_parsed_cvs(cv_file: str, candidate_query: Optional[Dict[str, Any]] = None,
+                         successful_only: bool = True) -> Iterable[Dict[str, Any]]:
+        """Reads parsed CVs from an output file or, with indexed lookups, from a candidate repository.
+
+        candidate_query holds keyword arguments of
+        CandidateRepository.find_candidates and only applies to repositories.
+        """
+        if CandidateRepository.is_repository(cv_file):
+            if not Path(cv_file).exists():
+                raise FileNotFoundError(f"No candidate repository at {cv_file}")
+            with CandidateRepository(cv_file) as repository:
+                yield from repository.find_candidates(**(candidate_query or {}), successful_only=successful_only)
+            return
+        for cv in iter_records(cv_file, key="resumes"):
+            if not successful_only or cv.get("_metadata", {}).get("success", False):
+                yield cv
+
+    def _top_candidates(self, cvs: Iterable[Dict[str, Any]], role_data: Dict[str, Any], k: int) -> Set[int]:
+        """Positions, in cvs, of the k best candidates that qualify for an email."""
+        scored = []
+        for index, cv in enumerate(cvs):
+            if self._validate_candidate_data(cv):
+                score = self.calculate_match_score(cv, role_data)['total_score']
+                if score >= 50:
+                    scored.append((-score, index))
+        return {index for _, index in heapq.nsmallest(k, scored)}
+
+    async def _generate_emails_async(self, cvs: Iterable[Dict[str, Any]], role_data: Dict[str, Any],
+                                     api_tracker: APIUsageTracker, on_result: Callable, concurrency: int,
+                                     limiter: AsyncRateLimiter, skeleton: Optional[Dict[str, str]] = None,
+                                     llm_indexes: Set[int] = frozenset()) -> None:
+        """Generates emails with a sliding window of concurrent requests.
+
+        on_result(cv, email_data) is called in input order: results that
+        finish early wait until every earlier CV is done. With a skeleton,
+        only the CVs at llm_indexes go to the model; the others are
+        rendered from the skeleton.
+        """
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=self.api_key)
+        source = enumerate(cvs)
+        finished: Dict[int, tuple] = {}
+        next_index = 0
+
+        async def worker():
+            nonlocal next_index
+            # The workers share one iterator, so CVs are read lazily
+            for index, cv in source:
+                if skeleton is not None and index not in llm_indexes:
+                    email_data = self.render_from_skeleton(cv, role_data, skeleton)
+                else:
+                    email_data = await self.generate_email_async(cv, role_data, api_tracker, client, limiter)
+                finished[index] = (cv, email_data)
+                while next_index in finished:
+                    on_result(*finished.pop(next_index))
+                    next_index += 1
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    def process_batch(self, cv_file: str, role_data: Dict[str, Any], output_dir: str = "app_parsing/data/output/emails",
+                      stream: bool = False, concurrency: int = 1, rpm: int = 3500, tpm: int = 200000,
+                      mode: str = "full", full_top_k: int = 10,
+                      candidate_query: Optional[Dict[str, Any]] = None) -> None:
+        """Process a batch of CVs and generate personalized emails.
+
+        With ``stream=True`` each email is appended to a ``.jsonl`` file as soon
+        as it is generated and the statistics go to a separate summary file,
+        so memory stays flat and a crash keeps the emails written so far.
+
+        With ``concurrency`` above 1, up to that many emails are generated at
+        once, throttled to ``rpm`` requests and ``tpm`` tokens per minute;
+        emails are still written in the order of the CVs.
+
+        With ``mode="hybrid"`` one skeleton email is generated for the role
+        and filled in locally for each candidate; only the ``full_top_k``
+        best matches get a fully personalized email from the model. A
+        campaign then costs one call per role plus full_top_k instead of
+        one per candidate.
+
+        ``cv_file`` can also be a SQLite candidate repository (.db). Only
+        the candidates returned by an indexed lookup are then read: those
+        matching ``candidate_query`` (keyword arguments of
+        CandidateRepository.find_candidates, e.g. ``{"all_skills":
+        ["Python"], "min_years": 3}``), or by default those listing one of
+        the role's must-have skills, as process_roles does.
+        """
+        if mode not in EMAIL_MODES:
+            raise ValueError(f"Unsupported email mode: {mode}")
         try:
             api_tracker = APIUsageTracker()
             start_time = datetime.now()
 
-            # Load parsed CVs
-            with open(cv_file, "r") as f:
-                parsed_data = json.load(f)
-                cvs = parsed_data["resumes"]
-
-            logging.info(f"Starting to process {len(cvs)} CVs")
-
             # Create output directory
             output_path = Path(output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
 
-            # Process each CV
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_file = output_path / f"generated_emails_{timestamp}.{'jsonl' if stream else 'json'}"
+            writer = JsonlWriter(output_file) if stream else None
+
+            logging.info(f"Starting to process CVs from {cv_file}")
+
+            # Process each CV, reading parsed CVs lazily
             results = []
+            total = 0
             successful = 0
             failed = 0
 
-            for cv in cvs:
-                if cv.get("_metadata", {}).get("success", False):
-                    if email_data := self.generate_email(cv, role_data, api_tracker):
-                        successful += 1
-                        results.append({
-                            "candidate_name": cv["Full Name"],
-                            "email_data": email_data,
-                            "timestamp": datetime.now().isoformat()
-                        })
+            from_repository = CandidateRepository.is_repository(cv_file)
+            if from_repository:
+                candidate_query = self._candidate_query(role_data, candidate_query)
+
+            def parsed_cvs():
+                nonlocal total
+                for cv in self._iter_parsed_cvs(cv_file, candidate_query, successful_only=from_repository):
+                    total += 1
+                    if cv.get("_metadata", {}).get("success", False):
+                        yield cv
+
+            skeleton, llm_indexes, rendered = None, frozenset(), 0
+            if mode == "hybrid":
+                skeleton = self.generate_skeleton(role_data, api_tracker)
+                if skeleton is None:
+                    logging.warning("No email skeleton for this role, personalizing every email with the model")
+                else:
+                    llm_indexes = self._top_candidates(self._iter_parsed_cvs(cv_file, candidate_query),
+                                                       role_data, full_top_k)
+
+            def on_result(cv: Dict[str, Any], email_data: Optional[Dict[str, Any]]) -> None:
+                nonlocal successful, failed, rendered
+                if email_data:
+                    successful += 1
+                    rendered += email_data.get('rendering') == 'skeleton'
+                    record = {
+                        "candidate_name": cv["Full Name"],
+                        "email_data": email_data,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                    if writer:
+                        writer.write(record)
+                    else:
+                        results.append(record)
+                else:
+                    failed += 1
+
+            limiter = None
+            if concurrency > 1:
+                limiter = AsyncRateLimiter(rpm, tpm)
+                asyncio.run(self._generate_emails_async(parsed_cvs(), role_data, api_tracker, on_result,
+                                                        concurrency, limiter, skeleton, llm_indexes))
+            else:
+                for index, cv in enumerate(parsed_cvs()):
+                    if skeleton is not None and index not in llm_indexes:
+                        on_result(cv, self.render_from_skeleton(cv, role_data, skeleton))
                     else:
-                        failed += 1
+                        on_result(cv, self.generate_email(cv, role_data, api_tracker))
 
             # Calculate statistics
             end_time = datetime.now()
             processing_time = (end_time - start_time).total_seconds()
             
-            output_data = {
-                "emails": results,
+            summary = {
                 "statistics": {
-                    "total_processed": len(cvs),
+                    "total_processed": total,
                     "successful": successful,
                     "failed": failed,
-                    "success_rate": (successful / len(cvs) * 100) if len(cvs) > 0 else 0,
+                    "success_rate": (successful / total * 100) if total > 0 else 0,
                     "processing_time": str(end_time - start_time),
                     "processing_time_seconds": processing_time,
                     "api_usage": api_tracker.get_stats()
@@ -294,31 +749,132 @@ Note: Replace placeholders with actual content. Ensure all keys and structure re
                 "timestamp": datetime.now().isoformat()
             }
 
+            if self.cache is not None:
+                summary["statistics"]["cache"] = self.cache.get_stats()
+            if from_repository:
+                summary["statistics"]["candidate_query"] = candidate_query
+            if skeleton is not None:
+                summary["statistics"]["hybrid"] = {
+                    "full_top_k": full_top_k,
+                    "llm_emails": successful - rendered,
+                    "skeleton_emails": rendered
+                }
+            if limiter is not None:
+                summary["statistics"]["concurrency"] = concurrency
+                summary["statistics"]["rate_limiting"] = limiter.get_stats()
+            if self.router is not None:
+                summary["statistics"]["model_routing"] = self.router.get_stats()
+
             # Save results
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = output_path / f"generated_emails_{timestamp}.json"
-            with open(output_file, "w") as f:
-                json.dump(output_data, f, indent=2)
+            if writer:
+                writer.close()
+                write_summary(output_file, summary)
+            else:
+                with open(output_file, "w") as f:
+                    json.dump({"emails": results, **summary}, f, indent=2)
 
-            logging.info(f"Successfully generated {successful} emails out of {len(cvs)} CVs")
+            logging.info(f"Successfully generated {successful} emails out of {total} CVs")
             logging.info(f"Results saved to {output_file}")
             
             # Run analysis
+            from app_parsing.scripts.email_analysis import analyze_email_results
             analyze_email_results(str(output_file))
             
         except Exception as e:
             logging.error(f"Error processing batch: {str(e)}")
             raise
 
+    def process_roles(self, cv_file: str, roles: List[Dict[str, Any]], top_k: int = 10,
+                      output_dir: str = "app_parsing/data/output/emails", generate_emails: bool = True) -> Path:
+        """Match a CV corpus against many roles and email the top candidates.
+
+        The parsed CVs are loaded and indexed by skill once, leaving out
+        those generate_email would reject as incomplete; each role then
+        only considers the candidates sharing one of its must-have skills
+        and keeps its top_k matches scoring at least 50%, the threshold of
+        generate_email. Emails are generated for those matches only.
+
+        Returns:
+            Path: The role matches file
+        """
+        # Imported here: numpy is only needed for multi-role matching
+        from app_parsing.services.match_scoring import CandidateMatrix, SkillIndex, match_roles
+
+        api_tracker = APIUsageTracker()
+        start_time = datetime.now()
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        skipped = 0
+
+        def valid_cvs():
+            # generate_email rejects these, so they must not take a top_k slot
+            nonlocal skipped
+            for cv in self._iter_parsed_cvs(cv_file):
+                if self._validate_candidate_data(cv):
+                    yield cv
+                else:
+                    skipped += 1
+
+        matrix = CandidateMatrix(valid_cvs())
+        index = SkillIndex(matrix)
+        logging.info(f"Indexed {len(matrix)} CVs ({skipped} incomplete ones skipped): {index.get_stats()}")
+
+        role_results = []
+        emails_generated = 0
+        for result in match_roles(matrix, roles, top_k=top_k, min_score=50, index=index):
+            role_data = result["role"]
+            candidates = []
+            for candidate_index, match_results in result["matches"]:
+                cv = matrix.records[candidate_index]
+                entry = {
+                    "candidate_name": cv.get("Full Name"),
+                    "source_path": cv.get("_metadata", {}).get("source_path"),
+                    "match_score": match_results["total_score"],
+                    "match_details": match_results
+                }
+                if generate_emails and self._validate_role_data(role_data):
+                    if email_data := self.generate_email(cv, role_data, api_tracker, match_results):
+                        entry["email_data"] = email_data
+                        emails_generated += 1
+                candidates.append(entry)
+            role_results.append({
+                "role": role_data,
+                "eligible_candidates": result["eligible"],
+                "top_candidates": candidates
+            })
+
+        end_time = datetime.now()
+        output_file = output_path / f"role_matches_{end_time.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output_file, "w") as f:
+            json.dump({
+                "roles": role_results,
+                "statistics": {
+                    "candidates": len(matrix),
+                    "incomplete_candidates": skipped,
+                    "roles": len(role_results),
+                    "top_k": top_k,
+                    "emails_generated": emails_generated,
+                    **({"cache": self.cache.get_stats()} if self.cache is not None else {}),
+                    **({"model_routing": self.router.get_stats()} if self.router is not None else {}),
+                    "processing_time": str(end_time - start_time),
+                    "processing_time_seconds": (end_time - start_time).total_seconds(),
+                    "api_usage": api_tracker.get_stats()
+                },
+                "timestamp": end_time.isoformat()
+            }, f, indent=2)
+
+        logging.info(f"Matched {len(matrix)} CVs against {len(role_results)} roles, "
+                     f"generated {emails_generated} emails. Results saved to {output_file}")
+        return output_file
+
     def _calculate_skills_match(self, required: Set[str], candidate: Set[str]) -> float:
         """Calcule la correspondance des compétences."""
         if not required:
             return 100.0
             
-        matches = 0
-        for skill in required:
-            if skill.lower() in (s.lower() for s in candidate):
-                matches += 1
+        candidate_lower = {s.lower() for s in candidate}
+        matches = sum(1 for skill in required if skill.lower() in candidate_lower)
                 
         return (matches / len(required)) * 100.0
 
@@ -359,7 +915,8 @@ Note: Replace placeholders with actual content. Ensure all keys and structure re
         """Applique des ajustements au score final."""
         return min(100.0, max(0.0, score))
 
-    def _parse_experience_requirement(self, exp_requirement: str) -> float:
+    @staticmethod
+    def _parse_experience_requirement(exp_requirement: str) -> float:
         """Parse les exigences d'expérience en années."""
         try:
             if '-' in exp_requirement:
@@ -392,10 +949,70 @@ def main():
         "industry": "FinTech"
     }
 
-    personalizer = EmailPersonalizer()
+    parser = argparse.ArgumentParser(description="Generate personalized emails for parsed CVs.")
+    parser.add_argument("--roles", default=None,
+                        help="JSON file with a list of roles: rank candidates per role instead of the example role")
+    parser.add_argument("--top-k", type=int, default=10, help="Candidates kept (and emailed) per role with --roles")
+    parser.add_argument("--no-emails", action="store_true", help="With --roles, only rank candidates")
+    parser.add_argument("--cache-dir", default="app_parsing/data/cache/emails",
+                        help="Email cache: unchanged candidate/role pairs reuse their email")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the email cache")
+    parser.add_argument("--regenerate", action="store_true", help="Generate every email again, refreshing the cache")
+    parser.add_argument("--mode", choices=EMAIL_MODES, default="full",
+                        help="hybrid: one skeleton email per role filled in locally, full emails for the top matches")
+    parser.add_argument("--full-top-k", type=int, default=10,
+                        help="With --mode hybrid, best matches still personalized by the model")
+    parser.add_argument("--candidates-db", default=None,
+                        help="Read candidates from a SQLite repository (main.py --db) through indexed lookups")
+    parser.add_argument("--skill", action="append", default=None,
+                        help="With --candidates-db, only candidates listing this skill (repeatable; "
+                             "default: any must-have skill of the role)")
+    parser.add_argument("--min-years", type=float, default=None,
+                        help="With --candidates-db, only candidates with at least this many years of experience")
+    parser.add_argument("--seniority", default=None,
+                        help="With --candidates-db, only candidates of this seniority level (e.g. Senior)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Emails generated at once (1 = one at a time)")
+    parser.add_argument("--rpm", type=int, default=3500, help="API requests per minute quota (with --concurrency)")
+    parser.add_argument("--tpm", type=int, default=200000, help="API tokens per minute quota (with --concurrency)")
+    parser.add_argument("--router", nargs="?", const="", default=None, metavar="CONFIG_FILE",
+                        help="Route emails to a cheap model and escalate invalid ones "
+                             "(JSON routing config, default: built-in routes)")
+    cli_args = parser.parse_args()
+
+    router = None
+    if cli_args.router is not None:
+        router = ModelRouter.from_file(cli_args.router) if cli_args.router else ModelRouter()
+    personalizer = EmailPersonalizer(cache_dir=None if cli_args.no_cache else cli_args.cache_dir,
+                                     regenerate=cli_args.regenerate, router=router)
+    cv_file = cli_args.candidates_db or "app_parsing/data/output/parsed_resumes.json"
+    candidate_query = None
+    if cli_args.skill or cli_args.min_years is not None or cli_args.seniority:
+        candidate_query = {
+            "all_skills": cli_args.skill,
+            "min_years": cli_args.min_years,
+            "seniority": cli_args.seniority
+        }
+    if cli_args.roles:
+        with open(cli_args.roles, "r") as f:
+            roles = json.load(f)
+        personalizer.process_roles(
+            cv_file=cv_file,
+            roles=roles,
+            top_k=cli_args.top_k,
+            generate_emails=not cli_args.no_emails
+        )
+        return
+
     personalizer.process_batch(
-        cv_file="app_parsing/data/output/parsed_resumes.json",
-        role_data=role_data
+        cv_file=cv_file,
+        role_data=role_data,
+        candidate_query=candidate_query,
+        concurrency=cli_args.concurrency,
+        rpm=cli_args.rpm,
+        tpm=cli_args.tpm,
+        mode=cli_args.mode,
+        full_top_k=cli_args.full_top_k
     )
 
 
@@ -0,0 +1,213 @@
+#cv parsing 2/app_parsing/services/fast_extractor.py
+
+import json
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from app_parsing.utils.hashing import text_sha256
+from app_parsing.utils.prompts import PROMPT_TEMPLATE
+
+# Skills matched verbatim on word boundaries. Words that are mostly common
+# English ("Go", "Spring", "R", "Swift", "Oracle", "Excel", "Jest",
+# "Looker") are left out to avoid false positives; pass a custom lexicon to
+# change the list.
+DEFAULT_SKILLS = (
+    "Python", "Java", "JavaScript", "TypeScript", "C++", "C#", "Golang", "Rust", "Scala", "Kotlin",
+    "Ruby", "PHP", "Perl", "MATLAB", "SQL", "NoSQL", "PostgreSQL", "MySQL", "SQLite", "MongoDB", "Redis",
+    "Cassandra", "Elasticsearch", "DynamoDB", "Snowflake", "BigQuery", "Redshift",
+    "HTML", "CSS", "React", "Angular", "Vue.js", "Node.js", "Express.js", "Next.js", "Django", "Flask",
+    "FastAPI", "Spring Boot", "Ruby on Rails", ".NET", "ASP.NET", "GraphQL", "REST", "gRPC",
+    "AWS", "Azure", "GCP", "Google Cloud", "Docker", "Kubernetes", "Terraform", "Ansible", "Jenkins",
+    "GitHub Actions", "GitLab CI", "CI/CD", "Linux", "Bash", "Git", "Microservices", "Kafka", "RabbitMQ",
+    "Airflow", "Spark", "Hadoop", "dbt", "Pandas", "NumPy", "scikit-learn", "TensorFlow", "PyTorch", "Keras",
+    "Machine Learning", "Deep Learning", "NLP", "Computer Vision", "Data Analysis", "Data Engineering",
+    "Power BI", "Tableau", "Jira", "Confluence", "Figma", "Agile", "Scrum", "Kanban",
+    "Salesforce", "SAP", "Selenium", "Cypress", "pytest", "OAuth", "Prometheus", "Grafana",
+)
+# Skills that are also ordinary words ("react quickly", "the rest of the
+# team") only match with their exact capitalisation; so do all-uppercase
+# acronyms such as "REST" or "SAP", whatever the lexicon ("C++" or "CI/CD"
+# are no words and match in any case)
+CASE_SENSITIVE_SKILLS = (
+    "Rust", "Ruby", "Spark", "React", "Angular", "Flask", "Express.js", "Snowflake", "Bash", "Airflow",
+    "Agile", "Scrum", "Kanban", "Cypress", "Selenium", "Prometheus", "Kafka",
+)
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton finding every occurrence of many patterns in one pass."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append(pattern)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if state else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yields (start, end, pattern) of every occurrence, overlapping ones included."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield position - len(pattern) + 1, position + 1, pattern
+
+
+class FastExtractor:
+    """Extracts the mechanical resume fields locally, before the LLM call.
+
+    Email, phone and LinkedIn URL come from precompiled regexes; technical
+    skills written verbatim are found by an Aho-Corasick automaton over a
+    configurable lexicon. The parsing prompt then leaves out the contact
+    fields that were found and only asks for skills beyond those, which
+    saves output tokens; merge() puts the local values back in the record.
+
+    Skills are matched case-insensitively, except alphabetic all-uppercase
+    acronyms and the ``case_sensitive`` ones, which must appear exactly as written.
+
+    Attributes:
+        skills (List[str]): Canonical skill names of the lexicon
+    """
+    EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+    LINKEDIN_RE = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/[A-Za-z0-9_%-]+/?", re.IGNORECASE)
+    PHONE_RE = re.compile(r"(?<![\w/])\+?\(?\d[\d \t().-]{6,}\d(?![\w/])")
+    YEAR_RANGE_RE = re.compile(r"^(19|20)\d{2}\s*-+\s*(19|20)\d{2}$")
+    CONTACT_FIELDS = ("Email", "Phone", "LinkedIn")
+
+    def __init__(self, skills: Optional[Iterable[str]] = None, case_sensitive: Iterable[str] = CASE_SENSITIVE_SKILLS):
+        self.skills = list(dict.fromkeys(skills if skills is not None else DEFAULT_SKILLS))
+        self._canonical = {skill.lower(): skill for skill in self.skills}
+        case_sensitive = set(case_sensitive)
+        self._exact = {key for key, skill in self._canonical.items() if skill in case_sensitive or (skill.isalpha() and skill.isupper())}
+        self._automaton = AhoCorasick(self._canonical)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "FastExtractor":
+        """Loads a lexicon from a JSON list or a text file with one skill per line."""
+        path = Path(path)
+        with path.open("r", encoding="utf-8") as f:
+            if path.suffix == ".json":
+                skills = json.load(f)
+            else:
+                skills = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        return cls(skills)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the lexicon; part of the parse cache key."""
+        return f"fast-path-v2:{text_sha256(*sorted(self._canonical), '|', *sorted(self._exact))[:16]}"
+
+    def _find_phone(self, text: str) -> Optional[str]:
+        for match in self.PHONE_RE.finditer(text):
+            candidate = match.group().strip()
+            digits = sum(char.isdigit() for char in candidate)
+            if 9 <= digits <= 15 and not self.YEAR_RANGE_RE.match(candidate):
+                return candidate
+        return None
+
+    def _find_skills(self, text: str) -> List[str]:
+        lowered = text.lower()
+        matches = []
+        for start, end, pattern in self._automaton.find_all(lowered):
+            before = lowered[start - 1] if start > 0 else " "
+            after = lowered[end] if end < len(lowered) else " "
+            # Whole words only: "Java" must not match inside "JavaScript"
+            if before.isalnum() or after.isalnum() or after == "+" or after == "#":
+                continue
+            if pattern in self._exact and text[start:end] != self._canonical[pattern]:
+                continue
+            matches.append((start, end, pattern))
+
+        # Leftmost-longest, without overlaps ("Spring Boot" over "Spring")
+        skills, covered_until = [], -1
+        for start, end, pattern in sorted(matches, key=lambda m: (m[0], -(m[1] - m[0]))):
+            if start >= covered_until:
+                skills.append(self._canonical[pattern])
+                covered_until = end
+        return list(dict.fromkeys(skills))
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        """Returns the fields found in the resume text.
+
+        Returns:
+            dict: "Email", "Phone" and "LinkedIn" (each only when found)
+                and "Technical Skills" (possibly empty)
+        """
+        fields: Dict[str, Any] = {}
+        if email := self.EMAIL_RE.search(text):
+            fields["Email"] = email.group()
+        if phone := self._find_phone(text):
+            fields["Phone"] = phone
+        if linkedin := self.LINKEDIN_RE.search(text):
+            fields["LinkedIn"] = linkedin.group()
+        fields["Technical Skills"] = self._find_skills(text)
+        return fields
+
+    @staticmethod
+    def build_prompt(fields: Dict[str, Any], template: str = PROMPT_TEMPLATE) -> str:
+        """The parse prompt template without the work already done locally."""
+        for field in FastExtractor.CONTACT_FIELDS:
+            if fields.get(field):
+                template = template.replace(f"    - {field}\n", "", 1)
+        if skills := fields.get("Technical Skills"):
+            known = ", ".join(skills).replace("{", "{{").replace("}", "}}")
+            template = template.replace(
+                "    - Technical Skills (List technical skills)",
+                f"    - Technical Skills (List only technical skills other than: {known})",
+                1
+            )
+        return template
+
+    @staticmethod
+    def merge(parsed_data: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Puts the locally extracted fields into a parsed record."""
+        contact = parsed_data.get("Contact Information")
+        if not isinstance(contact, dict):
+            contact = {}
+        for field in FastExtractor.CONTACT_FIELDS:
+            if fields.get(field):
+                contact[field] = fields[field]
+        parsed_data["Contact Information"] = contact
+
+        if local_skills := fields.get("Technical Skills"):
+            skills = parsed_data.get("Skills")
+            if not isinstance(skills, dict):
+                skills = {}
+            model_skills = skills.get("Technical Skills")
+            merged = list(local_skills)
+            seen = {skill.lower() for skill in merged}
+            for skill in model_skills if isinstance(model_skills, list) else []:
+                if isinstance(skill, str) and skill.lower() not in seen:
+                    merged.append(skill)
+                    seen.add(skill.lower())
+            skills["Technical Skills"] = merged
+            parsed_data["Skills"] = skills
+        return parsed_data
@@ -0,0 +1,358 @@
+#cv parsing 2/app_parsing/services/match_scoring.py
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app_parsing.services.email_personalizer import EmailPersonalizer
+
+# Same weights as EmailPersonalizer.calculate_match_score
+REQUIRED_WEIGHT = 0.4
+NICE_TO_HAVE_WEIGHT = 0.1
+EXPERIENCE_WEIGHT = 0.3
+BACKGROUND_WEIGHT = 0.2
+
+_NO_POSITION = np.iinfo(np.int64).max
+_ERROR_ID = -1
+
+
+def _csr_entries(starts: np.ndarray, rows: np.ndarray):
+    """Flat positions of the entries of some rows of a CSR layout.
+
+    Args:
+        starts: Row pointers; entries of row r are [starts[r], starts[r + 1])
+        rows: Rows to gather
+
+    Returns:
+        tuple: (positions, index into rows of each position)
+    """
+    lengths = starts[rows + 1] - starts[rows]
+    local = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.repeat(starts[rows] - (np.cumsum(lengths) - lengths), lengths)
+    return np.arange(int(lengths.sum())) + offsets, local
+
+
+@dataclass
+class RoleScores:
+    """Match scores of every candidate of a CandidateMatrix for one role.
+
+    Arrays are indexed like CandidateMatrix.records, or like rows when
+    only some candidates were scored. Candidates for which
+    calculate_match_score would fail (malformed parse) have valid False
+    and a total of 0, as the per-candidate code returns.
+    """
+    role_data: Dict[str, Any]
+    required: np.ndarray
+    nice_to_have: np.ndarray
+    experience: np.ndarray
+    background: np.ndarray
+    total: np.ndarray
+    valid: np.ndarray
+    required_skills: List[str]
+    nice_to_have_skills: List[str]
+    rows: Optional[np.ndarray] = None
+
+    def position(self, index: int) -> int:
+        """Position in the arrays of a candidate index of the matrix."""
+        return index if self.rows is None else int(np.searchsorted(self.rows, index))
+
+    def top_k(self, k: int, min_score: float = 0.0) -> np.ndarray:
+        """Indexes of the k best valid candidates scoring at least min_score, best first."""
+        eligible = np.flatnonzero(self.valid & (self.total >= min_score))
+        # Stable sort keeps corpus order between equal scores (rows are sorted)
+        best = eligible[np.argsort(-self.total[eligible], kind="stable")[:k]]
+        return best if self.rows is None else self.rows[best]
+
+
+class CandidateMatrix:
+    """Parsed resumes encoded once into arrays for batch match scoring.
+
+    Skills are stored as a sparse candidate x skill incidence (CSR-style
+    flat arrays over a lower-cased skill vocabulary); professional titles
+    and work-experience industries as ids into vocabularies of distinct
+    strings. Scoring a role then costs a handful of vectorized operations
+    over the whole corpus instead of one Python call per candidate, and
+    reproduces EmailPersonalizer.calculate_match_score exactly, including
+    its handling of malformed records.
+
+    Attributes:
+        records (List[dict]): The encoded resumes, in input order
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        self.records: List[Dict[str, Any]] = list(records)
+        n = len(self.records)
+
+        self.skill_vocab: Dict[str, int] = {}
+        skill_rows: List[int] = []
+        skill_ids: List[int] = []
+        self.skills_valid = np.ones(n, dtype=bool)
+
+        self.years = np.zeros(n, dtype=np.float64)
+        self.years_valid = np.ones(n, dtype=bool)
+
+        title_vocab: Dict[str, int] = {}
+        self.title_ids = np.zeros(n, dtype=np.int64)
+        self.title_valid = np.ones(n, dtype=bool)
+
+        industry_vocab: Dict[str, int] = {}
+        industry_rows: List[int] = []
+        industry_ids: List[int] = []
+        industry_positions: List[int] = []
+
+        for row, candidate in enumerate(self.records):
+            try:
+                skills = candidate.get('Skills', {})
+                lowered = {s.lower() for s in skills.get('Technical Skills', []) + skills.get('Soft Skills', [])}
+                for skill in lowered:
+                    skill_rows.append(row)
+                    skill_ids.append(self.skill_vocab.setdefault(skill, len(self.skill_vocab)))
+            except Exception:
+                self.skills_valid[row] = False
+
+            try:
+                self.years[row] = float(candidate.get('Professional Summary', {}).get('Years of Experience', 0))
+            except Exception:
+                self.years_valid[row] = False
+
+            try:
+                title = candidate.get('Professional Title', '').lower()
+                self.title_ids[row] = title_vocab.setdefault(title, len(title_vocab))
+            except Exception:
+                self.title_valid[row] = False
+
+            # Industries in order; an entry that would raise is kept as an
+            # error marker since it only matters if reached before a match
+            work_exp = candidate.get('Work Experience', [])
+            if work_exp:
+                entries = work_exp if isinstance(work_exp, list) else [None]
+                for position, exp in enumerate(entries):
+                    try:
+                        industry = exp.get('Company Industry', '').lower()
+                        industry_id = industry_vocab.setdefault(industry, len(industry_vocab))
+                    except Exception:
+                        industry_id = _ERROR_ID
+                    industry_rows.append(row)
+                    industry_ids.append(industry_id)
+                    industry_positions.append(position)
+
+        self.skill_rows = np.array(skill_rows, dtype=np.int64)
+        self.skill_ids = np.array(skill_ids, dtype=np.int64)
+        self.titles = np.array(list(title_vocab), dtype=str)
+        self.industries = np.array(list(industry_vocab), dtype=str)
+        self.industry_rows = np.array(industry_rows, dtype=np.int64)
+        self.industry_ids = np.array(industry_ids, dtype=np.int64)
+        self.industry_positions = np.array(industry_positions, dtype=np.int64)
+        # Both flat layouts are filled row by row, so rows are contiguous
+        self.skill_starts = np.searchsorted(self.skill_rows, np.arange(n + 1))
+        self.industry_starts = np.searchsorted(self.industry_rows, np.arange(n + 1))
+        self.candidate_valid = self.skills_valid & self.years_valid & self.title_valid
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _skills_match(self, skills: set, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized EmailPersonalizer._calculate_skills_match for every candidate, or only rows."""
+        n = len(self.records) if rows is None else len(rows)
+        if not skills:
+            return np.full(n, 100.0)
+        wanted = np.zeros(len(self.skill_vocab), dtype=bool)
+        wanted[[self.skill_vocab[s] for s in skills if s in self.skill_vocab]] = True
+        if rows is None:
+            matches = np.bincount(self.skill_rows[wanted[self.skill_ids]], minlength=n)
+        else:
+            positions, local = _csr_entries(self.skill_starts, rows)
+            matches = np.bincount(local[wanted[self.skill_ids[positions]]], minlength=n)
+        return (matches / len(skills)) * 100.0
+
+    def _experience(self, role_data: Dict[str, Any], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized EmailPersonalizer._calculate_experience_relevance."""
+        years = self.years if rows is None else self.years[rows]
+        required_years = EmailPersonalizer._parse_experience_requirement(
+            role_data.get('requirements', {}).get('experience_level', '0')
+        )
+        if required_years > 0:
+            return np.where(
+                years >= required_years,
+                np.minimum(100.0, 80.0 + (years - required_years) * 5),
+                (years / required_years) * 80.0
+            )
+        return np.full(len(years), 100.0)
+
+    def _background(self, role_data: Dict[str, Any], rows: Optional[np.ndarray] = None):
+        """Vectorized EmailPersonalizer._calculate_background_relevance.
+
+        Returns:
+            tuple: (scores, mask of candidates whose evaluation would raise)
+        """
+        if rows is None:
+            n = len(self.records)
+            title_ids = self.title_ids
+            industry_rows, industry_ids = self.industry_rows, self.industry_ids
+            industry_positions = self.industry_positions
+        else:
+            n = len(rows)
+            title_ids = self.title_ids[rows]
+            entries, industry_rows = _csr_entries(self.industry_starts, rows)
+            industry_ids = self.industry_ids[entries]
+            industry_positions = self.industry_positions[entries]
+        target_words = role_data.get('title', '').lower().split()
+        industry = role_data.get('industry', '').lower()
+
+        title_hits = np.zeros(len(self.titles), dtype=bool)
+        for word in target_words:
+            title_hits |= np.char.find(self.titles, word) >= 0
+        score = np.where(title_hits[title_ids], 60.0, 0.0) if len(self.titles) else np.zeros(n)
+
+        # any() stops at the first matching industry, so an entry that would
+        # raise only matters when it comes before the first match
+        first_hit = np.full(n, _NO_POSITION, dtype=np.int64)
+        first_error = np.full(n, _NO_POSITION, dtype=np.int64)
+        is_error = industry_ids == _ERROR_ID
+        if len(self.industries):
+            vocab_hits = np.char.find(self.industries, industry) >= 0
+            is_hit = ~is_error & vocab_hits[np.where(is_error, 0, industry_ids)]
+            np.minimum.at(first_hit, industry_rows[is_hit], industry_positions[is_hit])
+        np.minimum.at(first_error, industry_rows[is_error], industry_positions[is_error])
+
+        score = score + np.where(first_hit < first_error, 40.0, 0.0)
+        return np.minimum(100.0, score), first_error < first_hit
+
+    def score_role(self, role_data: Dict[str, Any], rows: Optional[np.ndarray] = None) -> RoleScores:
+        """Scores every candidate against one role.
+
+        Args:
+            role_data: Role description, as for calculate_match_score
+            rows: Sorted candidate indexes to score instead of the whole
+                matrix; the arrays of the result are then indexed like rows
+
+        Returns:
+            RoleScores: Scores of the candidates
+        """
+        n = len(self.records) if rows is None else len(rows)
+        try:
+            required_skills = set(s.lower() for s in role_data.get('requirements', {}).get('must_have', []))
+            nice_to_have = set(s.lower() for s in role_data.get('requirements', {}).get('nice_to_have', []))
+            required = self._skills_match(required_skills, rows)
+            nice = self._skills_match(nice_to_have, rows)
+            experience = self._experience(role_data, rows)
+            background, background_error = self._background(role_data, rows)
+        except Exception as e:
+            logging.error(f"Error calculating match scores for role {role_data.get('title')}: {str(e)}")
+            zeros = np.zeros(n)
+            return RoleScores(role_data, zeros, zeros, zeros, zeros, zeros, np.zeros(n, dtype=bool), [], [], rows)
+
+        total = (
+            required * REQUIRED_WEIGHT +
+            nice * NICE_TO_HAVE_WEIGHT +
+            experience * EXPERIENCE_WEIGHT +
+            background * BACKGROUND_WEIGHT
+        )
+        total = np.minimum(100.0, np.maximum(0.0, total))
+        candidate_valid = self.candidate_valid if rows is None else self.candidate_valid[rows]
+        valid = candidate_valid & ~background_error
+        total = np.where(valid, total, 0.0)
+        return RoleScores(role_data, required, nice, experience, background, total, valid,
+                          sorted(required_skills), sorted(nice_to_have), rows)
+
+    def score_roles(self, roles: Iterable[Dict[str, Any]]) -> List[RoleScores]:
+        """Scores every candidate against each role."""
+        return [self.score_role(role_data) for role_data in roles]
+
+    def total_matrix(self, roles: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Total scores as a roles x candidates array."""
+        scores = self.score_roles(roles)
+        return np.vstack([role_scores.total for role_scores in scores]) if scores else np.zeros((0, len(self)))
+
+    def match_result(self, role_scores: RoleScores, index: int) -> Dict[str, Any]:
+        """The calculate_match_score dictionary of one candidate.
+
+        Values are rounded with Python's round(), as calculate_match_score
+        does, so they are identical to its output.
+        """
+        position = role_scores.position(index)
+        if not role_scores.valid[position]:
+            return {'total_score': 0, 'breakdown': {}, 'matching_skills': [], 'bonus_skills': []}
+        candidate_skills = set(self.skill_ids[self.skill_starts[index]:self.skill_starts[index + 1]].tolist())
+        return {
+            'total_score': round(float(role_scores.total[position]), 1),
+            'breakdown': {
+                'required_skills': round(float(role_scores.required[position]), 1),
+                'nice_to_have': round(float(role_scores.nice_to_have[position]), 1),
+                'experience': round(float(role_scores.experience[position]), 1),
+                'background': round(float(role_scores.background[position]), 1)
+            },
+            'matching_skills': [s for s in role_scores.required_skills
+                                if self.skill_vocab.get(s) in candidate_skills],
+            'bonus_skills': [s for s in role_scores.nice_to_have_skills
+                             if self.skill_vocab.get(s) in candidate_skills]
+        }
+
+
+class SkillIndex:
+    """Inverted index from lower-cased skill to the candidates listing it.
+
+    Built on the skill incidence of a CandidateMatrix, so a skill matches
+    exactly when calculate_match_score would count it.
+    """
+
+    def __init__(self, matrix: CandidateMatrix):
+        self.matrix = matrix
+        order = np.argsort(matrix.skill_ids, kind="stable")
+        self._rows = matrix.skill_rows[order]
+        # Postings of skill id i are _rows[_starts[i]:_starts[i + 1]]
+        self._starts = np.searchsorted(matrix.skill_ids[order], np.arange(len(matrix.skill_vocab) + 1))
+
+    def postings(self, skill: str) -> np.ndarray:
+        """Candidate indexes listing a skill."""
+        skill_id = self.matrix.skill_vocab.get(skill.lower())
+        if skill_id is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._rows[self._starts[skill_id]:self._starts[skill_id + 1]]
+
+    def candidates_with_any(self, skills: Iterable[str]) -> np.ndarray:
+        """Sorted candidate indexes listing at least one of the skills."""
+        postings = [self.postings(skill) for skill in skills]
+        return np.unique(np.concatenate(postings)) if postings else np.zeros(0, dtype=np.int64)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"candidates": len(self.matrix), "skills": len(self.matrix.skill_vocab),
+                "postings": len(self._rows)}
+
+
+def match_roles(matrix: CandidateMatrix, roles: Iterable[Dict[str, Any]], top_k: int = 10,
+                min_score: float = 0.0, index: SkillIndex = None) -> List[Dict[str, Any]]:
+    """Ranks candidates for many roles at once.
+
+    For each role, only candidates sharing at least one must-have skill are
+    considered (every candidate when the role has none); only those rows
+    of the matrix are scored, and the top_k best scoring at least
+    min_score are kept.
+
+    Args:
+        matrix: Encoded candidates
+        roles: Role descriptions, as for calculate_match_score
+        top_k: Candidates kept per role
+        min_score: Minimum total score of a kept candidate
+        index: Skill index of the matrix, built if omitted
+
+    Returns:
+        List with, for each role, {"role", "eligible", "matches"}, where
+        matches are (candidate index, calculate_match_score result) pairs,
+        best first
+    """
+    index = index or SkillIndex(matrix)
+    results = []
+    for role_data in roles:
+        must_have = (role_data.get('requirements') or {}).get('must_have') or []
+        rows = index.candidates_with_any(must_have) if must_have else None
+
+        role_scores = matrix.score_role(role_data, rows)
+        results.append({
+            "role": role_data,
+            "eligible": len(matrix) if rows is None else len(rows),
+            "matches": [(int(i), matrix.match_result(role_scores, i)) for i in role_scores.top_k(top_k, min_score)]
+        })
+    return results
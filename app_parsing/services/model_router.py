@@ -0,0 +1,152 @@
+#cv parsing 2/app_parsing/services/model_router.py
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from app_parsing.services.api_tracker import LatencyHistogram
+from app_parsing.utils.hashing import text_sha256
+
+# Cheap, fast model first; long resumes, where the small model tends to drop
+# fields, and answers that fail validation go to the stronger one
+DEFAULT_ROUTING: Dict[str, Dict[str, Any]] = {
+    "parse": {
+        "routes": [
+            {"max_input_tokens": 6000, "model": "gpt-4o-mini"},
+            {"model": "gpt-4o"}
+        ],
+        "escalate_to": ["gpt-4o"]
+    },
+    "email": {
+        "routes": [{"model": "gpt-4o-mini"}],
+        "escalate_to": ["gpt-4o"]
+    }
+}
+
+
+class ModelRouter:
+    """Picks the model of each request and the models to escalate to.
+
+    Each stage ("parse", "email") has ordered routes: the first route
+    whose ``max_input_tokens`` covers the request (a route without it
+    matches everything) gives the model to try first. When an answer fails
+    schema validation the request is sent again to the next model of
+    ``escalate_to``. Per-model answer counts, success rate, latency and
+    cost are kept for the run statistics.
+
+    A configuration file holds the same structure as DEFAULT_ROUTING; a
+    stage missing from it keeps its default.
+
+    Attributes:
+        config (dict): Routes and escalation chain per stage
+        escalations (dict): Number of escalations per stage
+    """
+
+    def __init__(self, config: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.config = {**DEFAULT_ROUTING, **(config or {})}
+        for stage, stage_config in self.config.items():
+            routes = stage_config.get("routes") or []
+            if not routes or "max_input_tokens" in routes[-1]:
+                raise ValueError(f"The last {stage} route must match every request (no max_input_tokens)")
+        self.escalations: Dict[str, int] = {}
+        self._models: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "ModelRouter":
+        """Loads the routing configuration from a JSON file."""
+        with Path(path).open("r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def signature(self) -> str:
+        """Identifies the routing; part of the parse and email cache keys."""
+        return f"router-v1:{text_sha256(json.dumps(self.config, sort_keys=True))[:16]}"
+
+    def models_for(self, stage: str, input_tokens: int) -> List[str]:
+        """Models to try in order: the routed model, then the escalation chain.
+
+        Args:
+            stage: "parse" or "email"
+            input_tokens: Size of the text sent to the model
+
+        Returns:
+            list: Model names without duplicates
+        """
+        stage_config = self.config[stage]
+        first = next(route["model"] for route in stage_config["routes"]
+                     if input_tokens <= route.get("max_input_tokens", input_tokens))
+        return list(dict.fromkeys([first, *stage_config.get("escalate_to", [])]))
+
+    def record(self, stage: str, model: str, valid: bool, latency_seconds: Optional[float] = None,
+               cost_usd: float = 0.0) -> None:
+        """Records one answer of a model and whether it passed validation."""
+        with self._lock:
+            stats = self._models.setdefault(stage, {}).setdefault(
+                model, {"answers": 0, "valid": 0, "cost_usd": 0.0, "latency": LatencyHistogram()}
+            )
+            stats["answers"] += 1
+            stats["valid"] += valid
+            stats["cost_usd"] += cost_usd
+            if latency_seconds is not None:
+                stats["latency"].observe(latency_seconds)
+
+    def record_escalation(self, stage: str) -> None:
+        with self._lock:
+            self.escalations[stage] = self.escalations.get(stage, 0) + 1
+
+    def merge(self, other: "ModelRouter") -> None:
+        """Adds the answers and escalations recorded by another router, e.g. of another worker."""
+        self._add_state(other.to_dict())
+
+    def _add_state(self, state: Dict[str, Any]) -> None:
+        with self._lock:
+            for stage, count in state["escalations"].items():
+                self.escalations[stage] = self.escalations.get(stage, 0) + count
+            for stage, models in state["models"].items():
+                for model, other_stats in models.items():
+                    stats = self._models.setdefault(stage, {}).setdefault(
+                        model, {"answers": 0, "valid": 0, "cost_usd": 0.0, "latency": LatencyHistogram()}
+                    )
+                    stats["answers"] += other_stats["answers"]
+                    stats["valid"] += other_stats["valid"]
+                    stats["cost_usd"] += other_stats["cost_usd"]
+                    stats["latency"].merge(LatencyHistogram.from_dict(other_stats["latency"]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Configuration and full recorded state, see from_dict."""
+        with self._lock:
+            return {
+                "config": self.config,
+                "escalations": dict(self.escalations),
+                "models": {
+                    stage: {model: {**stats, "latency": stats["latency"].to_dict()} for model, stats in models.items()}
+                    for stage, models in self._models.items()
+                }
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelRouter":
+        router = cls(data["config"])
+        router._add_state(data)
+        return router
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                stage: {
+                    "escalations": self.escalations.get(stage, 0),
+                    "models": {
+                        model: {
+                            "answers": stats["answers"],
+                            "valid": stats["valid"],
+                            "success_rate": round(stats["valid"] / stats["answers"], 3) if stats["answers"] else 0,
+                            "cost_usd": round(stats["cost_usd"], 4),
+                            "latency_seconds": stats["latency"].get_stats()
+                        }
+                        for model, stats in self._models.get(stage, {}).items()
+                    }
+                }
+                for stage in self.config
+            }
@@ -0,0 +1,288 @@
+#cv parsing 2/app_parsing/services/pipeline.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import List, Optional
+
+from app_parsing.services.api_tracker import APIUsageTracker, MetricsFileExporter
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.compact_schema import CompactSchema
+from app_parsing.services.disk_cache import DiskCache
+from app_parsing.services.document_loader import DocumentLoader
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.resume_processor import (
+    ResultRecorder,
+    _cache_variants,
+    PERMANENT,
+    _failure_record,
+    _lookup_cache,
+    _resume_from_journal,
+    parse_single_resume
+)
+from app_parsing.services.run_journal import RunJournal
+from app_parsing.services.text_preprocessor import TextPreprocessor
+
+_DONE = object()
+
+
+def extract_text(file_path: str) -> tuple:
+    """Extracts the text of one resume; runs inside a worker process.
+
+    Args:
+        file_path: Path to the resume file
+
+    Returns:
+        tuple: (file_path, text or None, error message or None, CPU seconds)
+    """
+    start = time.process_time()
+    try:
+        text = DocumentLoader.load_document(Path(file_path))
+        return file_path, text, None, time.process_time() - start
+    except Exception as e:
+        return file_path, None, str(e), time.process_time() - start
+
+
+class StageStats:
+    """Thread-safe throughput counters of one pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    def record(self, busy_seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy_seconds
+            if self.first_start is None:
+                self.first_start = now - busy_seconds
+            self.last_end = now
+
+    def get_stats(self, workers: int) -> dict:
+        wall = (self.last_end - self.first_start) if self.items else 0.0
+        return {
+            "workers": workers,
+            "items": self.items,
+            "wall_seconds": round(wall, 2),
+            "busy_seconds": round(self.busy_seconds, 2),
+            "items_per_second": round(self.items / wall, 2) if wall > 0 else 0,
+            "utilisation": round(self.busy_seconds / (wall * workers), 2) if wall > 0 else 0
+        }
+
+
+class ExtractionPipeline:
+    """Two-stage resume parsing pipeline.
+
+    Stage 1 extracts text on a ProcessPoolExecutor so CPU-heavy PDF parsing
+    does not compete for the GIL with the network threads. Extracted texts
+    go through a bounded queue into stage 2, where a pool of threads calls
+    the LLM. Extraction therefore runs ahead while requests are in flight,
+    each document is extracted exactly once, and the bounded queue keeps
+    memory flat when the LLM stage is the bottleneck.
+
+    Attributes:
+        extract_workers (int): Number of extraction processes
+        llm_workers (int): Number of threads waiting on the API
+        queue_size (int): Maximum number of extracted texts waiting for the LLM
+    """
+
+    def __init__(self, extract_workers: Optional[int] = None, llm_workers: int = 3, queue_size: int = 32):
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.llm_workers = llm_workers
+        self.queue_size = queue_size
+        self.extract_stats = StageStats()
+        self.llm_stats = StageStats()
+
+    def _produce(self, cv_paths: List[Path], base_args: dict, work: queue.Queue, errors: list,
+                 stop: threading.Event) -> None:
+        """Feeds the queue with cache hits and extracted texts until done or stopped."""
+        cache, variants = base_args.get("cache"), _cache_variants(base_args)
+        try:
+            with ProcessPoolExecutor(max_workers=self.extract_workers) as pool:
+                in_flight = {}
+                for path in cv_paths:
+                    if stop.is_set():
+                        break
+                    cache_key, cached = _lookup_cache(path, cache, variants)
+                    if cached is not None:
+                        work.put((path, None, cached, None))
+                        continue
+                    in_flight[pool.submit(extract_text, str(path))] = (path, cache_key)
+                    # Never run further ahead than the workers plus the queue
+                    while len(in_flight) >= self.extract_workers * 2:
+                        self._drain(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, work)
+                while in_flight:
+                    self._drain(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, work)
+        except Exception as e:
+            logging.error(f"Extraction stage failed: {str(e)}")
+            errors.append(e)
+        finally:
+            for _ in range(self.llm_workers):
+                work.put(_DONE)
+
+    def _drain(self, done, in_flight: dict, work: queue.Queue) -> None:
+        for future in done:
+            path, cache_key = in_flight.pop(future)
+            _, text, error, cpu_seconds = future.result()
+            self.extract_stats.record(cpu_seconds)
+            if error is not None:
+                logging.error(f"Extraction failed for {path.name}. Error: {error}")
+                work.put((path, None, _failure_record(path, ValueError(error), error_class=PERMANENT), None))
+            else:
+                work.put((path, text, None, cache_key))
+
+    def run(self, cv_paths: List[Path], base_args: dict, on_result) -> None:
+        """Runs both stages until every path has produced a record.
+
+        A resume whose parsing raises gets a failure record. An error in
+        on_result (e.g. the repository cannot be written) is fatal: the
+        extraction stage is stopped, the queue is drained so that it never
+        blocks, and the error is raised here once both stages are done.
+
+        Args:
+            cv_paths: Resume files to parse
+            base_args: client, api_tracker, cache, preprocessor and
+                fast_extractor passed to parse_single_resume
+            on_result: Callback receiving each finished record (called from
+                the LLM threads, must be thread-safe)
+        """
+        work: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        errors: list = []
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(cv_paths, base_args, work, errors, stop), daemon=True
+        )
+        producer.start()
+
+        def consume():
+            while (item := work.get()) is not _DONE:
+                if stop.is_set():
+                    continue
+                path, text, data, cache_key = item
+                try:
+                    if data is None:
+                        start = time.time()
+                        try:
+                            data = parse_single_resume({
+                                **base_args,
+                                "file_path": path,
+                                "resume_text": text,
+                                "cache_key": cache_key
+                            })
+                        except Exception as e:
+                            logging.error(f"Parsing failed unexpectedly for {path.name}. Error: {str(e)}")
+                            data = _failure_record(path, e)
+                        self.llm_stats.record(time.time() - start)
+                    on_result(data)
+                except BaseException as e:
+                    logging.error(f"LLM stage failed: {str(e)}")
+                    errors.append(e)
+                    stop.set()
+
+        consumers = [threading.Thread(target=consume, daemon=True) for _ in range(self.llm_workers)]
+        for consumer in consumers:
+            consumer.start()
+        for consumer in consumers:
+            consumer.join()
+        producer.join()
+        if errors:
+            raise errors[0]
+
+    def get_stats(self) -> dict:
+        return {
+            "queue_size": self.queue_size,
+            "extraction": self.extract_stats.get_stats(self.extract_workers),
+            "llm": self.llm_stats.get_stats(self.llm_workers)
+        }
+
+
+def process_resumes_pipelined(cv_file_paths: List[str], output_json_path: str = "parsed_resumes.json",
+                              extract_workers: Optional[int] = None, llm_workers: int = 3, queue_size: int = 32,
+                              cache_dir: Optional[str] = None,
+                              cache_max_size_mb: float = DiskCache.DEFAULT_MAX_SIZE_MB,
+                              cache_max_age_days: float = DiskCache.DEFAULT_MAX_AGE_DAYS,
+                              output_format: str = "json", journal: Optional[RunJournal] = None,
+                              preprocessor: Optional[TextPreprocessor] = None,
+                              metrics_file: Optional[str] = None,
+                              fast_extractor: Optional[FastExtractor] = None,
+                              repository: Optional[CandidateRepository] = None,
+                              compact_schema: Optional[CompactSchema] = None,
+                              router: Optional[ModelRouter] = None) -> Path:
+    """Process resumes with text extraction and LLM calls in separate stages.
+
+    Produces the same output as process_resumes, plus a "pipeline" block in
+    the statistics with the throughput of each stage.
+
+    Args:
+        cv_file_paths (List[str]): List of paths to resume files
+        output_json_path (str): Path for the output JSON file
+        extract_workers (Optional[int]): Extraction processes, defaults to the CPU count
+        llm_workers (int): Threads making API calls
+        queue_size (int): Maximum number of extracted texts waiting for the LLM stage
+        cache_dir (Optional[str]): Directory of the persistent parse cache,
+            None disables caching
+        cache_max_size_mb (float): Size budget of the parse cache
+        cache_max_age_days (float): Maximum age of a cached parse
+        output_format (str): "json" or "jsonl", see process_resumes
+        journal (Optional[RunJournal]): Checkpoint journal, see process_resumes
+        preprocessor (Optional[TextPreprocessor]): See process_resumes
+        metrics_file (Optional[str]): See process_resumes
+        fast_extractor (Optional[FastExtractor]): See process_resumes
+        repository (Optional[CandidateRepository]): See process_resumes
+        compact_schema (Optional[CompactSchema]): See process_resumes
+        router (Optional[ModelRouter]): See process_resumes
+
+    Returns:
+        Path: Path of the generated JSON file
+    """
+    from openai import OpenAI
+
+    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    api_tracker = APIUsageTracker()
+    exporter = MetricsFileExporter(api_tracker, metrics_file).start() if metrics_file else None
+    cache = DiskCache(cache_dir, cache_max_size_mb, cache_max_age_days) if cache_dir else None
+
+    cv_paths = [Path(path) for path in cv_file_paths]
+    recorder = ResultRecorder(output_json_path, output_format, repository)
+    cv_paths, previous_time = _resume_from_journal(journal, cv_paths, recorder, api_tracker)
+    pipeline = ExtractionPipeline(extract_workers, llm_workers, queue_size)
+    record_lock = threading.Lock()
+
+    def on_result(data: dict) -> None:
+        if journal is not None:
+            journal.append(data)
+        with record_lock:
+            recorder.add(data)
+
+    logging.info(f"Starting to process {len(cv_paths)} resumes with {pipeline.extract_workers} extraction "
+                 f"processes and {llm_workers} LLM workers")
+    start_time = time.time()
+    pipeline.run(cv_paths, {
+        "client": client,
+        "api_tracker": api_tracker,
+        "cache": cache,
+        "preprocessor": preprocessor,
+        "fast_extractor": fast_extractor,
+        "compact_schema": compact_schema,
+        "router": router
+    }, on_result)
+    processing_time = time.time() - start_time + previous_time
+    if exporter is not None:
+        exporter.stop()
+
+    extra_statistics = {"pipeline": pipeline.get_stats()}
+    if journal is not None:
+        journal.close()
+        extra_statistics["run_id"] = journal.run_id
+    if router is not None:
+        extra_statistics["model_routing"] = router.get_stats()
+    return recorder.finish(processing_time, api_tracker, cache, **extra_statistics)
@@ -0,0 +1,190 @@
+#cv parsing 2/app_parsing/services/rate_limiter.py
+
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Continuously refilling token bucket.
+
+    The bucket holds at most ``capacity`` units and refills at
+    ``capacity * rate_factor`` units per ``period`` seconds.
+
+    Attributes:
+        capacity (float): Maximum number of units in the bucket
+        period (float): Seconds needed to refill a full bucket
+        rate_factor (float): Fraction of the nominal refill rate currently allowed
+    """
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate_factor = 1.0
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period * self.rate_factor
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate_factor(self, rate_factor: float) -> None:
+        """Changes the refill rate, crediting the time elapsed at the old rate first."""
+        self._refill(time.monotonic())
+        self.rate_factor = rate_factor
+
+    def wait_time(self, amount: float) -> float:
+        """Returns how long to wait before ``amount`` units are available.
+
+        Args:
+            amount: Units requested, capped at the bucket capacity
+
+        Returns:
+            float: Seconds to wait, 0 if the units can be taken now
+        """
+        self._refill(time.monotonic())
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Takes units from the bucket; the level may go negative (debt)."""
+        self._refill(time.monotonic())
+        self.level -= amount
+
+
+class AsyncRateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for asyncio code.
+
+    Every request must ``acquire`` an estimate of its token cost first and
+    ``settle`` the real usage afterwards. When the API answers with HTTP 429
+    ``on_rate_limited`` halves the allowed rate and pauses all callers; each
+    successful call then restores the rate additively. A call that fails
+    gives its reservation back with ``release``.
+
+    Attributes:
+        requests (TokenBucket): Requests per minute bucket
+        tokens (TokenBucket): Tokens per minute bucket
+        rate_factor (float): Fraction of the nominal rate currently allowed
+        throttled (int): Number of 429 responses seen
+    """
+    MIN_RATE_FACTOR = 0.1
+    RECOVERY_STEP = 0.05
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def rate_factor(self) -> float:
+        return self.requests.rate_factor
+
+    @rate_factor.setter
+    def rate_factor(self, value: float) -> None:
+        # Both buckets refill at the reduced rate until successes restore it
+        self.requests.set_rate_factor(value)
+        self.tokens.set_rate_factor(value)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Waits until one request and ``estimated_tokens`` tokens are available."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                wait = max(
+                    pause,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(estimated_tokens)
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Corrects the token bucket once a successful response is known.
+
+        Only successful responses restore the rate; failed calls must use
+        release, or every 429 would cancel its own slowdown.
+        """
+        self.tokens.consume(actual_tokens - estimated_tokens)
+        self.rate_factor = min(1.0, self.rate_factor + self.RECOVERY_STEP)
+
+    def release(self, estimated_tokens: int) -> None:
+        """Gives back the tokens reserved by a call that failed, without recovering the rate."""
+        self.tokens.consume(-estimated_tokens)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """Backs off after a 429 response.
+
+        Args:
+            retry_after: Delay requested by the server, if any
+
+        Returns:
+            float: Seconds all callers are paused for
+        """
+        self.throttled += 1
+        self.rate_factor = max(self.MIN_RATE_FACTOR, self.rate_factor / 2)
+        delay = retry_after if retry_after is not None else 60.0 / max(self.requests.capacity * self.rate_factor, 1)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logging.warning(f"Rate limited by API, pausing {delay:.1f}s (rate factor {self.rate_factor:.2f})")
+        return delay
+
+    def get_stats(self) -> dict:
+        return {
+            "rpm": int(self.requests.capacity),
+            "tpm": int(self.tokens.capacity),
+            "rate_limited_responses": self.throttled,
+            "final_rate_factor": round(self.rate_factor, 2)
+        }
+
+
+# 429 retries allowed per call: a 429 that never clears must not loop forever
+MAX_RATE_LIMIT_RETRIES = 8
+
+
+def quota_exhausted(error: Exception) -> bool:
+    """Whether a 429 means the account quota is used up, which waiting does not fix."""
+    return "insufficient_quota" in (getattr(error, "code", None), getattr(error, "type", None))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Reads the Retry-After header of a 429 response, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, base: float = 1.0, cap: float = 30.0) -> float:
+    """Jittered exponential backoff before retrying a failed call.
+
+    Without jitter, workers that failed together retry together and hit the
+    API in the same instant again. A delay requested by the server is
+    honoured and only stretched by a small random margin.
+
+    Args:
+        attempt: Number of the failed attempt, starting at 0
+        retry_after: Delay requested by the server (Retry-After), if any
+        base: Delay scale of the first retry in seconds
+        cap: Upper bound of the exponential delay
+
+    Returns:
+        float: Seconds to wait
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(base / 2, min(cap, base * 2 ** attempt))
@@ -0,0 +1,289 @@
+#cv parsing 2/app_parsing/services/resume_packer.py
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.resume_processor import (
+    EXPECTED_COMPLETION_TOKENS,
+    PARSE_MAX_TOKENS,
+    PARSE_MODEL,
+    _cache_variants,
+    _failure_record,
+    _lookup_cache,
+    _new_usage,
+    _run_fast_path,
+    _success_record,
+    load_resume_text,
+    parse_single_resume
+)
+from app_parsing.utils.json_repair import loads_repaired
+from app_parsing.services.text_preprocessor import count_tokens
+from app_parsing.utils.prompts import PACKED_PROMPT_TEMPLATE
+
+
+@dataclass
+class PackItem:
+    """An extracted resume waiting to be packed into a request."""
+    path: Path
+    text: str
+    tokens: int
+    cache_key: Optional[str] = None
+    preprocessing: Optional[dict] = None
+    fast_fields: Optional[dict] = None
+    fast_path: Optional[dict] = None
+
+
+def iter_packs(items: Iterable[PackItem], token_budget: int, max_pack_size: int) -> Iterator[List[PackItem]]:
+    """Groups resumes, in order, into packs of at most token_budget resume tokens.
+
+    Each pack is yielded as soon as the next resume does not fit in it, so
+    items can be produced lazily. A resume larger than the budget gets a
+    pack of its own.
+    """
+    current: List[PackItem] = []
+    current_tokens = 0
+    for item in items:
+        if current and (current_tokens + item.tokens > token_budget or len(current) >= max_pack_size):
+            yield current
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += item.tokens
+    if current:
+        yield current
+
+
+def build_packs(items: List[PackItem], token_budget: int, max_pack_size: int) -> List[List[PackItem]]:
+    """All the packs of iter_packs as a list."""
+    return list(iter_packs(items, token_budget, max_pack_size))
+
+
+def split_usage(usage: dict, weights: List[int]) -> List[dict]:
+    """Shares one request's usage between the resumes of a pack.
+
+    Tokens are split in proportion to the weights, each counted as at
+    least 1 (the rounding remainder goes to the first resume); the API call
+    itself is attributed to the first resume so that per-record usage still
+    adds up to the run total.
+    """
+    weights = [max(weight, 1) for weight in weights]
+    total_weight = sum(weights)
+    shares = [_new_usage() for _ in weights]
+    for key in ("tokens_used", "input_tokens", "output_tokens"):
+        for share, weight in zip(shares, weights):
+            share[key] = usage[key] * weight // total_weight
+        shares[0][key] += usage[key] - sum(share[key] for share in shares)
+    shares[0]["api_calls"] = usage["api_calls"]
+    return shares
+
+
+def _bounded_map(executor: ThreadPoolExecutor, fn, values: Iterable, window: int) -> Iterator:
+    """Like executor.map, in order, but with at most ``window`` calls submitted and not yet consumed.
+
+    executor.map submits every call at once, so all the results would be
+    held in memory before the first one is read.
+    """
+    pending = deque()
+    for value in values:
+        pending.append(executor.submit(fn, value))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def parse_packed_response(content: str) -> Dict[str, dict]:
+    """Maps resume ids to parsed resumes in a packed response.
+
+    Common JSON defects are repaired locally; a truncated array keeps its
+    complete elements and drops the last one, which may have been cut short.
+    Elements that are malformed are left out, so their resumes are parsed
+    again individually.
+
+    Raises:
+        ValueError: If the response is not valid JSON even after repair
+    """
+    payload, repaired = loads_repaired(content)
+    if isinstance(payload, dict):
+        # Some answers wrap the array in an object
+        payload = next((value for value in payload.values() if isinstance(value, list)), [])
+    truncated = not content.rstrip().rstrip("`").rstrip().endswith(("]", "}"))
+    if repaired and truncated and isinstance(payload, list):
+        payload = payload[:-1]
+    parts = {}
+    for element in payload if isinstance(payload, list) else []:
+        if isinstance(element, dict) and isinstance(element.get("data"), dict) and element["data"]:
+            parts[str(element.get("resume_id"))] = element["data"]
+    return parts
+
+
+class ResumePacker:
+    """Parses several small resumes with a single LLM request.
+
+    The parsing instructions are several hundred tokens long and, for
+    one-page resumes, larger than the resume itself. The packer extracts
+    the resumes a few packs ahead of the requests, groups the small ones
+    into packs of up to token_budget resume tokens and sends each pack with the instructions
+    once, asking for a JSON array keyed by resume id. The answer is split
+    back per file; any resume missing from it or unparseable is re-run on
+    its own with parse_single_resume.
+
+    Attributes:
+        token_budget (int): Maximum resume tokens in one request
+        max_pack_size (int): Maximum resumes in one request, bounded by the
+            completion tokens the model can return
+    """
+    DEFAULT_TOKEN_BUDGET = 6000
+    DEFAULT_MAX_PACK_SIZE = PARSE_MAX_TOKENS // EXPECTED_COMPLETION_TOKENS
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, max_pack_size: int = DEFAULT_MAX_PACK_SIZE):
+        self.token_budget = token_budget
+        self.max_pack_size = max(1, max_pack_size)
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.packed_resumes = 0
+        self.fallbacks = 0
+
+    def _prepare(self, path: Path, base_args: dict, variants: tuple) -> Union[PackItem, dict]:
+        """Returns a cached record, a failure record or an extracted PackItem."""
+        cache_key, cached = _lookup_cache(path, base_args.get("cache"), variants)
+        if cached is not None:
+            return cached
+        try:
+            text = load_resume_text(path)
+            preprocessing = None
+            fast_metadata = {}
+            fast_fields = _run_fast_path(base_args.get("fast_extractor"), text, fast_metadata)
+            if base_args.get("preprocessor") is not None:
+                text, preprocessing = base_args["preprocessor"].process(text)
+        except Exception as e:
+            logging.error(f"Extraction failed for {path.name}. Error: {str(e)}")
+            return _failure_record(path, e)
+        return PackItem(path, text, count_tokens(text), cache_key, preprocessing,
+                        fast_fields, fast_metadata.get("fast_path"))
+
+    def _parse_alone(self, item: PackItem, base_args: dict) -> dict:
+        # The text is already preprocessed and the fast path already run on
+        # the raw text, so neither is passed again
+        data = parse_single_resume({
+            **base_args,
+            "file_path": item.path,
+            "resume_text": item.text,
+            "fast_fields": item.fast_fields,
+            "cache_key": item.cache_key,
+            "preprocessor": None
+        })
+        if item.preprocessing is not None:
+            data["_metadata"]["preprocessing"] = item.preprocessing
+        if item.fast_path is not None and data["_metadata"].get("success"):
+            data["_metadata"]["fast_path"] = item.fast_path
+        return data
+
+    def _parse_pack(self, pack: List[PackItem], base_args: dict) -> List[dict]:
+        if len(pack) == 1:
+            return [self._parse_alone(pack[0], base_args)]
+
+        client, api_tracker, cache = base_args["client"], base_args["api_tracker"], base_args.get("cache")
+        resumes = "\n\n".join(f"=== RESUME {index} ===\n{item.text}" for index, item in enumerate(pack, 1))
+        usage = _new_usage()
+        parts: Dict[str, dict] = {}
+        try:
+            start = time.perf_counter()
+            response = client.chat.completions.create(
+                model=PARSE_MODEL,
+                messages=[{"role": "user", "content": PACKED_PROMPT_TEMPLATE.format(resumes=resumes)}],
+                max_tokens=PARSE_MAX_TOKENS,
+                temperature=0
+            )
+            api_tracker.record_response(response, time.perf_counter() - start, stage="parse")
+            usage.update({
+                "tokens_used": response.usage.total_tokens,
+                "input_tokens": response.usage.prompt_tokens,
+                "output_tokens": response.usage.completion_tokens,
+                "api_calls": 1
+            })
+            parts = parse_packed_response(response.choices[0].message.content)
+        except Exception as e:
+            logging.error(f"Packed request of {len(pack)} resumes failed, parsing them one by one. Error: {str(e)}")
+
+        records = []
+        fallbacks = 0
+        for index, (item, share) in enumerate(zip(pack, split_usage(usage, [item.tokens for item in pack])), 1):
+            parsed_data = parts.get(str(index))
+            if parsed_data is not None:
+                if item.fast_fields is not None:
+                    FastExtractor.merge(parsed_data, item.fast_fields)
+                if item.cache_key:
+                    cache.put(item.cache_key, parsed_data)
+                extra_metadata = {"packed": {"pack_size": len(pack)}}
+                if item.preprocessing is not None:
+                    extra_metadata["preprocessing"] = item.preprocessing
+                if item.fast_path is not None:
+                    extra_metadata["fast_path"] = item.fast_path
+                records.append(_success_record(parsed_data, item.path, share, extra_metadata))
+                continue
+
+            fallbacks += 1
+            data = self._parse_alone(item, base_args)
+            # The record also accounts for its share of the failed pack
+            for key, value in share.items():
+                data["_metadata"][key] = data["_metadata"].get(key, 0) + value
+            data["_metadata"]["pack_fallback"] = True
+            records.append(data)
+
+        with self._lock:
+            self.packs += 1
+            self.packed_resumes += len(pack)
+            self.fallbacks += fallbacks
+        return records
+
+    def run(self, cv_paths: List[Path], base_args: dict, on_result, max_workers: int = 3) -> None:
+        """Parses every path, packing the small resumes together.
+
+        Args:
+            cv_paths: Resume files to parse
+            base_args: client, api_tracker, cache, preprocessor and
+                fast_extractor, as for parse_single_resume
+            on_result: Callback receiving each finished record
+            max_workers: Threads used for extraction and for API requests
+        """
+        variants = _cache_variants(base_args)
+        # Texts are extracted only a few packs ahead of the requests, so
+        # memory does not grow with the number of resumes
+        window = max_workers * 2
+        counts = {"items": 0, "packs": 0}
+
+        def items(prepared):
+            for result in prepared:
+                if isinstance(result, PackItem):
+                    counts["items"] += 1
+                    yield result
+                else:
+                    on_result(result)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as extraction, \
+                ThreadPoolExecutor(max_workers=max_workers) as requests:
+            prepared = _bounded_map(extraction, lambda path: self._prepare(path, base_args, variants), cv_paths,
+                                    window * self.max_pack_size)
+            packs = iter_packs(items(prepared), self.token_budget, self.max_pack_size)
+            for records in _bounded_map(requests, lambda pack: self._parse_pack(pack, base_args), packs, window):
+                counts["packs"] += 1
+                for data in records:
+                    on_result(data)
+        logging.info(f"Packed {counts['items']} resumes into {counts['packs']} requests")
+
+    def get_stats(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "max_pack_size": self.max_pack_size,
+            "packed_requests": self.packs,
+            "packed_resumes": self.packed_resumes,
+            "requests_saved": self.packed_resumes - self.packs - self.fallbacks,
+            "individual_fallbacks": self.fallbacks
+        }
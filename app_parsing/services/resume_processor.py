@@ -1,19 +1,81 @@
 #cv parsing 2/app_parsing/services/resume_processor.py
 
+import asyncio
 import json
 import os
 import time
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
 
 from app_parsing.models.candidate import Candidate
 from app_parsing.services.document_loader import DocumentLoader
-from app_parsing.services.api_tracker import APIUsageTracker
-from app_parsing.utils.prompts import PROMPT_TEMPLATE
+from app_parsing.services.api_tracker import APIUsageTracker, MetricsFileExporter
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.compact_schema import CompactSchema
+from app_parsing.services.disk_cache import DiskCache
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.rate_limiter import (
+    MAX_RATE_LIMIT_RETRIES,
+    AsyncRateLimiter,
+    backoff_delay,
+    quota_exhausted,
+    retry_after
+)
+from app_parsing.services.run_journal import RunJournal
+from app_parsing.services.text_preprocessor import TextPreprocessor, count_tokens
+from app_parsing.utils.hashing import file_sha256, text_sha256
+from app_parsing.utils.json_repair import loads_repaired
+from app_parsing.utils.jsonl import JsonlWriter, write_summary
+from app_parsing.utils.prompts import JSON_REPAIR_PROMPT_TEMPLATE, PROMPT_TEMPLATE
+
+PARSE_MODEL = "gpt-3.5-turbo"
+PARSE_MAX_TOKENS = 4000
+# Rough completion size of a parsed resume, used to reserve TPM budget
+EXPECTED_COMPLETION_TOKENS = 1200
+
+# Failure classes; each one has its own retry policy
+RATE_LIMIT = "rate_limit"          # wait (honouring Retry-After), then retry
+MALFORMED_JSON = "malformed_json"  # repair the answer instead of re-prompting
+TRANSIENT = "transient"            # network or server error, retry with backoff
+PERMANENT = "permanent"            # unreadable file or rejected request, never retried
+
+
+class ExtractionError(Exception):
+    """The text of a resume could not be extracted; retrying cannot help."""
+
+
+class MalformedResponseError(ValueError):
+    """The model answer is not a JSON object, even after repair."""
+
+
+class SchemaValidationError(MalformedResponseError):
+    """The model answer is valid JSON but not a parsed resume."""
+
+
+def classify_error(error: Exception) -> str:
+    """Maps an exception raised while parsing a resume to a failure class.
+
+    Args:
+        error: Exception raised by extraction, the API call or decoding
+
+    Returns:
+        str: One of RATE_LIMIT, MALFORMED_JSON, TRANSIENT or PERMANENT
+    """
+    # Imported here: the openai package dominates this module's import time
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        return PERMANENT if quota_exhausted(error) else RATE_LIMIT
+    if isinstance(error, (ExtractionError, openai.BadRequestError, openai.AuthenticationError,
+                          openai.PermissionDeniedError, openai.NotFoundError, openai.UnprocessableEntityError)):
+        return PERMANENT
+    if isinstance(error, (json.JSONDecodeError, MalformedResponseError)):
+        return MALFORMED_JSON
+    return TRANSIENT
 
 
 
@@ -38,65 +100,642 @@ def format_processing_time(seconds: float) -> str:
 
 
 
+def compute_cache_key(file_path: Path, prompt_template: str = PROMPT_TEMPLATE, model: str = PARSE_MODEL,
+                      *variants: str) -> str:
+    """Builds the content-addressed cache key of a resume parse.
+
+    The key changes whenever the file bytes, the prompt text or the model
+    change, so a stale parse is never served after editing the prompt.
+
+    Args:
+        file_path: Path to the resume file
+        prompt_template: Prompt used to parse the resume
+        model: Model name used for the completion
+        *variants: Signatures of other settings that change the result,
+            such as the text preprocessing configuration
+
+    Returns:
+        str: Hex-encoded cache key
+    """
+    return text_sha256(file_sha256(file_path), prompt_template, model, *variants)
+
+
+def _cache_variants(args: dict) -> Tuple[str, ...]:
+    """Signatures of the per-run settings in args that affect the parse."""
+    variants = []
+    if (preprocessor := args.get("preprocessor")) is not None:
+        variants.append(preprocessor.signature)
+    if (fast_extractor := args.get("fast_extractor")) is not None:
+        variants.append(fast_extractor.signature)
+    if (compact_schema := args.get("compact_schema")) is not None:
+        variants.append(compact_schema.signature)
+    if (router := args.get("router")) is not None:
+        variants.append(router.signature)
+    return tuple(variants)
+
+
+
+
+
+
+def compute_format_statistics(all_data: List[dict]) -> dict:
+    """Counts total and successful parses per file format.
+
+    Args:
+        all_data: Parsed resume records carrying a "_metadata" block
+
+    Returns:
+        dict: Mapping of file extension to {"total", "successful"} counts
+    """
+    format_stats = {}
+    for data in all_data:
+        update_format_statistics(format_stats, data)
+    return format_stats
+
+
+def update_format_statistics(format_stats: dict, data: dict) -> None:
+    """Adds one parsed resume record to running per-format counts."""
+    file_type = data.get("_metadata", {}).get("file_type")
+    if file_type:
+        if file_type not in format_stats:
+            format_stats[file_type] = {"total": 0, "successful": 0}
+        format_stats[file_type]["total"] += 1
+        if data.get("_metadata", {}).get("success", False):
+            format_stats[file_type]["successful"] += 1
+
+
+
+
+
+
+def _lookup_cache(file_path: Path, cache: Optional[DiskCache], variants: Tuple[str, ...] = ()):
+    """Looks a resume up in the parse cache.
+
+    Returns:
+        tuple: (cache_key, cached record or None); cache_key is None when
+            caching is disabled or the file cannot be hashed
+    """
+    if cache is None:
+        return None, None
+    try:
+        cache_key = compute_cache_key(file_path, PROMPT_TEMPLATE, PARSE_MODEL, *variants)
+    except OSError as e:
+        logging.warning(f"Could not hash {file_path.name} for caching: {str(e)}")
+        return None, None
+    cached = cache.get(cache_key)
+    if cached is not None:
+        cached["_metadata"] = {
+            "filename": file_path.name,
+            "source_path": str(file_path),
+            "file_type": file_path.suffix.lower(),
+            **_new_usage(),
+            "success": True,
+            "cache_hit": True
+        }
+        logging.info(f"Cache hit for {file_path.name}")
+    return cache_key, cached
+
+
+def load_resume_text(file_path: Path) -> str:
+    """Extracts the text of a resume, raising ExtractionError on failure."""
+    try:
+        return DocumentLoader.load_document(file_path)
+    except Exception as e:
+        raise ExtractionError(str(e)) from e
+
+
+def _build_messages(resume_text: str, fast_fields: Optional[dict] = None,
+                    compact_schema: Optional[CompactSchema] = None) -> List[dict]:
+    template = PROMPT_TEMPLATE if compact_schema is None else compact_schema.prompt_template
+    if fast_fields is not None:
+        template = FastExtractor.build_prompt(fast_fields, template)
+    return [{"role": "user", "content": template.format(resume_text=resume_text)}]
+
+
+def _completion_options(compact_schema: Optional[CompactSchema], model: str = PARSE_MODEL) -> dict:
+    """Extra chat completion arguments of the parse request."""
+    if compact_schema is None or (response_format := compact_schema.response_format(model)) is None:
+        return {}
+    return {"response_format": response_format}
+
+
+def _parse_models(router: Optional[ModelRouter], resume_text: str) -> List[str]:
+    """Models to try for a resume, cheapest first; PARSE_MODEL alone without a router."""
+    if router is None:
+        return [PARSE_MODEL]
+    return router.models_for("parse", count_tokens(resume_text))
+
+
+def _record_answer(router: Optional[ModelRouter], model: str, valid: bool, latency_seconds: float,
+                   cost_usd: float) -> None:
+    if router is not None:
+        router.record("parse", model, valid, latency_seconds, cost_usd)
+
+
+def _escalate(router: ModelRouter, models: List[str], model_index: int, extra_metadata: dict,
+              file_path: Path, error: Exception) -> None:
+    router.record_escalation("parse")
+    extra_metadata["escalated_from"] = models[:model_index]
+    logging.warning(f"Invalid answer from {models[model_index - 1]} for {file_path.name}, "
+                    f"escalating to {models[model_index]}. Error: {str(error)}")
+
+
+def validate_parsed_resume(parsed_data: dict) -> None:
+    """Checks that an answer has the layout PROMPT_TEMPLATE asks for.
+
+    Only the structure is checked (types of the main sections), so that a
+    cheap model's answer with missing or mistyped sections can be sent to
+    a stronger model.
+
+    Raises:
+        SchemaValidationError: Listing what does not match
+    """
+    problems = []
+    name = parsed_data.get("Full Name")
+    if not isinstance(name, str) or not name.strip():
+        problems.append("no Full Name")
+    for section, expected in (("Contact Information", dict), ("Professional Summary", dict),
+                              ("Work Experience", list), ("Education", list), ("Skills", dict)):
+        if not isinstance(parsed_data.get(section), expected):
+            problems.append(f"{section} is not a JSON {'object' if expected is dict else 'array'}")
+    for section in ("Work Experience", "Education"):
+        if isinstance(parsed_data.get(section), list) and not all(isinstance(entry, dict)
+                                                                   for entry in parsed_data[section]):
+            problems.append(f"{section} has entries that are not objects")
+    summary = parsed_data.get("Professional Summary")
+    years = summary.get("Years of Experience") if isinstance(summary, dict) else None
+    if years is not None:
+        try:
+            float(years)
+        except (TypeError, ValueError):
+            problems.append("Years of Experience is not a number")
+    if problems:
+        raise SchemaValidationError(f"Answer does not match the resume layout: {'; '.join(problems)}")
+
+
+def _run_fast_path(fast_extractor: Optional[FastExtractor], resume_text: str, extra_metadata: dict) -> Optional[dict]:
+    """Extracts the mechanical fields locally; runs on the raw text, before
+    preprocessing can drop a contact line repeated in page headers."""
+    if fast_extractor is None:
+        return None
+    fields = fast_extractor.extract(resume_text)
+    extra_metadata["fast_path"] = {
+        "fields": [field for field in FastExtractor.CONTACT_FIELDS if field in fields],
+        "skills": len(fields["Technical Skills"])
+    }
+    return fields
+
+
+def _new_usage() -> dict:
+    """Usage across all attempts, so the record accounts for every paid call."""
+    return {"tokens_used": 0, "input_tokens": 0, "output_tokens": 0, "api_calls": 0}
+
+
+def _add_usage(usage: dict, response, api_tracker: APIUsageTracker, latency_seconds: float,
+               stage: str = "parse") -> float:
+    """Adds a response to the record usage and the tracker; returns its cost."""
+    cost = api_tracker.record_response(response, latency_seconds, stage=stage)
+    usage["tokens_used"] += response.usage.total_tokens
+    usage["input_tokens"] += response.usage.prompt_tokens
+    usage["output_tokens"] += response.usage.completion_tokens
+    usage["api_calls"] += 1
+    return cost
+
+
+def _success_record(parsed_data: dict, file_path: Path, usage: dict, extra_metadata: Optional[dict] = None) -> dict:
+    parsed_data["_metadata"] = {
+        "filename": file_path.name,
+        "source_path": str(file_path),
+        "file_type": file_path.suffix.lower(),
+        **usage,
+        "model": PARSE_MODEL,
+        "success": True,
+        **(extra_metadata or {})
+    }
+    logging.info(f"Successfully parsed {file_path.name}")
+    return parsed_data
+
+
+def _failure_record(file_path: Path, error: Exception, usage: Optional[dict] = None,
+                    error_class: Optional[str] = None, model: str = PARSE_MODEL) -> dict:
+    return {
+        "_metadata": {
+            "filename": file_path.name,
+            "source_path": str(file_path),
+            "file_type": file_path.suffix.lower(),
+            **(usage or _new_usage()),
+            "model": model,
+            "success": False,
+            "error": str(error),
+            "error_class": error_class or classify_error(error)
+        }
+    }
+
+
+def load_parsed_response(content: Optional[str]) -> Tuple[dict, bool]:
+    """Decodes a parse answer, repairing common JSON defects locally.
+
+    Returns:
+        tuple: (parsed resume, whether a local repair was needed)
+
+    Raises:
+        MalformedResponseError: If the answer is not a JSON object even after repair
+    """
+    try:
+        parsed_data, repaired = loads_repaired(content or "")
+    except json.JSONDecodeError as e:
+        raise MalformedResponseError(f"Invalid JSON in model answer: {str(e)}") from e
+    if not isinstance(parsed_data, dict):
+        raise MalformedResponseError(f"Expected a JSON object, got {type(parsed_data).__name__}")
+    return parsed_data, repaired
+
+
+def _repair_messages(content: str) -> List[dict]:
+    return [{"role": "user", "content": JSON_REPAIR_PROMPT_TEMPLATE.format(content=content)}]
+
+
+def _decode_or_repair(client, content: Optional[str], usage: dict, api_tracker: APIUsageTracker,
+                      extra_metadata: dict, model: str = PARSE_MODEL) -> dict:
+    """Decodes a parse answer; when local repair is not enough, asks the model
+    to fix the syntax of its own answer, which sends only the broken JSON
+    rather than the whole resume and instructions again."""
+    try:
+        parsed_data, repaired = load_parsed_response(content)
+        if repaired:
+            extra_metadata["json_repair"] = "local"
+        return parsed_data
+    except MalformedResponseError as e:
+        if not content:
+            raise
+        logging.warning(f"Malformed answer, asking the model to fix it. Error: {str(e)}")
+
+    start = time.perf_counter()
+    response = client.chat.completions.create(
+        model=model,
+        messages=_repair_messages(content),
+        max_tokens=PARSE_MAX_TOKENS,
+        temperature=0
+    )
+    _add_usage(usage, response, api_tracker, time.perf_counter() - start, stage="repair")
+    parsed_data, _ = load_parsed_response(response.choices[0].message.content)
+    extra_metadata["json_repair"] = "model"
+    return parsed_data
+
+
 def parse_single_resume(args: dict, max_retries=3) -> dict:
     """Parse a single resume with retry handling.
+
+    Failures are classified first (see classify_error): unreadable files
+    and rejected requests fail at once, malformed JSON is repaired locally
+    or with a short fix-up call before any full retry, and other errors
+    are retried after a jittered backoff that honours Retry-After.
+
+    With a ModelRouter the first model is chosen by the size of the
+    resume text, and an answer that still fails validate_parsed_resume is
+    sent to the next model of the escalation chain without counting as a
+    failed attempt.
     
     Args:
-        args: Dictionary containing file_path, client and api_tracker
+        args: Dictionary containing file_path, client, api_tracker, an
+            optional DiskCache under "cache", an optional TextPreprocessor
+            under "preprocessor", an optional FastExtractor under
+            "fast_extractor", an optional CompactSchema under
+            "compact_schema" and an optional ModelRouter under "router".
+            Callers that already
+            extracted the text or looked the cache up can pass
+            "resume_text", "fast_fields" and "cache_key" to skip those steps.
         max_retries: Maximum number of parsing attempts
         
     Returns:
         dict: Structured resume data or error data
     """
     file_path, client, api_tracker = args["file_path"], args["client"], args["api_tracker"]
+    cache = args.get("cache")
+    preprocessor = args.get("preprocessor")
+    fast_extractor = args.get("fast_extractor")
+    compact_schema = args.get("compact_schema")
+    router = args.get("router")
+    resume_text = args.get("resume_text")
+    fast_fields = args.get("fast_fields")
+    extra_metadata = {}
+
+    if "cache_key" in args:
+        cache_key = args["cache_key"]
+    else:
+        cache_key, cached = _lookup_cache(file_path, cache, _cache_variants(args))
+        if cached is not None:
+            return cached
+
+    usage = _new_usage()
+    models: List[str] = []
+    model_index = attempt = 0
     
-    for attempt in range(max_retries):
+    while True:
         try:
-            resume_text = DocumentLoader.load_document(file_path)
+            # Extract once; retries only repeat the API call
+            if resume_text is None:
+                resume_text = load_resume_text(file_path)
+            if fast_extractor is not None and fast_fields is None:
+                fast_fields = _run_fast_path(fast_extractor, resume_text, extra_metadata)
+            if preprocessor is not None and "preprocessing" not in extra_metadata:
+                resume_text, extra_metadata["preprocessing"] = preprocessor.process(resume_text)
+            models = models or _parse_models(router, resume_text)
+            model = models[model_index]
             
+            start = time.perf_counter()
             response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": PROMPT_TEMPLATE.format(resume_text=resume_text)}],
-                max_tokens=4000,
-                temperature=0
+                model=model,
+                messages=_build_messages(resume_text, fast_fields, compact_schema),
+                max_tokens=PARSE_MAX_TOKENS,
+                temperature=0,
+                **_completion_options(compact_schema, model)
             )
+            latency = time.perf_counter() - start
+            cost = _add_usage(usage, response, api_tracker, latency)
             
-            api_tracker.update(response.usage.total_tokens)
-            
-            parsed_data = json.loads(response.choices[0].message.content.strip())
-            parsed_data["_metadata"] = {
-                "filename": file_path.name,
-                "file_type": file_path.suffix.lower(),
-                "tokens_used": response.usage.total_tokens,
-                "success": True
-            }
-            
-            logging.info(f"Successfully parsed {file_path.name}")
-            return parsed_data
+            try:
+                parsed_data = _decode_or_repair(client, response.choices[0].message.content, usage,
+                                                api_tracker, extra_metadata, model)
+                if compact_schema is not None:
+                    parsed_data = compact_schema.expand(parsed_data)
+                if fast_fields is not None:
+                    FastExtractor.merge(parsed_data, fast_fields)
+                if router is not None:
+                    validate_parsed_resume(parsed_data)
+            except MalformedResponseError:
+                _record_answer(router, model, False, latency, cost)
+                raise
+            _record_answer(router, model, True, latency, cost)
+            if cache_key:
+                cache.put(cache_key, parsed_data)
+            return _success_record(parsed_data, file_path, usage, {**extra_metadata, "model": model})
             
         except Exception as e:
-            logging.error(f"Attempt {attempt + 1} failed for {file_path.name}. Error: {str(e)}")
-            if attempt == max_retries - 1:
-                return {
-                    "_metadata": {
-                        "filename": file_path.name,
-                        "file_type": file_path.suffix.lower(),
-                        "success": False,
-                        "error": str(e)
-                    }
-                }
-            time.sleep(2 ** attempt)
+            error_class = classify_error(e)
+            if error_class == MALFORMED_JSON and model_index + 1 < len(models):
+                model_index += 1
+                _escalate(router, models, model_index, extra_metadata, file_path, e)
+                continue
+            attempt += 1
+            logging.error(f"Attempt {attempt} failed for {file_path.name} ({error_class}). Error: {str(e)}")
+            if error_class == PERMANENT or attempt == max_retries:
+                return _failure_record(file_path, e, usage, error_class,
+                                       models[model_index] if models else PARSE_MODEL)
+            time.sleep(backoff_delay(attempt - 1, retry_after(e)))
+
 
 
 
 
 
+async def _limited_call(client, limiter: AsyncRateLimiter, messages: List[dict], estimated_tokens: int,
+                        usage: dict, api_tracker: APIUsageTracker, stage: str = "parse",
+                        model: str = PARSE_MODEL, **options) -> tuple:
+    """Makes one chat completion within the rate limiter budget.
 
-def process_resumes(cv_file_paths: List[str], output_json_path: str = "parsed_resumes.json", max_workers: int = 3):
+    Returns:
+        tuple: (response, latency in seconds, cost in USD)
+    """
+    await limiter.acquire(estimated_tokens)
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=PARSE_MAX_TOKENS,
+            temperature=0,
+            **options
+        )
+    except Exception:
+        limiter.release(estimated_tokens)
+        raise
+    limiter.settle(estimated_tokens, response.usage.total_tokens)
+    latency = time.perf_counter() - start
+    return response, latency, _add_usage(usage, response, api_tracker, latency, stage)
+
+
+async def parse_single_resume_async(args: dict, max_retries=3) -> dict:
+    """Asynchronous counterpart of parse_single_resume.
+
+    Every API call first acquires request and token budget from the shared
+    rate limiter; 429 responses slow the limiter down and are retried
+    without counting as a failed attempt, up to MAX_RATE_LIMIT_RETRIES
+    times. An exhausted quota (insufficient_quota) is permanent. Other
+    failures follow the same policy as parse_single_resume.
+
+    Args:
+        args: Dictionary containing file_path, client (AsyncOpenAI),
+            api_tracker, limiter and optional "cache", "preprocessor",
+            "fast_extractor", "compact_schema" and "router"
+        max_retries: Maximum number of parsing attempts
+
+    Returns:
+        dict: Structured resume data or error data
+    """
+    file_path, client, api_tracker = args["file_path"], args["client"], args["api_tracker"]
+    limiter: AsyncRateLimiter = args["limiter"]
+    cache = args.get("cache")
+    preprocessor = args.get("preprocessor")
+    fast_extractor = args.get("fast_extractor")
+    compact_schema = args.get("compact_schema")
+    router = args.get("router")
+    fast_fields = None
+    extra_metadata = {}
+
+    cache_key, cached = await asyncio.to_thread(_lookup_cache, file_path, cache, _cache_variants(args))
+    if cached is not None:
+        return cached
+
+    resume_text = None
+    models: List[str] = []
+    model_index = attempt = rate_limited = 0
+    usage = _new_usage()
+    while True:
+        try:
+            if resume_text is None:
+                resume_text = await asyncio.to_thread(load_resume_text, file_path)
+                fast_fields = _run_fast_path(fast_extractor, resume_text, extra_metadata)
+                if preprocessor is not None:
+                    resume_text, extra_metadata["preprocessing"] = preprocessor.process(resume_text)
+            models = models or _parse_models(router, resume_text)
+            model = models[model_index]
+            messages = _build_messages(resume_text, fast_fields, compact_schema)
+            estimated_tokens = len(messages[0]["content"]) // 4 + EXPECTED_COMPLETION_TOKENS
+
+            response, latency, cost = await _limited_call(client, limiter, messages, estimated_tokens, usage,
+                                                          api_tracker, model=model,
+                                                          **_completion_options(compact_schema, model))
+            content = response.choices[0].message.content
+            try:
+                try:
+                    parsed_data, repaired = load_parsed_response(content)
+                    if repaired:
+                        extra_metadata["json_repair"] = "local"
+                except MalformedResponseError as e:
+                    if not content:
+                        raise
+                    logging.warning(f"Malformed answer, asking the model to fix it. Error: {str(e)}")
+                    repair_messages = _repair_messages(content)
+                    response, _, _ = await _limited_call(client, limiter, repair_messages, 2 * (len(content) // 4),
+                                                         usage, api_tracker, stage="repair", model=model)
+                    parsed_data, _ = load_parsed_response(response.choices[0].message.content)
+                    extra_metadata["json_repair"] = "model"
+                if compact_schema is not None:
+                    parsed_data = compact_schema.expand(parsed_data)
+                if fast_fields is not None:
+                    FastExtractor.merge(parsed_data, fast_fields)
+                if router is not None:
+                    validate_parsed_resume(parsed_data)
+            except MalformedResponseError:
+                _record_answer(router, model, False, latency, cost)
+                raise
+            _record_answer(router, model, True, latency, cost)
+            if cache_key:
+                await asyncio.to_thread(cache.put, cache_key, parsed_data)
+            return _success_record(parsed_data, file_path, usage, {**extra_metadata, "model": model})
+
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class == RATE_LIMIT:
+                rate_limited += 1
+                if rate_limited <= MAX_RATE_LIMIT_RETRIES:
+                    # Not a failed attempt: the limiter slows every caller down
+                    await asyncio.sleep(backoff_delay(0, limiter.on_rate_limited(retry_after(e))))
+                    continue
+                logging.error(f"Giving up {file_path.name} after {MAX_RATE_LIMIT_RETRIES} rate-limited retries")
+                return _failure_record(file_path, e, usage, error_class,
+                                       models[model_index] if models else PARSE_MODEL)
+            if error_class == MALFORMED_JSON and model_index + 1 < len(models):
+                model_index += 1
+                _escalate(router, models, model_index, extra_metadata, file_path, e)
+                continue
+            attempt += 1
+            logging.error(f"Attempt {attempt} failed for {file_path.name} ({error_class}). Error: {str(e)}")
+            if error_class == PERMANENT or attempt == max_retries:
+                return _failure_record(file_path, e, usage, error_class,
+                                       models[model_index] if models else PARSE_MODEL)
+            await asyncio.sleep(backoff_delay(attempt - 1, retry_after(e)))
+
+
+
+
+
+
+def _parse_and_journal(args: dict) -> dict:
+    """Parses a resume and durably journals the result when a journal is set."""
+    data = parse_single_resume(args)
+    if journal := args.get("journal"):
+        journal.append(data)
+    return data
+
+
+def _resume_from_journal(journal: Optional[RunJournal], cv_paths: List[Path], recorder: "ResultRecorder",
+                         api_tracker: APIUsageTracker) -> Tuple[List[Path], float]:
+    """Feeds a journal's finished work into a new session of the run.
+
+    Returns:
+        tuple: (paths still to parse, processing time of earlier sessions)
+    """
+    if journal is None:
+        return cv_paths, 0.0
+    for data in journal.iter_completed_records():
+        recorder.add(data)
+    journal.replay_usage(api_tracker)
+    pending = [Path(path) for path in journal.pending(cv_paths)]
+    logging.info(f"Run {journal.run_id}: {len(cv_paths) - len(pending)} resumes already done, "
+                 f"{len(pending)} remaining")
+    return pending, journal.previous_processing_time
+
+
+
+
+
+
+class ResultRecorder:
+    """Receives parsed records as they complete and writes the run output.
+
+    In "json" mode records are kept in memory and written as one document
+    at the end, as before. In "jsonl" mode each record is appended to the
+    output file immediately and only running counters are kept; the run
+    statistics go to a separate ``<name>.summary.json`` file.
+
+    With a repository, every record is also written to it (in batched
+    transactions) and the statistics are stored there at the end; the
+    repository is closed by finish().
+
+    Attributes:
+        output_path (Path): Records file (.json or .jsonl)
+        output_format (str): "json" or "jsonl"
+        repository (Optional[CandidateRepository]): Candidate repository to fill
+    """
+    OUTPUT_FORMATS = ("json", "jsonl")
+
+    def __init__(self, output_json_path: str, output_format: str = "json",
+                 repository: Optional[CandidateRepository] = None):
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.output_format = output_format
+        self.output_path = Path(output_json_path)
+        if output_format == "jsonl":
+            self.output_path = self.output_path.with_suffix(".jsonl")
+            self._writer = JsonlWriter(self.output_path)
+        self.repository = repository
+        self.all_data: List[dict] = []
+        self.format_stats: dict = {}
+        self.total = 0
+        self.successful = 0
+
+    def add(self, data: dict) -> None:
+        self.total += 1
+        if data.get("_metadata", {}).get("success", False):
+            self.successful += 1
+        update_format_statistics(self.format_stats, data)
+        if self.repository is not None:
+            self.repository.add(data)
+        if self.output_format == "jsonl":
+            self._writer.write(data)
+        else:
+            self.all_data.append(data)
+
+    def finish(self, processing_time: float, api_tracker: APIUsageTracker,
+               cache: Optional[DiskCache] = None, **extra_statistics) -> Path:
+        """Writes the final output and returns the records file path."""
+        if self.repository is not None:
+            self.repository.set_statistics(build_statistics(self.total, self.successful, self.format_stats,
+                                                            processing_time, api_tracker, cache,
+                                                            **extra_statistics))
+            logging.info(f"Candidate repository updated: {self.repository.get_stats()}")
+            self.repository.close()
+
+        if self.output_format == "json":
+            return write_results(self.output_path, self.all_data, processing_time, api_tracker, cache,
+                                 **extra_statistics)
+
+        self._writer.close()
+        write_summary(self.output_path, {
+            "statistics": build_statistics(self.total, self.successful, self.format_stats,
+                                           processing_time, api_tracker, cache, **extra_statistics)
+        })
+        return self.output_path
+
+
+
+
+
+
+def process_resumes(cv_file_paths: List[str], output_json_path: str = "parsed_resumes.json", max_workers: int = 3,
+                    cache_dir: Optional[str] = None, cache_max_size_mb: float = DiskCache.DEFAULT_MAX_SIZE_MB,
+                    cache_max_age_days: float = DiskCache.DEFAULT_MAX_AGE_DAYS, output_format: str = "json",
+                    journal: Optional[RunJournal] = None, preprocessor: Optional[TextPreprocessor] = None,
+                    metrics_file: Optional[str] = None, pack_token_budget: Optional[int] = None,
+                    max_pack_size: Optional[int] = None, fast_extractor: Optional[FastExtractor] = None,
+                    repository: Optional[CandidateRepository] = None,
+                    compact_schema: Optional[CompactSchema] = None, router: Optional[ModelRouter] = None):
     """Process a list of resumes and extract structured information.
 
     This function coordinates the resume parsing process, including:
     - Document loading
+    - Parse cache lookups (when a cache directory is given)
     - Information extraction via GPT
     - Error handling and retries
     - Statistics generation
@@ -106,6 +745,32 @@ def process_resumes(cv_file_paths: List[str], output_json_path: str = "parsed_re
         cv_file_paths (List[str]): List of paths to resume files
         output_json_path (str): Path for the output JSON file
         max_workers (int): Maximum number of parallel workers
+        cache_dir (Optional[str]): Directory of the persistent parse cache,
+            None disables caching
+        cache_max_size_mb (float): Size budget of the parse cache
+        cache_max_age_days (float): Maximum age of a cached parse
+        output_format (str): "json" for a single document written at the end,
+            "jsonl" to stream one record per line plus a summary file
+        journal (Optional[RunJournal]): Checkpoint journal; finished resumes
+            are recorded durably and those already in it are not parsed again
+        preprocessor (Optional[TextPreprocessor]): Cleans the extracted text
+            and enforces a token budget before prompting
+        metrics_file (Optional[str]): File refreshed with the API usage
+            metrics during the run (".prom" or ".json")
+        pack_token_budget (Optional[int]): Enables packing: small resumes are
+            sent several per request, up to this many resume tokens (see
+            ResumePacker)
+        max_pack_size (Optional[int]): Maximum resumes per packed request
+        fast_extractor (Optional[FastExtractor]): Extracts contact details and
+            lexicon skills locally so the model is not asked for them
+        repository (Optional[CandidateRepository]): Also writes the records
+            to this SQLite repository in batched transactions
+        compact_schema (Optional[CompactSchema]): Asks for the compact answer
+            layout and expands it locally, to cut completion tokens (packed
+            requests keep the full layout)
+        router (Optional[ModelRouter]): Picks the model of each resume and
+            escalates invalid answers to a stronger one (packed requests
+            keep PARSE_MODEL); per-model results go to the statistics
 
     Returns:
         Path: Path of the generated JSON file
@@ -113,11 +778,17 @@ def process_resumes(cv_file_paths: List[str], output_json_path: str = "parsed_re
     Raises:
         FileNotFoundError: If no resume files are found
     """
+    # openai is imported lazily to keep CLI start-up fast
+    from openai import OpenAI
+
     client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
     api_tracker = APIUsageTracker()
+    exporter = MetricsFileExporter(api_tracker, metrics_file).start() if metrics_file else None
+    cache = DiskCache(cache_dir, cache_max_size_mb, cache_max_age_days) if cache_dir else None
     
     cv_paths = [Path(path) for path in cv_file_paths]
-    all_data = []
+    recorder = ResultRecorder(output_json_path, output_format, repository)
+    cv_paths, previous_time = _resume_from_journal(journal, cv_paths, recorder, api_tracker)
     batch_size = 10
     
     # Log format statistics at start
@@ -129,48 +800,203 @@ def process_resumes(cv_file_paths: List[str], output_json_path: str = "parsed_re
     
     logging.info(f"Starting to process {len(cv_paths)} resumes")
     start_time = time.time()
+    extra_statistics = {}
+
+    if pack_token_budget:
+        # Imported here: resume_packer builds on this module
+        from app_parsing.services.resume_packer import ResumePacker
+
+        packer = ResumePacker(pack_token_budget, max_pack_size or ResumePacker.DEFAULT_MAX_PACK_SIZE)
+
+        def on_result(data: dict) -> None:
+            if journal is not None:
+                journal.append(data)
+            recorder.add(data)
+
+        packer.run(cv_paths, {"client": client, "api_tracker": api_tracker, "cache": cache,
+                              "preprocessor": preprocessor, "fast_extractor": fast_extractor,
+                              "compact_schema": compact_schema, "router": router}, on_result, max_workers)
+        extra_statistics["packing"] = packer.get_stats()
+        cv_paths = []
     
     for i in range(0, len(cv_paths), batch_size):
         batch = cv_paths[i:i + batch_size]
         logging.info(f"Processing batch {i//batch_size + 1}")
         
-        args_list = [{"file_path": path, "client": client, "api_tracker": api_tracker} for path in batch]
+        args_list = [{"file_path": path, "client": client, "api_tracker": api_tracker, "cache": cache,
+                      "journal": journal, "preprocessor": preprocessor, "fast_extractor": fast_extractor,
+                      "compact_schema": compact_schema, "router": router}
+                     for path in batch]
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(parse_single_resume, args_list))
-            all_data.extend(results)
+            results = list(executor.map(_parse_and_journal, args_list))
+        for data in results:
+            recorder.add(data)
         
-        if i + batch_size < len(cv_paths):
+        all_cached = all(r.get("_metadata", {}).get("cache_hit") for r in results)
+        if i + batch_size < len(cv_paths) and not all_cached:
             time.sleep(5)
     
-    processing_time = time.time() - start_time
-    
-    # Calculate format-specific statistics
-    format_stats = {}
-    for data in all_data:
-        file_type = data.get("_metadata", {}).get("file_type")
-        if file_type:
-            if file_type not in format_stats:
-                format_stats[file_type] = {"total": 0, "successful": 0}
-            format_stats[file_type]["total"] += 1
-            if data.get("_metadata", {}).get("success", False):
-                format_stats[file_type]["successful"] += 1
-    
+    processing_time = time.time() - start_time + previous_time
+    if exporter is not None:
+        exporter.stop()
+    if journal is not None:
+        journal.close()
+        extra_statistics["run_id"] = journal.run_id
+    if router is not None:
+        extra_statistics["model_routing"] = router.get_stats()
+    return recorder.finish(processing_time, api_tracker, cache, **extra_statistics)
+
+
+
+
+
+
+def write_results(output_json_path: str, all_data: List[dict], processing_time: float,
+                  api_tracker: APIUsageTracker, cache: Optional[DiskCache] = None, **extra_statistics) -> Path:
+    """Writes parsed resumes and run statistics to the output JSON file.
+
+    Args:
+        output_json_path: Path for the output JSON file
+        all_data: Parsed resume records
+        processing_time: Wall-clock duration of the run in seconds
+        api_tracker: Tracker holding the run's API usage
+        cache: Parse cache used during the run, if any
+        **extra_statistics: Additional entries for the statistics block
+
+    Returns:
+        Path: Path of the generated JSON file
+    """
     successful = sum(1 for data in all_data if data.get("_metadata", {}).get("success", False))
     
     output_path = Path(output_json_path)
     with output_path.open("w") as f:
         json.dump({
             "resumes": all_data,
-            "statistics": {
-                "total_processed": len(cv_paths),
-                "successful": successful,
-                "failed": len(cv_paths) - successful,
-                "processing_time": format_processing_time(processing_time),
-                "processing_time_seconds": round(processing_time, 2),
-                "format_statistics": format_stats,
-                "api_usage": api_tracker.get_stats()
-            }
+            "statistics": build_statistics(len(all_data), successful, compute_format_statistics(all_data),
+                                           processing_time, api_tracker, cache, **extra_statistics)
         }, f, indent=2)
     
-    return output_path
\ No newline at end of file
+    return output_path
+
+
+def build_statistics(total: int, successful: int, format_stats: dict, processing_time: float,
+                     api_tracker: APIUsageTracker, cache: Optional[DiskCache] = None,
+                     **extra_statistics) -> dict:
+    """Builds the statistics block shared by the JSON and JSONL outputs."""
+    return {
+        "total_processed": total,
+        "successful": successful,
+        "failed": total - successful,
+        "processing_time": format_processing_time(processing_time),
+        "processing_time_seconds": round(processing_time, 2),
+        "format_statistics": format_stats,
+        "api_usage": api_tracker.get_stats(),
+        "cache": cache.get_stats() if cache else None,
+        **extra_statistics
+    }
+
+
+
+
+
+
+async def process_resumes_async(cv_file_paths: List[str], output_json_path: str = "parsed_resumes.json",
+                                concurrency: int = 8, rpm: int = 3500, tpm: int = 200000,
+                                cache_dir: Optional[str] = None,
+                                cache_max_size_mb: float = DiskCache.DEFAULT_MAX_SIZE_MB,
+                                cache_max_age_days: float = DiskCache.DEFAULT_MAX_AGE_DAYS,
+                                output_format: str = "json", journal: Optional[RunJournal] = None,
+                                preprocessor: Optional[TextPreprocessor] = None,
+                                metrics_file: Optional[str] = None,
+                                fast_extractor: Optional[FastExtractor] = None,
+                                repository: Optional[CandidateRepository] = None,
+                                compact_schema: Optional[CompactSchema] = None,
+                                router: Optional[ModelRouter] = None) -> Path:
+    """Process resumes with a sliding window of concurrent API requests.
+
+    Unlike process_resumes, there are no fixed batches: ``concurrency``
+    workers each pick the next resume as soon as they finish the previous
+    one, so a slow CV never holds back the others. Request and token
+    throughput are bounded by an adaptive token-bucket limiter.
+
+    Args:
+        cv_file_paths (List[str]): List of paths to resume files
+        output_json_path (str): Path for the output JSON file
+        concurrency (int): Maximum number of requests in flight
+        rpm (int): Requests per minute allowed by the API quota
+        tpm (int): Tokens per minute allowed by the API quota
+        cache_dir (Optional[str]): Directory of the persistent parse cache,
+            None disables caching
+        cache_max_size_mb (float): Size budget of the parse cache
+        cache_max_age_days (float): Maximum age of a cached parse
+        output_format (str): "json" or "jsonl", see process_resumes
+        journal (Optional[RunJournal]): Checkpoint journal, see process_resumes
+        preprocessor (Optional[TextPreprocessor]): See process_resumes
+        metrics_file (Optional[str]): See process_resumes
+        fast_extractor (Optional[FastExtractor]): See process_resumes
+        repository (Optional[CandidateRepository]): See process_resumes
+        compact_schema (Optional[CompactSchema]): See process_resumes
+        router (Optional[ModelRouter]): See process_resumes
+
+    Returns:
+        Path: Path of the generated JSON file
+    """
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    api_tracker = APIUsageTracker()
+    exporter = MetricsFileExporter(api_tracker, metrics_file).start() if metrics_file else None
+    limiter = AsyncRateLimiter(rpm, tpm)
+    cache = DiskCache(cache_dir, cache_max_size_mb, cache_max_age_days) if cache_dir else None
+
+    cv_paths = [Path(path) for path in cv_file_paths]
+    recorder = ResultRecorder(output_json_path, output_format, repository)
+    cv_paths, previous_time = _resume_from_journal(journal, cv_paths, recorder, api_tracker)
+    # JSON output keeps input order; JSONL output is written in completion order
+    all_data: List[Optional[dict]] = [None] * len(cv_paths)
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, path in enumerate(cv_paths):
+        queue.put_nowait((index, path))
+
+    async def worker():
+        while True:
+            try:
+                index, path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            data = await parse_single_resume_async({
+                "file_path": path,
+                "client": client,
+                "api_tracker": api_tracker,
+                "limiter": limiter,
+                "cache": cache,
+                "preprocessor": preprocessor,
+                "fast_extractor": fast_extractor,
+                "compact_schema": compact_schema,
+                "router": router
+            })
+            if journal is not None:
+                await asyncio.to_thread(journal.append, data)
+            if output_format == "jsonl":
+                recorder.add(data)
+            else:
+                all_data[index] = data
+
+    logging.info(f"Starting to process {len(cv_paths)} resumes with concurrency {concurrency}")
+    start_time = time.time()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(cv_paths))))))
+    processing_time = time.time() - start_time + previous_time
+    if exporter is not None:
+        exporter.stop()
+
+    if output_format == "json":
+        for data in all_data:
+            recorder.add(data)
+    extra_statistics = {"rate_limiting": limiter.get_stats()}
+    if journal is not None:
+        journal.close()
+        extra_statistics["run_id"] = journal.run_id
+    if router is not None:
+        extra_statistics["model_routing"] = router.get_stats()
+    return recorder.finish(processing_time, api_tracker, cache, **extra_statistics)
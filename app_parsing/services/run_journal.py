@@ -0,0 +1,160 @@
+#cv parsing 2/app_parsing/services/run_journal.py
+
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app_parsing.services.api_tracker import APIUsageTracker
+from app_parsing.utils.jsonl import JsonlWriter
+
+
+class RunJournal:
+    """Durable journal of the resumes completed during a parsing run.
+
+    Every finished resume is appended to ``journal.jsonl`` and fsync'd before
+    the run moves on, so a crashed run can be resumed without paying again
+    for the LLM calls that already succeeded. ``run.json`` stores the run's
+    inputs and options.
+
+    Failed resumes are journaled too (their API usage was paid) but are
+    retried when the run is resumed; the last entry of a file wins.
+
+    Attributes:
+        run_id (str): Identifier of the run (its directory name)
+        run_dir (Path): Directory holding run.json and journal.jsonl
+        cv_file_paths (List[str]): Resume files of the run
+        options (dict): Run options recorded at creation
+    """
+    JOURNAL_FILE = "journal.jsonl"
+    RUN_FILE = "run.json"
+
+    def __init__(self, run_dir: Union[str, Path]):
+        self.run_dir = Path(run_dir)
+        self.run_id = self.run_dir.name
+        with (self.run_dir / self.RUN_FILE).open("r") as f:
+            run_info = json.load(f)
+        self.cv_file_paths: List[str] = run_info["cv_file_paths"]
+        self.options: Dict[str, Any] = run_info.get("options", {})
+
+        self._journal_path = self.run_dir / self.JOURNAL_FILE
+        self._successful: Dict[str, bool] = {}
+        self._last_line: Dict[str, int] = {}
+        self._session_times: Dict[int, float] = {}
+        self._load()
+
+        self.session = max(self._session_times, default=-1) + 1
+        self._session_start = time.time()
+        self._writer: Optional[JsonlWriter] = None
+
+    @classmethod
+    def create(cls, runs_dir: Union[str, Path], cv_file_paths: List[str],
+               options: Optional[Dict[str, Any]] = None) -> "RunJournal":
+        """Starts a new run and returns its journal."""
+        run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        run_dir = Path(runs_dir) / run_id
+        suffix = 1
+        while run_dir.exists():
+            run_dir = Path(runs_dir) / f"{run_id}_{suffix}"
+            suffix += 1
+        run_dir.mkdir(parents=True)
+        with (run_dir / cls.RUN_FILE).open("w") as f:
+            json.dump({
+                "cv_file_paths": [str(path) for path in cv_file_paths],
+                "options": options or {},
+                "created_at": datetime.now().isoformat()
+            }, f, indent=2)
+        return cls(run_dir)
+
+    @classmethod
+    def open(cls, runs_dir: Union[str, Path], run_id: str) -> "RunJournal":
+        """Reopens an existing run for resuming.
+
+        Raises:
+            FileNotFoundError: If the run does not exist
+        """
+        run_dir = Path(runs_dir) / run_id
+        if not (run_dir / cls.RUN_FILE).exists():
+            raise FileNotFoundError(f"No run '{run_id}' in {runs_dir}")
+        return cls(run_dir)
+
+    def _entries(self) -> Iterator[dict]:
+        if not self._journal_path.exists():
+            return
+        with self._journal_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _load(self) -> None:
+        """Indexes the journal, cutting off a line torn by the crash."""
+        if not self._journal_path.exists():
+            return
+        with self._journal_path.open("rb+") as f:
+            content = f.read()
+            end = content.rfind(b"\n") + 1
+            if end < len(content):
+                logging.warning(f"Discarding torn journal entry in run {self.run_id}")
+                f.truncate(end)
+
+        for line_number, entry in enumerate(self._entries()):
+            path = entry["path"]
+            self._last_line[path] = line_number
+            self._successful[path] = entry["record"].get("_metadata", {}).get("success", False)
+            session = entry.get("session", 0)
+            self._session_times[session] = max(self._session_times.get(session, 0.0), entry.get("elapsed", 0.0))
+
+    @property
+    def completed(self) -> List[str]:
+        """Paths whose latest journal entry is a successful parse."""
+        return [path for path, success in self._successful.items() if success]
+
+    def pending(self, cv_file_paths: List[str]) -> List[str]:
+        """Filters out the paths that were already parsed successfully."""
+        return [path for path in cv_file_paths if not self._successful.get(str(Path(path)), False)]
+
+    def iter_completed_records(self) -> Iterator[dict]:
+        """Yields the latest successful record of each completed file."""
+        for line_number, entry in enumerate(self._entries()):
+            path = entry["path"]
+            if self._last_line.get(path) == line_number and self._successful.get(path):
+                yield entry["record"]
+
+    def replay_usage(self, api_tracker: APIUsageTracker) -> None:
+        """Adds the API usage of every journaled attempt to a tracker."""
+        for entry in self._entries():
+            metadata = entry["record"].get("_metadata", {})
+            # Resumes of a packed request share its tokens but not its call
+            if not metadata.get("api_calls") and not metadata.get("tokens_used"):
+                continue
+            if "input_tokens" in metadata:
+                api_tracker.record_call(metadata.get("model", "unknown"), metadata["input_tokens"],
+                                        metadata.get("output_tokens", 0), calls=metadata.get("api_calls", 0))
+            else:
+                # Journals written before usage was split by direction
+                api_tracker.update(metadata.get("tokens_used", 0), metadata.get("api_calls", 0))
+
+    @property
+    def previous_processing_time(self) -> float:
+        """Processing time spent by earlier sessions of this run."""
+        return sum(self._session_times.values())
+
+    def append(self, record: dict) -> None:
+        """Durably records a finished resume."""
+        if self._writer is None:
+            self._writer = JsonlWriter(self._journal_path, append=True, fsync=True)
+        path = record.get("_metadata", {}).get("source_path")
+        self._writer.write({
+            "path": path,
+            "session": self.session,
+            "elapsed": round(time.time() - self._session_start, 2),
+            "record": record
+        })
+        self._successful[path] = record.get("_metadata", {}).get("success", False)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,199 @@
+#cv parsing 2/app_parsing/services/text_preprocessor.py
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from app_parsing.services.document_loader import DocumentLoader
+
+_tokenizer = None
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens locally.
+
+    Uses tiktoken's cl100k_base encoding (the gpt-3.5-turbo tokenizer) when
+    tiktoken is installed, otherwise the usual ~4 characters per token
+    estimate.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        int: Number of tokens
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+class TextPreprocessor:
+    """Cleans extracted resume text and fits it into a token budget.
+
+    Steps, in order:
+    1. Drop header/footer lines repeated across PDF pages (only among the
+       first and last lines of each page, and from three pages up)
+    2. Drop page-number lines ("3", "Page 3", "3 / 12", "Page 3 of 12")
+    3. Normalise whitespace
+    4. If the text is still over budget, drop low-value sections
+       (publications, references, ...) and then trim the remaining
+       sections proportionally, keeping the start of each one
+
+    Attributes:
+        token_budget (Optional[int]): Maximum resume tokens, None for no limit
+    """
+    SECTION_PRIORITIES = {
+        "summary": 0, "profile": 0, "objective": 0, "about": 0,
+        "experience": 0, "employment": 0, "work history": 0, "career": 0,
+        "skills": 0, "competencies": 0, "technologies": 0,
+        "education": 1, "certifications": 1, "certificates": 1, "languages": 1,
+        "projects": 2, "awards": 2, "achievements": 2, "volunteer": 2,
+        "publications": 3, "presentations": 3, "conferences": 3, "teaching": 3,
+        "references": 3, "interests": 3, "hobbies": 3, "activities": 3, "grants": 3,
+    }
+    DROPPABLE_PRIORITY = 2
+    HEADER_PRIORITY = 0
+    # Header/footer detection: pages needed, and lines at each end of a page considered
+    BOILERPLATE_MIN_PAGES = 3
+    BOILERPLATE_EDGE_LINES = 3
+
+    PAGE_NUMBER_RE = re.compile(r"^\s*(page\s*)?\d{1,3}(\s*(/|of)\s*\d{1,3})?\s*$", re.IGNORECASE)
+    SPACES_RE = re.compile(r"[ \t\u00a0]+")
+    BLANK_LINES_RE = re.compile(r"\n{3,}")
+    # A heading is the section keyword, optionally after one or two words
+    # ("Professional Experience") and followed by a colon or dash
+    SECTION_RE = re.compile(
+        r"^\s*(?:[\w&]+\s+){0,2}(" + "|".join(sorted(SECTION_PRIORITIES, key=len, reverse=True)) + r")\b[\s:\-]*$",
+        re.IGNORECASE
+    )
+
+    def __init__(self, token_budget: Optional[int] = 3000):
+        self.token_budget = token_budget
+
+    @property
+    def signature(self) -> str:
+        """Identifies the configuration; part of the parse cache key."""
+        return f"preprocess-v3:{self.token_budget}"
+
+    def process(self, text: str) -> Tuple[str, Dict]:
+        """Cleans a resume text and enforces the token budget.
+
+        Args:
+            text: Raw output of DocumentLoader.load_document
+
+        Returns:
+            tuple: (processed text, statistics for the record's _metadata)
+        """
+        original_tokens = count_tokens(text)
+        pages = text.split(DocumentLoader.PAGE_BREAK)
+        lines = self._strip_page_boilerplate(pages)
+        cleaned = self._normalise_whitespace("\n".join(lines))
+
+        truncated = False
+        if self.token_budget and count_tokens(cleaned) > self.token_budget:
+            cleaned = self._truncate_sections(cleaned)
+            truncated = True
+
+        final_tokens = count_tokens(cleaned)
+        return cleaned, {
+            "original_tokens": original_tokens,
+            "final_tokens": final_tokens,
+            "tokens_saved": original_tokens - final_tokens,
+            "truncated": truncated
+        }
+
+    @classmethod
+    def _edge_indexes(cls, lines: List[str]) -> Set[int]:
+        """Indexes of the first and last non-blank lines of a page."""
+        filled = [index for index, line in enumerate(lines) if line]
+        return set(filled[:cls.BOILERPLATE_EDGE_LINES] + filled[-cls.BOILERPLATE_EDGE_LINES:])
+
+    def _strip_page_boilerplate(self, pages: List[str]) -> List[str]:
+        page_lines = [[line.strip() for line in page.splitlines()] for page in pages]
+        edges = [self._edge_indexes(lines) for lines in page_lines]
+        repeated = set()
+        if len(page_lines) >= self.BOILERPLATE_MIN_PAGES:
+            # A line at the top or bottom of at least half of the pages is a
+            # header or footer; the body of a page is never a candidate, so
+            # job titles and skills repeated across pages are kept
+            counts = Counter(line for lines, indexes in zip(page_lines, edges)
+                             for line in {lines[index] for index in indexes})
+            threshold = max(2, len(page_lines) // 2)
+            repeated = {line for line, count in counts.items() if count >= threshold and len(line) < 120}
+
+        kept = []
+        for lines, indexes in zip(page_lines, edges):
+            for index, line in enumerate(lines):
+                # Page numbers also sit at the edges only: a bare "5" or "12"
+                # in the body is a figure of the resume, e.g. in a table
+                if index in indexes and (line in repeated or self.PAGE_NUMBER_RE.match(line)):
+                    continue
+                kept.append(line)
+            kept.append("")
+        return kept
+
+    def _normalise_whitespace(self, text: str) -> str:
+        text = "\n".join(self.SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+        return self.BLANK_LINES_RE.sub("\n\n", text).strip()
+
+    def _split_sections(self, text: str) -> List[List]:
+        """Splits text into [priority, title, lines] blocks at section headings."""
+        sections = [[self.HEADER_PRIORITY, "header", []]]
+        for line in text.splitlines():
+            match = self.SECTION_RE.match(line)
+            if match:
+                priority = self.SECTION_PRIORITIES[match.group(1).lower()]
+                sections.append([priority, line.strip(), [line]])
+            else:
+                sections[-1][2].append(line)
+        return sections
+
+    @staticmethod
+    def _size(lines: List[str]) -> int:
+        # One extra token per line for the newline joining them
+        return sum(count_tokens(line) + 1 for line in lines)
+
+    def _truncate_sections(self, text: str) -> str:
+        sections = self._split_sections(text)
+        sizes = [self._size(lines) for _, _, lines in sections]
+
+        # Drop whole low-value sections, least valuable and largest first
+        for index in sorted(range(len(sections)), key=lambda i: (-sections[i][0], -sizes[i])):
+            if sum(sizes) <= self.token_budget or sections[index][0] < self.DROPPABLE_PRIORITY:
+                break
+            omitted = f"[{sections[index][1]} section omitted]"
+            sections[index][2] = [omitted]
+            sizes[index] = self._size([omitted])
+
+        # Trim what is left, keeping the beginning of each section. Budget is
+        # shared max-min fairly: small sections (contact details, education)
+        # stay whole and only the largest ones are cut.
+        if sum(sizes) > self.token_budget:
+            allowances = {}
+            remaining = self.token_budget
+            order = sorted(range(len(sections)), key=lambda i: sizes[i])
+            for position, index in enumerate(order):
+                allowances[index] = min(sizes[index], remaining // (len(order) - position))
+                remaining -= allowances[index]
+            for index, (_, _, lines) in enumerate(sections):
+                allowed = allowances[index]
+                kept, used = [], 0
+                for line in lines:
+                    line_tokens = count_tokens(line) + 1
+                    if used + line_tokens > allowed:
+                        break
+                    kept.append(line)
+                    used += line_tokens
+                sections[index][2] = kept
+
+        logging.debug(f"Truncated resume text to {self.token_budget} tokens")
+        return "\n".join(line for _, _, lines in sections for line in lines).strip()
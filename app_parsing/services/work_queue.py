@@ -0,0 +1,485 @@
+#cv parsing 2/app_parsing/services/work_queue.py
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from app_parsing.services.api_tracker import APIUsageTracker, MetricsFileExporter
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.compact_schema import CompactSchema
+from app_parsing.services.disk_cache import DiskCache
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.resume_processor import TRANSIENT, ResultRecorder, _failure_record, parse_single_resume
+from app_parsing.services.text_preprocessor import TextPreprocessor
+
+PENDING, LEASED, DONE = "pending", "leased", "done"
+DEFAULT_VISIBILITY_TIMEOUT = 300.0
+DEFAULT_POLL_INTERVAL = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    success INTEGER,
+    record_json TEXT
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    state_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_status ON items(status, lease_expires);
+"""
+
+
+class WorkQueue:
+    """Durable queue of resumes shared by parsing workers, in one SQLite file.
+
+    Workers lease items for a visibility timeout: a leased item is hidden
+    from the other workers until its lease expires, so the resumes of a
+    worker that crashed or lost its host go back to the queue on their
+    own. A worker renews the leases of the resumes it is still parsing and
+    stores each finished record in the queue; the first record stored for
+    an item wins. An item whose lease expired ``max_attempts`` times is
+    finished with a failure record instead of being leased again.
+
+    The database uses a rollback journal rather than WAL, which needs
+    shared memory and does not work across hosts, so the file can live on
+    an NFS share mounted by every worker host (with working file locks).
+    Lease deadlines come from the clock of the leasing host: the hosts'
+    clocks must agree to well within the visibility timeout.
+
+    Attributes:
+        db_path (Path): SQLite database file
+        max_attempts (int): Leases of an item before it is given up
+    """
+    DEFAULT_MAX_ATTEMPTS = 3
+
+    def __init__(self, db_path: Union[str, Path], max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # Autocommit mode: writes open their transaction explicitly (see _transaction)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE takes the database write lock up front, so two
+        workers can never lease the same item."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, cv_file_paths: List[str]) -> Dict[str, int]:
+        """Adds resumes to the queue.
+
+        Paths are stored absolute, so every worker host must see the files
+        under the same path. A resume already queued is left alone unless
+        its record is a failure, in which case it is queued again.
+
+        Args:
+            cv_file_paths: Resume files to parse
+
+        Returns:
+            dict: Number of resumes "added", "requeued" (they had failed) and "skipped"
+        """
+        counts = {"added": 0, "requeued": 0, "skipped": 0}
+        now = time.time()
+        with self._transaction() as conn:
+            for path in cv_file_paths:
+                source_path = str(Path(path).resolve())
+                row = conn.execute("SELECT status, success FROM items WHERE source_path = ?",
+                                   (source_path,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO items (source_path, status, enqueued_at) VALUES (?, ?, ?)",
+                                 (source_path, PENDING, now))
+                    counts["added"] += 1
+                elif row[0] == DONE and not row[1]:
+                    conn.execute(
+                        "UPDATE items SET status = ?, attempts = 0, lease_owner = NULL, lease_expires = NULL,"
+                        " enqueued_at = ?, finished_at = NULL, success = NULL, record_json = NULL"
+                        " WHERE source_path = ?",
+                        (PENDING, now, source_path)
+                    )
+                    counts["requeued"] += 1
+                else:
+                    counts["skipped"] += 1
+        return counts
+
+    def lease(self, worker_id: str, count: int, visibility_timeout: float) -> List[Tuple[int, str]]:
+        """Leases up to ``count`` items that are pending or whose lease expired.
+
+        Args:
+            worker_id: Worker taking the items
+            count: Maximum number of items to lease
+            visibility_timeout: Seconds the items stay hidden from other workers
+
+        Returns:
+            list: (item id, source path) of the leased items
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._give_up_expired(conn, now)
+            rows = conn.execute(
+                "SELECT id, source_path FROM items WHERE status = ? OR (status = ? AND lease_expires < ?)"
+                " ORDER BY id LIMIT ?",
+                (PENDING, LEASED, now, count)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                [(LEASED, worker_id, now + visibility_timeout, item_id) for item_id, _ in rows]
+            )
+        return rows
+
+    def _give_up_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        """Finishes with a failure the expired items already leased max_attempts times."""
+        rows = conn.execute(
+            "SELECT id, source_path, attempts FROM items WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (LEASED, now, self.max_attempts)
+        ).fetchall()
+        for item_id, source_path, attempts in rows:
+            logging.warning(f"Giving up {Path(source_path).name}: its lease expired {attempts} times")
+            error = TimeoutError(f"Lease expired {attempts} times; the workers parsing it stopped or stalled")
+            self._finish(conn, item_id, _failure_record(Path(source_path), error, error_class=TRANSIENT), now)
+
+    @staticmethod
+    def _finish(conn: sqlite3.Connection, item_id: int, record: dict, now: float) -> bool:
+        cursor = conn.execute(
+            "UPDATE items SET status = ?, lease_owner = NULL, lease_expires = NULL, finished_at = ?, success = ?,"
+            " record_json = ? WHERE id = ? AND status != ?",
+            (DONE, now, int(bool(record.get("_metadata", {}).get("success", False))),
+             json.dumps(record, ensure_ascii=False), item_id, DONE)
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, item_id: int, record: dict) -> bool:
+        """Stores the record of a leased item.
+
+        Returns:
+            bool: False if the item was already finished, by another worker
+                that leased it after this lease expired; the record is dropped
+        """
+        with self._transaction() as conn:
+            return self._finish(conn, item_id, record, time.time())
+
+    def renew(self, item_ids: List[int], worker_id: str, visibility_timeout: float) -> int:
+        """Extends the leases a worker still holds and returns how many it holds."""
+        deadline = time.time() + visibility_timeout
+        renewed = 0
+        with self._transaction() as conn:
+            for item_id in item_ids:
+                renewed += conn.execute(
+                    "UPDATE items SET lease_expires = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                    (deadline, item_id, LEASED, worker_id)
+                ).rowcount
+        return renewed
+
+    def release(self, item_ids: List[int], worker_id: str) -> None:
+        """Puts items back in the queue without using up one of their attempts.
+
+        Only for items given back untouched; a resume whose parsing failed
+        must be finished with its failure record so that it cannot loop.
+        """
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE items SET status = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1"
+                " WHERE id = ? AND status = ? AND lease_owner = ?",
+                [(PENDING, item_id, LEASED, worker_id) for item_id in item_ids]
+            )
+
+    def register_worker(self, worker_id: str) -> None:
+        """Records a worker start.
+
+        Raises:
+            ValueError: If a worker with this id already ran on the queue
+        """
+        now = time.time()
+        try:
+            with self._transaction() as conn:
+                conn.execute("INSERT INTO workers (worker_id, host, started_at, heartbeat_at) VALUES (?, ?, ?, ?)",
+                             (worker_id, socket.gethostname(), now, now))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Worker id '{worker_id}' was already used on {self.db_path}") from None
+
+    def save_worker(self, worker_id: str, state: Dict[str, Any]) -> None:
+        """Stores a worker's statistics (API usage, routing, cache) for collect_results."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE workers SET heartbeat_at = ?, state_json = ? WHERE worker_id = ?",
+                         (time.time(), json.dumps(state), worker_id))
+
+    def has_unfinished(self) -> bool:
+        """Whether some items are pending or leased."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM items WHERE status != ? LIMIT 1", (DONE,)).fetchone() is not None
+
+    def unfinished(self) -> List[str]:
+        """Source paths of the items that are pending or leased."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT source_path FROM items WHERE status != ? ORDER BY id", (DONE,))]
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yields the stored record of every finished item, in queue order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT record_json FROM items WHERE status = ? ORDER BY id", (DONE,)).fetchall()
+        for (record_json,) in rows:
+            yield json.loads(record_json)
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """Every worker that ran on the queue, with its last saved statistics."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker_id, host, started_at, heartbeat_at, state_json FROM workers ORDER BY started_at"
+            ).fetchall()
+        return [{"worker_id": worker_id, "host": host, "started_at": started_at, "heartbeat_at": heartbeat_at,
+                 "state": json.loads(state_json) if state_json else None}
+                for worker_id, host, started_at, heartbeat_at, state_json in rows]
+
+    def time_span(self) -> Tuple[Optional[float], Optional[float]]:
+        """(first worker start, last finished item) timestamps of the run."""
+        with self._lock:
+            first_start = self._conn.execute("SELECT MIN(started_at) FROM workers").fetchone()[0]
+            last_finish = self._conn.execute("SELECT MAX(finished_at) FROM items").fetchone()[0]
+        return first_start, last_finish
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+            failed, lease_retries = self._conn.execute(
+                "SELECT COUNT(*) - COALESCE(SUM(success), 0), COALESCE(SUM(MAX(attempts - 1, 0)), 0)"
+                " FROM items WHERE status = ?", (DONE,)
+            ).fetchone()
+        return {
+            PENDING: counts.get(PENDING, 0),
+            LEASED: counts.get(LEASED, 0),
+            DONE: counts.get(DONE, 0),
+            "failed": failed,
+            "lease_retries": lease_retries
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def run_worker(queue_path: Union[str, Path], worker_id: Optional[str] = None, max_workers: int = 3,
+               visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT, cache_dir: Optional[str] = None,
+               cache_max_size_mb: float = DiskCache.DEFAULT_MAX_SIZE_MB,
+               cache_max_age_days: float = DiskCache.DEFAULT_MAX_AGE_DAYS,
+               preprocessor: Optional[TextPreprocessor] = None, metrics_file: Optional[str] = None,
+               fast_extractor: Optional[FastExtractor] = None, compact_schema: Optional[CompactSchema] = None,
+               router: Optional[ModelRouter] = None,
+               poll_interval: float = DEFAULT_POLL_INTERVAL) -> Dict[str, Any]:
+    """Parses resumes leased from a work queue until the queue is drained.
+
+    ``max_workers`` resumes are in flight at a time, each parsed as in
+    process_resumes (cache, retries, routing...). The leases of the resumes
+    in flight are renewed every third of the visibility timeout and each
+    record is stored in the queue as soon as it is finished. The worker's
+    API usage, routing and cache statistics are saved along with the
+    records, at every renewal and at exit, for collect_results.
+
+    When nothing is left to lease but other workers still hold leases,
+    the worker keeps polling: their resumes come back if they stop. On
+    Ctrl-C the resumes in flight are finished and stored before exiting.
+
+    Args:
+        queue_path: SQLite file of the WorkQueue
+        worker_id: Unique name of this worker (default: host name and process id)
+        max_workers: Resumes parsed concurrently by this worker
+        visibility_timeout: Seconds a leased resume stays hidden from the
+            other workers without a renewal
+        cache_dir, cache_max_size_mb, cache_max_age_days, preprocessor,
+        metrics_file, fast_extractor, compact_schema, router: See
+            process_resumes
+        poll_interval: Seconds between lease attempts while other workers
+            hold the remaining resumes
+
+    Returns:
+        dict: Statistics of this worker
+    """
+    # Imported here: the openai package dominates this module's import time
+    from openai import OpenAI
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    api_tracker = APIUsageTracker()
+    exporter = MetricsFileExporter(api_tracker, metrics_file).start() if metrics_file else None
+    cache = DiskCache(cache_dir, cache_max_size_mb, cache_max_age_days) if cache_dir else None
+    heartbeat_interval = visibility_timeout / 3
+    stats = {"items": 0, "successful": 0, "dropped_duplicates": 0, "lost_leases": 0}
+    start_time = time.time()
+
+    def parse(file_path: Path) -> dict:
+        try:
+            return parse_single_resume({"file_path": file_path, "client": client, "api_tracker": api_tracker,
+                                        "cache": cache, "preprocessor": preprocessor,
+                                        "fast_extractor": fast_extractor, "compact_schema": compact_schema,
+                                        "router": router})
+        except Exception as e:
+            # Finished as a failure rather than released: a resume that crashes
+            # the parser every time would otherwise be leased again forever
+            logging.error(f"Worker {worker_id}: {file_path.name} failed unexpectedly: {e}")
+            return _failure_record(file_path, e)
+
+    def worker_state() -> Dict[str, Any]:
+        return {
+            **stats,
+            "processing_time_seconds": round(time.time() - start_time, 2),
+            "api_usage": api_tracker.to_dict(),
+            "model_routing": router.to_dict() if router is not None else None,
+            "cache": cache.get_stats() if cache else None
+        }
+
+    def store(future: Future, item_id: int) -> None:
+        record = future.result()
+        stats["items"] += 1
+        stats["successful"] += bool(record.get("_metadata", {}).get("success", False))
+        if not queue.complete(item_id, record):
+            stats["dropped_duplicates"] += 1
+            logging.warning(f"Worker {worker_id}: {record['_metadata'].get('filename')} was already finished "
+                            f"by another worker after this lease expired")
+
+    queue = WorkQueue(queue_path)
+    queue.register_worker(worker_id)
+    logging.info(f"Worker {worker_id} started on {queue.db_path}: {queue.get_stats()}")
+    in_flight: Dict[Future, int] = {}
+    last_heartbeat = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while True:
+                    if len(in_flight) < max_workers:
+                        for item_id, source_path in queue.lease(worker_id, max_workers - len(in_flight),
+                                                                visibility_timeout):
+                            in_flight[executor.submit(parse, Path(source_path))] = item_id
+                    if not in_flight:
+                        if not queue.has_unfinished():
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, _ = wait(in_flight, timeout=heartbeat_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        store(future, in_flight.pop(future))
+
+                    heartbeat = time.time() - last_heartbeat >= heartbeat_interval
+                    if heartbeat:
+                        held = queue.renew(list(in_flight.values()), worker_id, visibility_timeout)
+                        if held < len(in_flight):
+                            stats["lost_leases"] += len(in_flight) - held
+                            logging.warning(f"Worker {worker_id}: {len(in_flight) - held} leases expired "
+                                            f"before renewal; consider a longer visibility timeout")
+                        last_heartbeat = time.time()
+                    if done or heartbeat:
+                        # Saved with the records so a killed worker's usage matches what it stored
+                        queue.save_worker(worker_id, worker_state())
+            except KeyboardInterrupt:
+                logging.info(f"Worker {worker_id} interrupted: finishing {len(in_flight)} resumes in flight")
+        # Leaving the executor waited for the resumes in flight
+        for future, item_id in in_flight.items():
+            store(future, item_id)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        worker_stats = worker_state()
+        queue.save_worker(worker_id, worker_stats)
+        queue.close()
+
+    logging.info(f"Worker {worker_id} done: {stats['items']} resumes, {stats['successful']} successful")
+    return {"worker_id": worker_id, **worker_stats, "api_usage": api_tracker.get_stats(),
+            "model_routing": router.get_stats() if router is not None else None}
+
+
+def collect_results(queue_path: Union[str, Path], output_json_path: str = "parsed_resumes.json",
+                    output_format: str = "json", repository: Optional[CandidateRepository] = None) -> Path:
+    """Builds the parsing output of a distributed run from its work queue.
+
+    Produces the same records and statistics as process_resumes: the API
+    usage and model routing of every worker are merged, and processing time
+    runs from the first worker start to the last finished resume. Resumes
+    still pending or leased are reported as failures, so a queue that is
+    not drained yet can be collected too.
+
+    Args:
+        queue_path: SQLite file of the WorkQueue
+        output_json_path: Path for the output JSON file
+        output_format: "json" or "jsonl", see process_resumes
+        repository: Candidate repository to fill, see process_resumes
+
+    Returns:
+        Path: Path of the generated JSON file
+    """
+    api_tracker = APIUsageTracker()
+    router: Optional[ModelRouter] = None
+    recorder = ResultRecorder(output_json_path, output_format, repository)
+    with WorkQueue(queue_path) as queue:
+        workers = []
+        for worker in queue.workers():
+            state = worker["state"] or {}
+            if state.get("api_usage"):
+                api_tracker.merge(APIUsageTracker.from_dict(state["api_usage"]))
+            if state.get("model_routing"):
+                worker_router = ModelRouter.from_dict(state["model_routing"])
+                if router is None:
+                    router = worker_router
+                else:
+                    router.merge(worker_router)
+            workers.append({
+                "worker_id": worker["worker_id"],
+                "host": worker["host"],
+                "items": state.get("items", 0),
+                "successful": state.get("successful", 0),
+                "processing_time_seconds": state.get("processing_time_seconds", 0.0),
+                "cache": state.get("cache")
+            })
+
+        for record in queue.iter_records():
+            recorder.add(record)
+        unfinished = queue.unfinished()
+        for source_path in unfinished:
+            recorder.add(_failure_record(Path(source_path), RuntimeError("Not parsed by any worker yet"),
+                                         error_class=TRANSIENT))
+        if unfinished:
+            logging.warning(f"{len(unfinished)} resumes of {queue.db_path} are not finished yet; "
+                            f"reported as failures")
+
+        first_start, last_finish = queue.time_span()
+        processing_time = last_finish - first_start if first_start and last_finish else 0.0
+        extra_statistics = {"work_queue": {"queue_file": str(queue.db_path), **queue.get_stats(),
+                                           "workers": workers}}
+    if router is not None:
+        extra_statistics["model_routing"] = router.get_stats()
+    return recorder.finish(processing_time, api_tracker, None, **extra_statistics)
@@ -0,0 +1,44 @@
+#cv parsing 2/app_parsing/utils/hashing.py
+
+import hashlib
+from pathlib import Path
+from typing import Union
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: Union[str, Path]) -> str:
+    """Computes the SHA-256 digest of a file's contents.
+
+    The file is read in chunks so large PDFs never have to be held in memory.
+
+    Args:
+        file_path: Path to the file to hash
+
+    Returns:
+        str: Hex-encoded SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_sha256(*parts: str) -> str:
+    """Computes a SHA-256 digest over several text parts.
+
+    Parts are length-prefixed so ("ab", "c") and ("a", "bc") never collide.
+
+    Args:
+        *parts: Strings to hash together
+
+    Returns:
+        str: Hex-encoded SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(f"{len(encoded)}:".encode("ascii"))
+        digest.update(encoded)
+    return digest.hexdigest()
@@ -0,0 +1,127 @@
+#cv parsing 2/app_parsing/utils/json_repair.py
+
+import json
+import re
+from typing import Any, List, Tuple
+
+FENCE_RE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.DOTALL)
+# Bare words a model may write instead of JSON literals
+LITERALS = {"True": "true", "False": "false", "None": "null", "NaN": "null", "Infinity": "null",
+            "true": "true", "false": "false", "null": "null"}
+CLOSERS = {"{": "}", "[": "]"}
+
+
+def _strip_wrapping(text: str) -> str:
+    """Removes markdown fences and any prose before the first bracket."""
+    text = text.strip()
+    if match := FENCE_RE.search(text):
+        text = match.group(1).strip()
+    elif text.startswith("```"):
+        # Truncated answer: opening fence without its closing one
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):] if starts else text
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    text = "".join(out).rstrip()
+    while text.endswith(","):
+        text = text[:-1].rstrip()
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(CLOSERS[opener] for opener in reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """Rewrites a nearly-valid JSON answer into valid JSON text.
+
+    Handles the usual defects of model output: markdown fences, prose
+    before or after the document, trailing commas, Python literals
+    (True/False/None), raw newlines inside strings and answers truncated
+    by the token limit (open strings and brackets are closed, an
+    incomplete last member is dropped).
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        str: Repaired JSON text; it may still fail to parse when the input
+            is too damaged
+    """
+    text = _strip_wrapping(text)
+    out: List[str] = []
+    stack: List[str] = []
+    # Last point where everything before was complete: (length of out, open brackets)
+    safe: Tuple[int, Tuple[str, ...]] = (0, ())
+    in_string = escaped = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in CLOSERS:
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            safe = (len(out), tuple(stack))
+            if not stack:
+                # The document is complete; anything after it is prose
+                break
+        elif char == ",":
+            safe = (len(out), tuple(stack))
+            out.append(char)
+        elif char.isalpha():
+            end = index
+            while end < len(text) and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            out.append(LITERALS.get(word, word))
+            index = end
+            continue
+        else:
+            out.append(char)
+        index += 1
+
+    if in_string:
+        out.append('"')
+    repaired = _close(out, stack)
+    try:
+        json.loads(repaired)
+        return repaired
+    except json.JSONDecodeError:
+        # Drop the incomplete tail back to the last complete member
+        length, open_brackets = safe
+        return _close(out[:length], list(open_brackets)) if length else repaired
+
+
+def loads_repaired(text: str) -> Tuple[Any, bool]:
+    """Parses model output as JSON, repairing it locally when needed.
+
+    Returns:
+        tuple: (parsed value, whether a repair was needed)
+
+    Raises:
+        json.JSONDecodeError: If the output is not valid JSON even after repair
+    """
+    try:
+        return json.loads(text.strip()), False
+    except json.JSONDecodeError:
+        return json.loads(repair_json(text)), True
@@ -0,0 +1,141 @@
+#cv parsing 2/app_parsing/utils/jsonl.py
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+RECORD_KEYS = ("resumes", "emails")
+
+
+def summary_path(records_path: Union[str, Path]) -> Path:
+    """Returns the summary file that accompanies a JSONL records file.
+
+    Example: ``parsed_resumes.jsonl`` -> ``parsed_resumes.summary.json``
+    """
+    records_path = Path(records_path)
+    return records_path.with_name(f"{records_path.stem}.summary.json")
+
+
+def is_summary_file(path: Union[str, Path]) -> bool:
+    return Path(path).name.endswith(".summary.json")
+
+
+def resolve_records_path(path: Union[str, Path]) -> Path:
+    """Falls back to the .jsonl/.json sibling when the given file is missing.
+
+    This lets scripts keep their ``parsed_resumes.json`` defaults while the
+    run was written in streaming mode, and vice versa.
+    """
+    path = Path(path)
+    if not path.exists():
+        sibling = path.with_suffix(".jsonl" if path.suffix == ".json" else ".json")
+        if sibling.exists():
+            return sibling
+    return path
+
+
+class JsonlWriter:
+    """Appends one JSON record per line, flushing after every record.
+
+    Records written before a crash stay on disk. The writer is safe to share
+    between threads.
+
+    Attributes:
+        path (Path): Location of the JSONL file
+        count (int): Number of records written by this writer
+    """
+    def __init__(self, path: Union[str, Path], append: bool = False, fsync: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._file = self.path.open("a" if append else "w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+            self.count += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_summary(records_path: Union[str, Path], summary: Dict[str, Any]) -> Path:
+    """Atomically writes the summary file of a JSONL records file."""
+    path = summary_path(records_path)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def iter_records(path: Union[str, Path], key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Lazily iterates over the records of a parsing or email output file.
+
+    JSONL files are read line by line. Legacy ``.json`` outputs are loaded
+    once and their "resumes" or "emails" list is yielded.
+
+    Args:
+        path: Output file (.jsonl or .json)
+        key: Record list to read from a legacy JSON file, guessed if omitted
+
+    Yields:
+        dict: One parsed resume or generated email at a time
+    """
+    path = resolve_records_path(path)
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line is expected after a crash
+                    continue
+        return
+
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    keys = (key,) if key else RECORD_KEYS
+    for record_key in keys:
+        if record_key in data:
+            yield from data[record_key]
+            return
+
+
+def read_summary(path: Union[str, Path]) -> Dict[str, Any]:
+    """Returns everything except the records of an output file.
+
+    For a JSONL file this is the content of its summary file (empty if the
+    run has not finished yet); for a legacy JSON file it is the top-level
+    object without the record list.
+    """
+    path = resolve_records_path(path)
+    if path.suffix == ".jsonl":
+        summary_file = summary_path(path)
+        if not summary_file.exists():
+            return {}
+        with summary_file.open("r") as f:
+            return json.load(f)
+
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {k: v for k, v in data.items() if k not in RECORD_KEYS}
@@ -63,4 +63,23 @@ Instructions:
 
 Resume Text:
 {resume_text}
-"""
\ No newline at end of file
+"""
+
+# Same instructions, sent once for several resumes (see resume_packer)
+PACKED_PROMPT_TEMPLATE = PROMPT_TEMPLATE.split("Resume Text:")[0].rstrip() + """
+7. Several resumes follow, each starting with a line "=== RESUME <id> ===". Parse each one independently and never mix information between resumes
+8. Return only a JSON array with one element per resume: {{"resume_id": "<id>", "data": <the structured resume>}}
+
+Resumes:
+{resumes}
+"""
+
+# Cheap follow-up when a parse answer is not valid JSON: only the broken answer is sent back
+JSON_REPAIR_PROMPT_TEMPLATE = """
+The text below was meant to be a single valid JSON document but cannot be parsed.
+Fix the syntax only: keep every key and value, do not add or remove information.
+Return only the corrected JSON, without markdown fences or comments.
+
+Text:
+{content}
+"""
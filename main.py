@@ -1,28 +1,30 @@
 #cv parsing 2/main.py
 
 from typing import List
+import argparse
+import asyncio
 import json
 import os
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # Local imports
-from app_parsing.services.resume_processor import process_resumes
+from app_parsing.services.resume_processor import process_resumes, process_resumes_async
+from app_parsing.services.pipeline import process_resumes_pipelined
+from app_parsing.services.batch_api import ingest_batch_results, write_batch_requests
+from app_parsing.services.candidate_repository import CandidateRepository
+from app_parsing.services.compact_schema import CompactSchema
 from app_parsing.services.document_loader import DocumentLoader
-
-# Modifiez le logging pour afficher aussi dans la console
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("resume_parser.log"),
-        logging.StreamHandler()
-    ]
-)
+from app_parsing.services.fast_extractor import FastExtractor
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.corpus_manifest import CorpusManifest, merge_parsed_resumes
+from app_parsing.services.run_journal import RunJournal
+from app_parsing.services.text_preprocessor import TextPreprocessor
+from app_parsing.services.work_queue import DEFAULT_VISIBILITY_TIMEOUT, WorkQueue, collect_results, run_worker
+from app_parsing.utils.jsonl import summary_path
 
 # Chemin mis à jour pour le fichier .env
 ENV_PATH = Path(__file__).parent / '.env'
@@ -30,30 +32,418 @@ ENV_PATH = Path(__file__).parent / '.env'
 # Load environment variables
 load_dotenv(dotenv_path=ENV_PATH)
 
+QUEUE_COMMANDS = ("enqueue", "worker", "collect")
+
+
+def setup_logging() -> None:
+    """Logs to resume_parser.log and the console.
+
+    Called once the arguments are parsed, so that --help or an import of
+    this module does not create the log file.
+    """
+    # Modifiez le logging pour afficher aussi dans la console
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("resume_parser.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parse resumes into structured JSON.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=QUEUE_COMMANDS,
+        default=None,
+        help="Distributed mode: 'enqueue' the resumes into a shared work queue, run a 'worker' on each host, "
+             "then 'collect' the results into parsed_resumes.json (default: parse on this machine)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only parse new or changed files (recursive scan) and merge them into the existing output "
+             "(JSON output only)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Use the asyncio engine with this many requests in flight (default: threaded batches)"
+    )
+    parser.add_argument("--rpm", type=int, default=3500, help="API requests per minute quota (asyncio engine)")
+    parser.add_argument("--tpm", type=int, default=200000, help="API tokens per minute quota (asyncio engine)")
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=None,
+        help="Extract text on this many processes in a separate pipeline stage (0 = one per CPU core)"
+    )
+    parser.add_argument(
+        "--llm-workers",
+        type=int,
+        default=3,
+        help="Threads making API calls in the pipeline / threaded engine"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=32,
+        help="Maximum number of extracted texts waiting for the LLM stage"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=3000,
+        help="With --preprocess, maximum resume tokens sent to the model after cleaning (0 = no limit)"
+    )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Clean the extracted text (page headers/footers, page numbers, whitespace) and fit it into "
+             "--token-budget before prompting (default: send the raw text)"
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="jsonl streams one record per line as each CV completes, with statistics in a summary file"
+    )
+    parser.add_argument(
+        "--pack-budget",
+        type=int,
+        default=0,
+        help="Send several small resumes per request, up to this many resume tokens (threaded engine, 0 = off)"
+    )
+    parser.add_argument(
+        "--max-pack-size",
+        type=int,
+        default=None,
+        help="Maximum resumes per packed request (default: what fits in the completion limit)"
+    )
+    parser.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="Extract email, phone, LinkedIn and lexicon skills locally and only ask the model for the rest"
+    )
+    parser.add_argument(
+        "--compact-output",
+        action="store_true",
+        help="Ask the model for short keys and positional arrays, expanded locally (fewer completion tokens)"
+    )
+    parser.add_argument(
+        "--router",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="CONFIG_FILE",
+        help="Route each CV to a model by text length and escalate invalid answers to a stronger one "
+             "(JSON routing config, default: built-in routes)"
+    )
+    parser.add_argument(
+        "--skills-lexicon",
+        metavar="FILE",
+        default=None,
+        help="Skills matched by --fast-path: JSON list or one skill per line (default: built-in list)"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Refresh API cost/latency metrics in this file during the run (.prom for Prometheus, .json otherwise)"
+    )
+    parser.add_argument(
+        "--batch-submit",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="REQUESTS_FILE",
+        help="Write Batch API requests (one per CV) instead of calling the API; upload each file with purpose=batch"
+    )
+    parser.add_argument(
+        "--batch-ingest",
+        nargs="+",
+        metavar="RESULTS_FILE",
+        default=None,
+        help="Build parsed_resumes.json from the downloaded Batch API output files (one per requests file)"
+    )
+    parser.add_argument(
+        "--batch-requests",
+        metavar="REQUESTS_FILE",
+        default=None,
+        help="Requests file the batch results answer (default: the latest one written by --batch-submit)"
+    )
+    parser.add_argument(
+        "--db",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DB_FILE",
+        help="Also write the parsed resumes to a SQLite candidate repository indexed by skill, title, seniority "
+             "and experience (default file: app_parsing/data/output/candidates.db)"
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="QUEUE_FILE",
+        default=None,
+        help="SQLite work queue of enqueue/worker/collect, on a share every worker host mounts "
+             "(default: app_parsing/data/output/work_queue.db)"
+    )
+    parser.add_argument(
+        "--visibility-timeout",
+        type=float,
+        default=DEFAULT_VISIBILITY_TIMEOUT,
+        help="Seconds a resume leased by a worker stays hidden from the others without a renewal"
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=None,
+        help="Unique name of this worker in the queue statistics (default: host name and process id)"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        default=None,
+        help="Continue an interrupted run from its checkpoint journal, skipping resumes already parsed"
+    )
+    args = parser.parse_args()
+    if args.batch_submit is not None:
+        # Batch requests are single-resume calls to the default model with the full schema
+        ignored = [option for option, used in (("--compact-output", args.compact_output),
+                                               ("--router", args.router is not None),
+                                               ("--pack-budget", args.pack_budget)) if used]
+        if ignored:
+            parser.error(f"--batch-submit does not support {', '.join(ignored)}")
+    if args.incremental and args.output_format == "jsonl":
+        # The merge rewrites parsed_resumes.json with the kept and the new records
+        parser.error("--incremental only supports --output-format json")
+    return args
+
+
+def build_preprocessor(args) -> TextPreprocessor:
+    return TextPreprocessor(token_budget=args.token_budget or None) if args.preprocess else None
+
+
+def build_fast_extractor(args) -> FastExtractor:
+    if not args.fast_path:
+        return None
+    return FastExtractor.from_file(args.skills_lexicon) if args.skills_lexicon else FastExtractor()
+
+
+def build_compact_schema(args) -> CompactSchema:
+    return CompactSchema() if args.compact_output else None
+
+
+def build_router(args) -> ModelRouter:
+    if args.router is None:
+        return None
+    return ModelRouter.from_file(args.router) if args.router else ModelRouter()
+
+
+def build_repository(args) -> CandidateRepository:
+    return CandidateRepository(args.db) if args.db is not None else None
+
+
+def find_resumes(resume_path: Path) -> List[str]:
+    """Supported resume files directly under resume_path."""
+    return [str(file_path) for file_path in resume_path.glob("*")
+            if file_path.suffix.lower() in DocumentLoader.SUPPORTED_FORMATS]
+
+
+def latest_batch_requests(batch_dir: Path) -> Path:
+    """Returns the most recent requests file written by --batch-submit."""
+    # Further files of a split submission have no summary of their own
+    candidates = sorted(path for path in batch_dir.glob("batch_requests_*.jsonl") if summary_path(path).exists())
+    if not candidates:
+        raise FileNotFoundError(f"No batch requests file in {batch_dir}; pass --batch-requests")
+    return candidates[-1]
+
+
+def run_parser(args, cv_file_paths: List[str], output_json_path: Path, cache_dir: Path, runs_dir: Path,
+               journal: RunJournal = None, output_format: str = None) -> Path:
+    """Runs the threaded or the asyncio parsing engine depending on the CLI options.
+
+    Every run is checkpointed in a journal under runs_dir so that it can be
+    continued with --resume after a crash.
+    """
+    output_format = output_format or args.output_format
+    if journal is None:
+        journal = RunJournal.create(runs_dir, cv_file_paths, {
+            "incremental": args.incremental,
+            "output_format": args.output_format
+        })
+    print(f"Run ID: {journal.run_id} (continue after a crash with --resume {journal.run_id})")
+    preprocessor = build_preprocessor(args)
+    fast_extractor = build_fast_extractor(args)
+    if args.concurrency:
+        return asyncio.run(process_resumes_async(
+            cv_file_paths,
+            output_json_path=output_json_path,
+            concurrency=args.concurrency,
+            rpm=args.rpm,
+            tpm=args.tpm,
+            cache_dir=cache_dir,
+            output_format=output_format,
+            journal=journal,
+            preprocessor=preprocessor,
+            fast_extractor=fast_extractor,
+            metrics_file=args.metrics_file,
+            repository=build_repository(args),
+            compact_schema=build_compact_schema(args),
+            router=build_router(args)
+        ))
+    if args.extract_workers is not None:
+        return process_resumes_pipelined(
+            cv_file_paths,
+            output_json_path=output_json_path,
+            extract_workers=args.extract_workers or None,
+            llm_workers=args.llm_workers,
+            queue_size=args.queue_size,
+            cache_dir=cache_dir,
+            output_format=output_format,
+            journal=journal,
+            preprocessor=preprocessor,
+            fast_extractor=fast_extractor,
+            metrics_file=args.metrics_file,
+            repository=build_repository(args),
+            compact_schema=build_compact_schema(args),
+            router=build_router(args)
+        )
+    return process_resumes(
+        cv_file_paths,
+        output_json_path=output_json_path,
+        max_workers=args.llm_workers,
+        cache_dir=cache_dir,
+        output_format=output_format,
+        journal=journal,
+        preprocessor=preprocessor,
+        fast_extractor=fast_extractor,
+        metrics_file=args.metrics_file,
+        pack_token_budget=args.pack_budget or None,
+        max_pack_size=args.max_pack_size,
+        repository=build_repository(args),
+        compact_schema=build_compact_schema(args),
+        router=build_router(args)
+    )
+
+
+def run_queue_command(args, queue_path: Path, resume_path: Path, output_dir: Path, cache_dir: Path) -> None:
+    """Runs the enqueue, worker or collect step of a distributed run."""
+    if args.command == "enqueue":
+        with WorkQueue(queue_path) as queue:
+            counts = queue.enqueue(find_resumes(resume_path))
+            print(f"Queue {queue_path}: {counts['added']} added, {counts['requeued']} failed resumes requeued, "
+                  f"{counts['skipped']} already queued; now {queue.get_stats()}")
+    elif args.command == "worker":
+        stats = run_worker(
+            queue_path,
+            worker_id=args.worker_id,
+            max_workers=args.llm_workers,
+            visibility_timeout=args.visibility_timeout,
+            cache_dir=cache_dir,
+            preprocessor=build_preprocessor(args),
+            metrics_file=args.metrics_file,
+            fast_extractor=build_fast_extractor(args),
+            compact_schema=build_compact_schema(args),
+            router=build_router(args)
+        )
+        print(f"Worker {stats['worker_id']} parsed {stats['items']} resumes ({stats['successful']} successful)")
+    else:
+        output_path = collect_results(queue_path, output_dir / "parsed_resumes.json", args.output_format,
+                                      build_repository(args))
+        print(f"Results of {queue_path} written to {output_path}")
+
+
+def run_incremental(args, resume_path: Path, output_dir: Path, cache_dir: Path, runs_dir: Path,
+                    journal: RunJournal = None) -> Path:
+    """Parses only new or changed resumes and merges them into parsed_resumes.json."""
+    output_json_path = output_dir / "parsed_resumes.json"
+    manifest = CorpusManifest(output_dir / "resume_manifest.json")
+    diff = manifest.scan(resume_path)
+    print(f"Incremental scan: {diff.summary()}")
+
+    run_data = {}
+    if diff.to_process:
+        # The merge needs the run's records in memory anyway
+        run_output = run_parser(args, diff.to_process, output_dir / "parsed_resumes.run.json", cache_dir,
+                                runs_dir, journal=journal, output_format="json")
+        with open(run_output, "r") as f:
+            run_data = json.load(f)
+        run_output.unlink()
+
+    merge_parsed_resumes(output_json_path, run_data, diff)
+    if args.db is not None and diff.deleted:
+        with build_repository(args) as repository:
+            repository.remove(diff.deleted)
+    manifest.apply(diff, run_data.get("resumes", []))
+    manifest.save()
+    return output_json_path
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    setup_logging()
     print("Starting resume processing...")
     
     base_path = Path(__file__).parent
     resume_path = base_path / "app_parsing" / "data" / "resumes"
     print(f"Looking for resumes in: {resume_path}")
+
+    # Ensure the output directory exists
+    output_dir = base_path / "app_parsing" / "data" / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)  # Create the directory if it doesn't exist
+    cache_dir = base_path / "app_parsing" / "data" / "cache" / "parses"
+    runs_dir = base_path / "app_parsing" / "data" / "runs"
+    batch_dir = output_dir / "batch"
+    if args.db == "":
+        args.db = str(output_dir / "candidates.db")
+
+    if args.command is not None:
+        run_queue_command(args, Path(args.queue) if args.queue else output_dir / "work_queue.db", resume_path,
+                          output_dir, cache_dir)
+        exit(0)
+
+    if args.batch_ingest:
+        requests_path = Path(args.batch_requests) if args.batch_requests else latest_batch_requests(batch_dir)
+        output_path = ingest_batch_results(args.batch_ingest, requests_path, output_dir / "parsed_resumes.json",
+                                           cache_dir, args.output_format, build_repository(args))
+        print(f"Batch results of {requests_path.name} written to {output_path}")
+        exit(0)
+
+    journal = None
+    if args.resume:
+        journal = RunJournal.open(runs_dir, args.resume)
+        args.incremental = journal.options.get("incremental", False)
+        args.output_format = journal.options.get("output_format", args.output_format)
+        print(f"Resuming run {journal.run_id}: {len(journal.completed)} resumes already parsed")
+
+    if args.incremental:
+        output_path = run_incremental(args, resume_path, output_dir, cache_dir, runs_dir, journal)
+        print(f"Results merged into {output_path}")
+        exit(0)
     
     cv_file_paths = []
-    for file_path in resume_path.glob("*"):
-        if file_path.suffix.lower() in DocumentLoader.SUPPORTED_FORMATS:
-            cv_file_paths.append(str(file_path))
-            
+    if journal is not None:
+        cv_file_paths = journal.cv_file_paths
+    else:
+        cv_file_paths = find_resumes(resume_path)
+
     print(f"Found {len(cv_file_paths)} supported files")
     
     if not cv_file_paths:
         print(f"No supported files found in {resume_path}")
         exit(1)
 
-    # Ensure the output directory exists
-    output_dir = base_path / "app_parsing" / "data" / "output"
-    output_dir.mkdir(parents=True, exist_ok=True)  # Create the directory if it doesn't exist
+    if args.batch_submit is not None:
+        requests_path = Path(args.batch_submit) if args.batch_submit else \
+            batch_dir / f"batch_requests_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        files = write_batch_requests(cv_file_paths, requests_path, build_preprocessor(args),
+                                     build_fast_extractor(args))
+        print(f"Batch requests written to {', '.join(str(path) for path in files)}")
+        print(f"Upload each file as a batch, then run: python main.py --batch-ingest "
+              f"{' '.join(f'<output_{index + 1}.jsonl>' for index in range(len(files)))} --batch-requests {requests_path}")
+        exit(0)
 
-    output_path = process_resumes(
-        cv_file_paths,
-        output_json_path=output_dir / "parsed_resumes.json",  # Use the created directory
-        max_workers=3
-    )
\ No newline at end of file
+    output_path = run_parser(args, cv_file_paths, output_dir / "parsed_resumes.json", cache_dir, runs_dir, journal)
\ No newline at end of file
@@ -10,6 +10,7 @@ setup(
         'openai',
         'python-dotenv',
         'langchain',
-        'pandas'
+        'pandas',
+        'numpy'
     ]
 )
\ No newline at end of file
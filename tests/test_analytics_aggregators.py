@@ -0,0 +1,170 @@
+import json
+
+import pytest
+
+from app_parsing.services.analytics_aggregators import (
+    SCORE_EDGES, EmailAggregator, HeavyHitters, Histogram, ParsingAggregator
+)
+
+
+def _resume(name, years=5, skills=("Python",), success=True, file_type="pdf"):
+    return {
+        "Full Name": name,
+        "Professional Summary": {"Years of Experience": years},
+        "HR Evaluation": {"Seniority Level": "Senior"},
+        "Skills": {"Technical Skills": list(skills)},
+        "_metadata": {"success": success, "file_type": file_type, "tokens_used": 100, "api_calls": 1}
+    }
+
+
+def _email(name, score, skills=("Python",), timestamp="2024-01-01T10:00:00"):
+    return {"candidate_name": name, "timestamp": timestamp,
+            "email_data": {"match_score": f"{score}%", "match_details": {"matched_skills": list(skills)}}}
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def test_consume_file_only_reads_appended_records(tmp_path):
+    path = tmp_path / "parsed_resumes.jsonl"
+    _write_jsonl(path, [_resume(f"c{i}") for i in range(3)])
+    aggregator = ParsingAggregator()
+
+    assert aggregator.consume_file(path) == 3
+    assert aggregator.consume_file(path) == 0
+    with path.open("a") as f:
+        f.write(json.dumps(_resume("c3", skills=("Go",))) + "\n")
+    assert aggregator.consume_file(path) == 1
+
+    stats = aggregator.get_stats()
+    assert stats["total_processed"] == 4
+    assert stats["top_technical_skills"] == {"Python": 3, "Go": 1}
+
+
+def test_rewritten_file_replaces_its_old_records(tmp_path):
+    path = tmp_path / "parsed_resumes.jsonl"
+    other = tmp_path / "other.jsonl"
+    _write_jsonl(path, [_resume(f"c{i}") for i in range(3)])
+    _write_jsonl(other, [_resume("o1", skills=("Rust",))])
+    aggregator = ParsingAggregator()
+    aggregator.consume_file(path)
+    aggregator.consume_file(other)
+
+    _write_jsonl(path, [_resume(f"n{i}", skills=("Go",)) for i in range(4)])
+    assert aggregator.consume_file(path) == 4
+
+    stats = aggregator.get_stats()
+    assert stats["total_processed"] == 5
+    assert stats["top_technical_skills"] == {"Go": 4, "Rust": 1}
+    assert stats["usage"]["tokens_used"] == 500
+
+
+def test_file_rewritten_to_fewer_records_and_emptied(tmp_path):
+    path = tmp_path / "generated_emails.jsonl"
+    _write_jsonl(path, [_email(f"c{i}", 80) for i in range(3)])
+    aggregator = EmailAggregator()
+    aggregator.consume_file(path)
+
+    _write_jsonl(path, [_email("d0", 20)])
+    aggregator.consume_file(path)
+    assert (aggregator.total, aggregator.qualified) == (1, 0)
+
+    path.write_text("")
+    assert aggregator.consume_file(path) == 0
+    assert aggregator.total == 0
+    assert aggregator.sources == {}
+
+
+def test_state_round_trip_keeps_statistics_and_resume_point(tmp_path):
+    path = tmp_path / "parsed_resumes.jsonl"
+    state = tmp_path / "state.json"
+    _write_jsonl(path, [_resume("c0"), _resume("c1", success=False, file_type="docx")])
+    aggregator = ParsingAggregator()
+    aggregator.consume_file(path)
+    aggregator.save(state)
+
+    loaded = ParsingAggregator.load(state)
+    assert loaded.get_stats() == aggregator.get_stats()
+    assert loaded.consume_file(path) == 0
+
+    _write_jsonl(path, [_resume("n0", skills=("Go",))])
+    loaded.consume_file(path)
+    assert loaded.get_stats()["top_technical_skills"] == {"Go": 1}
+
+
+def test_load_rejects_the_other_kind(tmp_path):
+    state = ParsingAggregator().save(tmp_path / "state.json")
+    with pytest.raises(ValueError):
+        EmailAggregator.load(state)
+
+
+def test_older_state_is_rebuilt_from_its_files(tmp_path):
+    path = tmp_path / "generated_emails.jsonl"
+    _write_jsonl(path, [_email("c0", 90), _email("c1", 40)])
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"kind": "emails", "version": 1,
+                                 "sources": {str(path.resolve()): 2, str(tmp_path / "gone.jsonl"): 5}}))
+
+    aggregator = EmailAggregator.load(state)
+    assert (aggregator.total, aggregator.qualified) == (2, 1)
+    assert list(aggregator.sources) == [str(path.resolve())]
+
+
+def test_merge_adds_disjoint_sources_and_dedupes_shared_ones(tmp_path):
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    _write_jsonl(first, [_email("a0", 70, timestamp="2024-01-02T00:00:00")])
+    _write_jsonl(second, [_email("b0", 30, timestamp="2024-01-01T00:00:00"), _email("b1", 60)])
+    left, right = EmailAggregator(), EmailAggregator()
+    left.consume_file(first)
+    right.consume_file(second)
+    right.consume_file(first)
+
+    left.merge(right)
+
+    assert left.total == 3
+    assert left.scores.count_at_least(50) == 2
+    assert left.first_timestamp == "2024-01-01T00:00:00"
+    assert set(left.sources) == {str(first.resolve()), str(second.resolve())}
+
+
+def test_merge_round_trips_through_saved_states(tmp_path):
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    _write_jsonl(first, [_resume("a0", years=2)])
+    _write_jsonl(second, [_resume("b0", years=12, skills=("Go", "Python"))])
+    left, right = ParsingAggregator(), ParsingAggregator()
+    left.consume_file(first)
+    right.consume_file(second)
+    left.save(tmp_path / "left.json")
+    right.save(tmp_path / "right.json")
+
+    merged = ParsingAggregator.load(tmp_path / "left.json")
+    merged.merge(ParsingAggregator.load(tmp_path / "right.json"))
+    direct = ParsingAggregator()
+    direct.consume_file(first)
+    direct.consume_file(second)
+
+    assert merged.get_stats() == direct.get_stats()
+
+
+def test_heavy_hitters_keep_frequent_items_within_capacity():
+    sketch = HeavyHitters(capacity=3)
+    for item in ["a"] * 10 + ["b"] * 6 + list("cdefgh"):
+        sketch.add(item)
+
+    assert len(sketch.counts) == 3
+    assert [item for item, _ in sketch.most_common(2)] == ["a", "b"]
+    assert HeavyHitters.from_dict(sketch.to_dict()).most_common() == sketch.most_common()
+
+
+def test_histogram_from_counts_matches_adding_values():
+    values = [0, 15, 55, 99, 100]
+    added = Histogram(SCORE_EDGES)
+    for value in values:
+        added.add(value)
+
+    built = Histogram.from_counts(SCORE_EDGES, added.bins, sum(values), 0, 100)
+    assert built.to_dict() == added.to_dict()
+    assert built.count_at_least(50) == 3
+    with pytest.raises(ValueError):
+        Histogram.from_counts(SCORE_EDGES, [1, 2], 3, 0, 1)
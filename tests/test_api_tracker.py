@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from app_parsing.services.api_tracker import APIUsageTracker
+
+
+def _tracker():
+    tracker = APIUsageTracker()
+    tracker.record_call("gpt-4o-mini", 1000, 200, latency_seconds=0.8, stage="parse")
+    tracker.record_call("gpt-4o", 500, 100, latency_seconds=2.5, stage="email")
+    tracker.record_call("gpt-4o-mini", 300, 50, latency_seconds=0.4, stage="parse")
+    return tracker
+
+
+def _family(sample_name, families):
+    for family in sorted(families, key=len, reverse=True):
+        if sample_name == family or sample_name.startswith(family + "_"):
+            return family
+    return None
+
+
+def test_prometheus_families_are_contiguous_blocks():
+    text = _tracker().to_prometheus()
+    lines = text.splitlines()
+    families = []
+    for index, line in enumerate(lines):
+        if line.startswith("# HELP "):
+            assert lines[index + 1].startswith(f"# TYPE {line.split()[2]} ")
+        elif line.startswith("# TYPE "):
+            families.append(line.split()[2])
+        else:
+            family = _family(line.split("{")[0], families)
+            assert family == families[-1], f"{line!r} is outside its family block"
+
+    assert len(families) == len(set(families)) == 4
+    assert 'cv_parser_tokens_total{model="gpt-4o",direction="output"} 100' in text
+    assert 'cv_parser_api_latency_seconds_count{stage="parse"} 2' in text
+
+
+def test_prometheus_output_parses():
+    parser = pytest.importorskip("prometheus_client.parser")
+    families = {family.name: family for family in parser.text_string_to_metric_families(
+        _tracker().to_prometheus())}
+
+    calls = {sample.labels["model"]: sample.value for sample in families["cv_parser_api_calls"].samples}
+    assert calls == {"gpt-4o-mini": 2, "gpt-4o": 1}
+    assert families["cv_parser_api_latency_seconds"].type == "histogram"
+
+
+def test_write_metrics_picks_the_format_from_the_suffix(tmp_path):
+    tracker = _tracker()
+    tracker.write_metrics(tmp_path / "metrics.json")
+    tracker.write_metrics(tmp_path / "metrics.prom")
+
+    assert json.loads((tmp_path / "metrics.json").read_text())["total_api_calls"] == 3
+    assert (tmp_path / "metrics.prom").read_text() == tracker.to_prometheus()
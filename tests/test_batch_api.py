@@ -0,0 +1,128 @@
+import json
+
+from app_parsing.services.batch_api import (
+    BATCH_PRICE_FACTOR, batch_file_path, ingest_batch_results, write_batch_requests
+)
+from app_parsing.utils.jsonl import read_summary
+
+
+def _resumes(tmp_path, count=3):
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"cv{index}.txt"
+        path.write_text(f"Candidate {index}\nPython developer with {index + 2} years of experience.\n")
+        paths.append(str(path))
+    return paths
+
+
+def _read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def _success(custom_id, content, prompt_tokens=100, completion_tokens=50):
+    return {"custom_id": custom_id, "error": None, "response": {"status_code": 200, "body": {
+        "model": "gpt-4o-mini",
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+        "choices": [{"message": {"content": content}}]
+    }}}
+
+
+def test_requests_and_summary_cover_every_resume(tmp_path):
+    paths = _resumes(tmp_path) + [str(tmp_path / "missing.txt")]
+    requests_path = tmp_path / "batch" / "requests.jsonl"
+
+    files = write_batch_requests(paths, requests_path)
+
+    assert files == [requests_path]
+    requests = _read_jsonl(requests_path)
+    assert [request["custom_id"] for request in requests] == ["cv-000000", "cv-000001", "cv-000002"]
+    assert all(request["url"] == "/v1/chat/completions" for request in requests)
+    summary = read_summary(requests_path)
+    assert summary["total_requests"] == 3
+    assert summary["files"] == [str(requests_path)]
+    assert "error" in summary["requests"]["cv-000003"]
+    assert summary["requests"]["cv-000001"]["source_path"] == paths[1]
+
+
+def test_requests_are_split_at_the_request_limit(tmp_path):
+    requests_path = tmp_path / "requests.jsonl"
+
+    files = write_batch_requests(_resumes(tmp_path, 5), requests_path, max_requests=2)
+
+    assert files == [batch_file_path(requests_path, index) for index in range(3)]
+    assert files[1].name == "requests.part002.jsonl"
+    assert [len(_read_jsonl(path)) for path in files] == [2, 2, 1]
+    assert read_summary(requests_path)["files"] == [str(path) for path in files]
+
+
+def test_requests_are_split_at_the_size_limit(tmp_path):
+    requests_path = tmp_path / "requests.jsonl"
+    one_request = write_batch_requests(_resumes(tmp_path, 1), requests_path)[0].stat().st_size
+
+    files = write_batch_requests(_resumes(tmp_path, 3), requests_path, max_bytes=int(one_request * 1.5))
+
+    assert len(files) == 3
+    assert all(path.stat().st_size <= one_request * 1.5 for path in files)
+    # A request larger than the limit still gets a file of its own
+    assert len(write_batch_requests(_resumes(tmp_path, 2), requests_path, max_bytes=10)) == 2
+
+
+def test_ingest_rebuilds_records_and_statistics(tmp_path):
+    paths = _resumes(tmp_path, 4) + [str(tmp_path / "missing.txt")]
+    requests_path = tmp_path / "requests.jsonl"
+    write_batch_requests(paths, requests_path)
+    results_path = tmp_path / "results.jsonl"
+    results_path.write_text("".join(json.dumps(line) + "\n" for line in [
+        _success("cv-000000", json.dumps({"Full Name": "Candidate 0"})),
+        {"custom_id": "cv-000001", "error": None,
+         "response": {"status_code": 500, "body": {"error": {"message": "server error"}}}},
+        _success("cv-999999", "{}"),
+        _success("cv-000002", "this is not json at all"),
+        _success("cv-000000", "{}"),
+    ]))
+
+    output = ingest_batch_results(results_path, requests_path, str(tmp_path / "parsed_resumes.json"),
+                                  cache_dir=str(tmp_path / "cache"))
+
+    data = json.loads(output.read_text())
+    records = {record["_metadata"]["source_path"]: record for record in data["resumes"]}
+    assert records[paths[0]]["Full Name"] == "Candidate 0"
+    assert records[paths[0]]["_metadata"]["batch_custom_id"] == "cv-000000"
+    assert records[paths[1]]["_metadata"]["error_class"] == "transient"
+    assert "server error" in records[paths[1]]["_metadata"]["error"]
+    assert records[paths[2]]["_metadata"]["tokens_used"] == 150
+    assert not records[paths[2]]["_metadata"]["success"]
+    assert records[paths[3]]["_metadata"]["error"] == "No result in the batch output"
+    assert records[paths[4]]["_metadata"]["error_class"] == "permanent"
+
+    statistics = data["statistics"]
+    assert (statistics["total_processed"], statistics["successful"], statistics["failed"]) == (5, 1, 4)
+    assert statistics["format_statistics"][".txt"] == {"total": 5, "successful": 1}
+    assert statistics["api_usage"]["total_api_calls"] == 2
+    assert statistics["api_usage"]["total_tokens"] == 300
+    assert statistics["batch"] == {
+        "results_files": [str(results_path)], "requests_file": str(requests_path), "results": 3,
+        "missing_results": 1, "ignored_results": 2, "price_factor": BATCH_PRICE_FACTOR
+    }
+    assert statistics["cache"]["entries"] == 1
+
+
+def test_ingest_reads_one_output_per_batch_file(tmp_path):
+    requests_path = tmp_path / "requests.jsonl"
+    files = write_batch_requests(_resumes(tmp_path, 3), requests_path, max_requests=2)
+    results = []
+    for index, path in enumerate(files):
+        result_path = tmp_path / f"results{index}.jsonl"
+        result_path.write_text("".join(json.dumps(_success(request["custom_id"], '{"Full Name": "x"}')) + "\n"
+                                       for request in _read_jsonl(path)))
+        results.append(result_path)
+
+    output = ingest_batch_results(results, requests_path, str(tmp_path / "parsed_resumes.json"),
+                                  output_format="jsonl")
+
+    assert output.suffix == ".jsonl"
+    assert len(_read_jsonl(output)) == 3
+    statistics = read_summary(output)["statistics"]
+    assert statistics["successful"] == 3
+    assert statistics["batch"]["results_files"] == [str(path) for path in results]
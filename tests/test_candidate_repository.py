@@ -0,0 +1,107 @@
+import pytest
+
+from app_parsing.services.candidate_repository import CandidateRepository
+
+
+def _record(name, technical=(), soft=(), years=None, seniority=None, title=None, success=True):
+    record = {
+        "Full Name": name,
+        "Professional Title": title,
+        "Skills": {"Technical Skills": list(technical), "Soft Skills": list(soft)},
+        "_metadata": {"source_path": f"/cvs/{name}.pdf", "filename": f"{name}.pdf", "file_type": ".pdf",
+                      "success": success}
+    }
+    if years is not None:
+        record["Professional Summary"] = {"Years of Experience": years}
+    if seniority is not None:
+        record["HR Evaluation"] = {"Seniority Level": seniority}
+    return record
+
+
+def _names(records):
+    return [record["Full Name"] for record in records]
+
+
+@pytest.fixture
+def repository(tmp_path):
+    with CandidateRepository(tmp_path / "candidates.db", batch_size=2) as repository:
+        repository.add_many([
+            _record("ana", ["Python", "SQL"], ["Leadership"], years=6, seniority="Senior", title="Data Engineer"),
+            _record("ben", ["python"], ["sql"], years="3", seniority="mid", title="data engineer"),
+            _record("cem", ["Java"], ["Python"], years="n/a", seniority="Junior"),
+            _record("dan", ["Python", "SQL"], years=10, success=False),
+        ])
+        yield repository
+
+
+def test_skill_lookups_ignore_case(repository):
+    assert _names(repository.find_candidates(any_skills=["PYTHON"])) == ["ana", "ben", "cem"]
+    assert _names(repository.find_candidates(any_skills=["sql", "Java"])) == ["ana", "ben", "cem"]
+    assert _names(repository.find_candidates(all_skills=["python", "SQL"])) == ["ana", "ben"]
+    assert _names(repository.find_candidates(all_skills=["Python", "PYTHON", "sql"])) == ["ana", "ben"]
+    assert list(repository.find_candidates(any_skills=[])) == []
+
+
+def test_all_skills_counts_a_skill_listed_under_both_kinds_once(tmp_path):
+    with CandidateRepository(tmp_path / "candidates.db") as repository:
+        repository.add_many([_record("eve", ["Python"], ["python"]), _record("fay", ["Python", "Go"])])
+
+        assert _names(repository.find_candidates(all_skills=["Python"])) == ["eve", "fay"]
+        assert _names(repository.find_candidates(all_skills=["Python", "Go"])) == ["fay"]
+
+
+def test_title_and_seniority_ignore_case(repository):
+    assert _names(repository.find_candidates(title="DATA ENGINEER")) == ["ana", "ben"]
+    assert _names(repository.find_candidates(seniority="senior")) == ["ana"]
+
+
+def test_years_filters_skip_unknown_years(repository):
+    assert _names(repository.find_candidates(min_years=4)) == ["ana"]
+    assert _names(repository.find_candidates(max_years=6)) == ["ana", "ben"]
+    assert _names(repository.find_candidates(min_years=0, successful_only=False)) == ["ana", "ben", "dan"]
+    assert _names(repository.find_candidates()) == ["ana", "ben", "cem"]
+
+
+def test_writing_a_source_path_again_replaces_the_record_and_its_skills(repository):
+    repository.add_many([_record("ana", ["Go"], years=7)])
+
+    assert _names(repository.iter_records()) == ["ben", "cem", "dan", "ana"]
+    assert _names(repository.find_candidates(any_skills=["Go"])) == ["ana"]
+    assert "ana" not in _names(repository.find_candidates(any_skills=["SQL"]))
+    orphans = repository._conn.execute(
+        "SELECT COUNT(*) FROM resume_skills WHERE resume_id NOT IN (SELECT id FROM resumes)").fetchone()[0]
+    assert orphans == 0
+    assert repository.get_stats()["resumes"] == 4
+
+
+def test_remove_deletes_records_and_their_skills(repository):
+    assert repository.remove(["/cvs/ana.pdf", "/cvs/missing.pdf"]) == 1
+    assert _names(repository.find_candidates(any_skills=["Leadership"])) == []
+    assert repository._conn.execute("SELECT COUNT(*) FROM resume_skills").fetchone()[0] == 6
+
+
+def test_find_candidates_pages_through_many_matches(tmp_path):
+    with CandidateRepository(tmp_path / "candidates.db", batch_size=50) as repository:
+        repository.PAGE_SIZE = 7
+        repository.add_many(_record(f"c{index:03d}", ["Python"] if index % 3 else ["Go"]) for index in range(100))
+
+        found = _names(repository.find_candidates(any_skills=["python"]))
+        assert found == [f"c{index:03d}" for index in range(100) if index % 3]
+        assert len(_names(repository.find_candidates(all_skills=["Go"]))) == 34
+
+
+def test_pages_are_read_lazily_and_see_later_writes(tmp_path):
+    with CandidateRepository(tmp_path / "candidates.db") as repository:
+        repository.PAGE_SIZE = 2
+        repository.add_many(_record(f"c{index}", ["Python"]) for index in range(3))
+
+        candidates = repository.find_candidates(any_skills=["Python"])
+        assert _names([next(candidates), next(candidates)]) == ["c0", "c1"]
+        repository.add(_record("c3", ["Python"]))
+        assert _names(candidates) == ["c2", "c3"]
+
+
+def test_statistics_round_trip(repository):
+    assert repository.read_summary() == {}
+    repository.set_statistics({"total_processed": 4})
+    assert repository.read_summary() == {"statistics": {"total_processed": 4}}
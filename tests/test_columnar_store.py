@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+
+from app_parsing.scripts.analysis import analyze_parsing_results
+from app_parsing.scripts.email_analysis import analyze_email_results
+from app_parsing.services.analytics_aggregators import ParsingAggregator
+from app_parsing.services.columnar_store import ColumnarStore, export_emails, export_resumes
+from app_parsing.utils.jsonl import iter_records
+
+RESUMES = [
+    {"Full Name": "Ana", "Professional Title": "Data Engineer",
+     "Professional Summary": {"Years of Experience": 6}, "HR Evaluation": {"Seniority Level": "Senior"},
+     "Skills": {"Technical Skills": ["Python", "SQL", "Python"], "Soft Skills": ["Leadership"]},
+     "_metadata": {"filename": "ana.pdf", "file_type": ".pdf", "success": True, "tokens_used": 900}},
+    {"Full Name": "Ben", "Professional Summary": {"Years of Experience": "n/a"},
+     "Skills": {"Technical Skills": ["Python", "Docker"], "Soft Skills": ["SQL"]},
+     "_metadata": {"filename": "ben.docx", "file_type": ".docx", "success": True, "tokens_used": 700}},
+    {"Skills": {"Technical Skills": ["Kafka"]},
+     "_metadata": {"filename": "cem.pdf", "file_type": ".pdf", "success": False, "error": "timeout"}},
+]
+EMAILS = [
+    {"candidate_name": "Ana", "timestamp": "2024-03-01T10:00:00",
+     "email_data": {"match_score": "85%", "match_details": {"matching_skills": ["Python", "SQL"]}}},
+    {"candidate_name": "Ben", "timestamp": "2024-03-01T10:05:00",
+     "email_data": {"match_score": "45.5%", "match_details": {"matched_skills": ["Python"]}}},
+    {"candidate_name": "Cem", "timestamp": "2024-03-01T10:02:30", "email_data": {"match_details": {}}},
+]
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return path
+
+
+def test_resume_store_round_trip(tmp_path):
+    records_path = _write_jsonl(tmp_path / "parsed_resumes.jsonl", RESUMES)
+
+    with ColumnarStore(export_resumes(records_path)) as store:
+        assert store.kind == "resumes" and len(store) == 3
+        assert store["success"].tolist() == [True, True, False]
+        assert np.isnan(store["years_experience"][1])
+        assert store["seniority_levels"][store["seniority"][0]] == "Senior"
+        assert store.skill_counts() == {"Python": 2, "SQL": 2, "Leadership": 1, "Docker": 1, "Kafka": 1}
+        technical = store.skill_counts(store["success"], "Technical Skills")
+        assert store.skill_counts(kind="Soft Skills") == {"Leadership": 1, "SQL": 1}
+
+    # The JSON path of analysis.py counts the technical skills of successful resumes
+    aggregator = ParsingAggregator()
+    for record in iter_records(records_path, key="resumes"):
+        aggregator.add(record)
+    assert technical == dict(aggregator.skills.most_common())
+
+
+def test_resume_store_and_records_give_the_same_report(tmp_path):
+    records_path = _write_jsonl(tmp_path / "parsed_resumes.jsonl", RESUMES)
+    store_path = export_resumes(records_path)
+
+    from_records = analyze_parsing_results(str(records_path))
+    from_store = analyze_parsing_results(str(store_path))
+
+    assert from_store["statistics"] == from_records["statistics"]
+    assert [failure["_metadata"]["filename"] for failure in from_store["failed_resumes"]] == ["cem.pdf"]
+
+
+def test_email_store_and_records_give_the_same_report(tmp_path):
+    records_path = _write_jsonl(tmp_path / "generated_emails.jsonl", EMAILS)
+    store_path = export_emails(records_path)
+
+    with ColumnarStore(store_path) as store:
+        assert store.kind == "emails" and len(store) == 3
+        assert np.isnan(store["match_score"][2])
+        assert store.skill_counts(store["match_score"] >= 50) == {"Python": 1, "SQL": 1}
+
+    from_records = analyze_email_results(str(records_path))
+    from_store = analyze_email_results(str(store_path))
+
+    assert from_store["skill_statistics"] == from_records["skill_statistics"] == {"Python": 2, "SQL": 1}
+    assert from_store["match_score_statistics"] == from_records["match_score_statistics"]
+    assert from_store["match_scores"] == from_records["match_scores"] == [85.0, 45.5, 0.0]
+
+
+def test_timestamps_with_an_offset_are_stored_in_utc(tmp_path):
+    records_path = _write_jsonl(tmp_path / "generated_emails.jsonl", [
+        {"candidate_name": "Ana", "timestamp": "2024-03-01T12:00:00+02:00", "email_data": {}},
+        {"candidate_name": "Ben", "timestamp": "2024-03-01T10:30:00", "email_data": {}},
+        {"candidate_name": "Cem", "email_data": {}},
+    ])
+
+    with ColumnarStore(export_emails(records_path)) as store:
+        timestamps = store["timestamp"]
+        assert timestamps[0] == np.datetime64("2024-03-01T10:00:00")
+        assert timestamps[1] == np.datetime64("2024-03-01T10:30:00")
+        assert np.isnat(timestamps[2])
@@ -0,0 +1,51 @@
+from app_parsing.services.compact_schema import COMPACT_LAYOUT, CompactSchema
+
+FULL_RECORD = {
+    "Full Name": "Jane Doe",
+    "Professional Title": "Data Engineer",
+    "Contact Information": {"Email": "jane@example.com", "Phone": "+33 6 12 34 56 78", "LinkedIn": None,
+                            "Location": "Paris"},
+    "Professional Summary": {"Executive Summary": "Builds pipelines.", "Years of Experience": 6,
+                             "Industry Focus": ["Fintech"]},
+    "Work Experience": [{
+        "Title": "Data Engineer", "Company": "Acme", "Location": "Paris",
+        "Period": {"Start Date": "2019-01", "End Date": "Present"},
+        "Achievements": ["Cut batch time by half"], "Technologies Used": ["Python", "Airflow"],
+        "Management Scope": {"Team Size": 3, "Budget Responsibility": None}
+    }],
+    "Education": [{"Degree": "MSc", "Field of Study": "CS", "Institution": "EPITA", "Location": "Paris",
+                   "Graduation Date": "2018", "GPA": None}],
+    "Skills": {"Technical Skills": ["Python", "SQL"], "Soft Skills": ["Mentoring"],
+               "Languages": [{"Language": "French", "Proficiency": "Native"}]},
+    "Certifications": [],
+    "HR Evaluation": {"Key Strengths": ["Ownership"], "Potential Roles": ["Lead"], "Seniority Level": "Senior",
+                      "Cultural Indicators": [], "Development Areas": ["Public speaking"]}
+}
+
+
+def test_compress_then_expand_gives_the_record_back():
+    compact = CompactSchema.compress(FULL_RECORD)
+    assert set(compact) == {short for short, _, _ in COMPACT_LAYOUT}
+    assert compact["w"][0][3:5] == ["2019-01", "Present"]
+    assert CompactSchema.expand(compact) == FULL_RECORD
+
+
+def test_expand_fills_missing_values():
+    expanded = CompactSchema.expand({"n": "Jane Doe", "w": [["Engineer"]], "k": [["Python"]]})
+    assert expanded["Full Name"] == "Jane Doe"
+    assert expanded["Professional Title"] is None
+    assert expanded["Work Experience"][0]["Period"] == {"Start Date": None, "End Date": None}
+    assert expanded["Work Experience"][0]["Achievements"] == []
+    assert expanded["Skills"] == {"Technical Skills": ["Python"], "Soft Skills": [], "Languages": []}
+    assert expanded["Certifications"] == []
+
+
+def test_expand_leaves_full_answers_alone():
+    assert CompactSchema.expand(FULL_RECORD) is FULL_RECORD
+
+
+def test_response_format_depends_on_the_model():
+    schema = CompactSchema()
+    assert schema.response_format("gpt-4o-mini")["type"] == "json_schema"
+    assert schema.response_format("gpt-3.5-turbo") == {"type": "json_object"}
+    assert schema.response_format("some-local-model") is None
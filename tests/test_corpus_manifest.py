@@ -0,0 +1,70 @@
+import json
+
+from app_parsing.services.corpus_manifest import CorpusManifest, merge_parsed_resumes
+
+
+def _record(path, success=True):
+    return {"Full Name": path.stem, "_metadata": {"source_path": str(path), "filename": path.name,
+                                                  "file_type": path.suffix, "success": success}}
+
+
+def test_scan_reports_added_changed_deleted_and_unchanged(tmp_path):
+    resumes = tmp_path / "resumes"
+    resumes.mkdir()
+    (resumes / "keep.txt").write_text("keep")
+    (resumes / "edit.txt").write_text("before")
+    (resumes / "gone.txt").write_text("gone")
+    (resumes / "notes.csv").write_text("not a resume")
+    manifest = CorpusManifest(tmp_path / "manifest.json")
+
+    first = manifest.scan(resumes)
+    assert sorted(first.added) == sorted(str(resumes / name) for name in ("keep.txt", "edit.txt", "gone.txt"))
+    manifest.apply(first, [_record(resumes / name) for name in ("keep.txt", "edit.txt", "gone.txt")])
+    manifest.save()
+
+    (resumes / "edit.txt").write_text("after, longer")
+    (resumes / "gone.txt").unlink()
+    (resumes / "new.txt").write_text("new")
+    second = CorpusManifest(tmp_path / "manifest.json").scan(resumes)
+
+    assert second.added == [str(resumes / "new.txt")]
+    assert second.changed == [str(resumes / "edit.txt")]
+    assert second.deleted == [str(resumes / "gone.txt")]
+    assert second.unchanged == 1
+
+
+def test_failed_parses_are_scanned_again(tmp_path):
+    (tmp_path / "cv.txt").write_text("cv")
+    manifest = CorpusManifest(tmp_path / "manifest.json")
+    diff = manifest.scan(tmp_path)
+    manifest.apply(diff, [_record(tmp_path / "cv.txt", success=False)])
+
+    assert manifest.scan(tmp_path).added == [str(tmp_path / "cv.txt")]
+
+
+def test_merge_replaces_changed_and_drops_deleted_records(tmp_path):
+    resumes = tmp_path / "resumes"
+    resumes.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (resumes / name).write_text(name)
+    output = tmp_path / "parsed_resumes.json"
+    manifest = CorpusManifest(tmp_path / "manifest.json")
+    diff = manifest.scan(resumes)
+    merge_parsed_resumes(output, {"resumes": [_record(resumes / name) for name in ("a.txt", "b.txt", "c.txt")]},
+                         diff)
+    manifest.apply(diff, json.loads(output.read_text())["resumes"])
+
+    (resumes / "b.txt").write_text("b, edited")
+    (resumes / "c.txt").unlink()
+    diff = manifest.scan(resumes)
+    fresh = _record(resumes / "b.txt", success=False)
+    merged = merge_parsed_resumes(output, {"resumes": [fresh], "statistics": {"processing_time_seconds": 1.5}},
+                                  diff)
+
+    paths = [record["_metadata"]["source_path"] for record in merged["resumes"]]
+    assert paths == [str(resumes / "a.txt"), str(resumes / "b.txt")]
+    statistics = merged["statistics"]
+    assert (statistics["total_processed"], statistics["successful"], statistics["failed"]) == (2, 1, 1)
+    assert statistics["processing_time_seconds"] == 1.5
+    assert statistics["incremental"]["deleted"] == 1
+    assert json.loads(output.read_text()) == merged
@@ -0,0 +1,79 @@
+import os
+import time
+
+from app_parsing.services.disk_cache import DiskCache
+
+
+def test_get_returns_stored_value_and_counts_hits_and_misses(tmp_path):
+    cache = DiskCache(tmp_path)
+    assert cache.get("ab12") is None
+    cache.put("ab12", {"Full Name": "Jane Doe"})
+
+    assert cache.get("ab12") == {"Full Name": "Jane Doe"}
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entries_survive_a_new_instance(tmp_path):
+    DiskCache(tmp_path).put("ab12", [1, 2, 3])
+    assert DiskCache(tmp_path).get("ab12") == [1, 2, 3]
+
+
+def test_unreadable_entry_is_a_miss_and_is_dropped(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.put("ab12", {"a": 1})
+    path = cache._entry_path("ab12")
+    path.write_text("{not json")
+
+    assert cache.get("ab12") is None
+    assert not path.exists()
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_expiry_counts_from_the_write_not_the_last_read(tmp_path):
+    cache = DiskCache(tmp_path, max_age_days=1)
+    cache.put("ab12", {"a": 1})
+    path = cache._entry_path("ab12")
+    written = time.time() - 2 * 86400
+    os.utime(path, (time.time(), written))
+
+    assert cache.get("ab12") is None
+    assert not path.exists()
+
+
+def test_reads_keep_the_write_time(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.put("ab12", {"a": 1})
+    path = cache._entry_path("ab12")
+    written = time.time() - 3600
+    os.utime(path, (written, written))
+
+    cache.get("ab12")
+    stat = path.stat()
+    assert stat.st_mtime == written
+    assert stat.st_atime > written
+
+
+def test_eviction_removes_the_least_recently_read_entries(tmp_path):
+    cache = DiskCache(tmp_path, max_size_mb=0.002)
+    cache.put("aa01", {"x": "y" * 300})
+    cache.put("aa02", {"x": "y" * 300})
+    now = time.time()
+    os.utime(cache._entry_path("aa01"), (now - 100, now - 100))
+    os.utime(cache._entry_path("aa02"), (now - 50, now - 50))
+    # Reading the older entry makes the other one the least recently used
+    cache.get("aa01")
+
+    cache.put("aa03", {"x": "y" * 1530})
+
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get("aa02") is None
+    assert cache.get("aa01") is not None
+    assert cache.get_stats()["size_bytes"] <= cache.max_size_bytes
+
+
+def test_no_temporary_files_are_left_behind(tmp_path):
+    cache = DiskCache(tmp_path)
+    for index in range(5):
+        cache.put("ab12", {"version": index})
+    assert [path.name for path in (tmp_path / "ab").iterdir()] == ["ab12.json"]
@@ -0,0 +1,45 @@
+from app_parsing.services.fast_extractor import AhoCorasick, FastExtractor
+
+
+def test_automaton_finds_overlapping_patterns():
+    found = sorted(AhoCorasick(["he", "she", "his", "hers"]).find_all("ushers"))
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_skills_are_whole_words_and_longest_first():
+    skills = FastExtractor()._find_skills("JavaScript, Java and C++ on Spring Boot; also c#, Node.js and Go.")
+    assert skills == ["JavaScript", "Java", "C++", "Spring Boot", "C#", "Node.js"]
+
+
+def test_skills_are_returned_once_with_their_canonical_name():
+    assert FastExtractor()._find_skills("python, PYTHON and Python") == ["Python"]
+
+
+def test_ambiguous_words_and_acronyms_need_their_exact_case():
+    extractor = FastExtractor()
+    assert extractor._find_skills("I react quickly and help the rest of the team; sap the budget") == []
+    assert extractor._find_skills("Built REST APIs with React and SAP") == ["REST", "React", "SAP"]
+
+
+def test_custom_lexicon(tmp_path):
+    lexicon = tmp_path / "skills.txt"
+    lexicon.write_text("# internal tools\nFooDB\nbar-ml\n")
+    extractor = FastExtractor.from_file(lexicon)
+    assert extractor._find_skills("Migrated foodb to Bar-ML") == ["FooDB", "bar-ml"]
+    assert extractor.signature != FastExtractor().signature
+
+
+def test_extract_contact_fields():
+    fields = FastExtractor().extract(
+        "Jane Doe\njane.doe@example.com | +33 6 12 34 56 78 | linkedin.com/in/janedoe\n2015 - 2019 Python"
+    )
+    assert fields == {"Email": "jane.doe@example.com", "Phone": "+33 6 12 34 56 78",
+                      "LinkedIn": "linkedin.com/in/janedoe", "Technical Skills": ["Python"]}
+
+
+def test_merge_keeps_local_fields_and_adds_model_skills():
+    parsed = {"Contact Information": {"Email": "wrong@example.com", "Location": "Paris"},
+              "Skills": {"Technical Skills": ["python", "Kubernetes"]}}
+    merged = FastExtractor.merge(parsed, {"Email": "jane@example.com", "Technical Skills": ["Python"]})
+    assert merged["Contact Information"] == {"Email": "jane@example.com", "Location": "Paris"}
+    assert merged["Skills"]["Technical Skills"] == ["Python", "Kubernetes"]
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from app_parsing.utils.json_repair import loads_repaired, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Here is the result:\n{"a": 1}\nHope this helps!', {"a": 1}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": True, "b": False, "c": None}', {"a": True, "b": False, "c": None}),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ('{"a": "brace } and \\" quote", "b": 1}', {"a": 'brace } and " quote', "b": 1}),
+])
+def test_repairs_common_defects(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": "unfinished str', {"a": "unfinished str"}),
+    ('{"a": 1, "b":', {"a": 1, "b": None}),
+    ('{"a": 1, "b": tr', {"a": 1}),
+    ('```json\n{"a": [1]', {"a": [1]}),
+])
+def test_closes_truncated_answers(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_loads_repaired_reports_whether_a_repair_was_needed():
+    assert loads_repaired('{"a": 1}') == ({"a": 1}, False)
+    assert loads_repaired('{"a": 1,}') == ({"a": 1}, True)
+
+
+def test_hopeless_text_still_fails():
+    with pytest.raises(json.JSONDecodeError):
+        loads_repaired("no json here")
@@ -0,0 +1,116 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from app_parsing.services.email_personalizer import EmailPersonalizer
+from app_parsing.services.match_scoring import CandidateMatrix, SkillIndex, match_roles
+
+SKILLS = ["Python", "SQL", "AWS", "Docker", "React", "Kafka", "Excel", "Leadership"]
+TITLES = ["Data Engineer", "Senior Backend Developer", "Data Analyst", "Product Manager"]
+INDUSTRIES = ["Fintech", "Healthcare", "Retail", "Software"]
+ROLES = [
+    {"title": "Data Engineer", "industry": "fintech",
+     "requirements": {"must_have": ["Python", "SQL"], "nice_to_have": ["AWS", "Kafka"], "experience_level": "3+ years"}},
+    {"title": "Backend Developer", "industry": "software",
+     "requirements": {"must_have": ["Docker"], "nice_to_have": [], "experience_level": "Senior (5+ years)"}},
+    {"title": "Analyst", "industry": "retail", "requirements": {"must_have": [], "nice_to_have": ["Excel"]}},
+    {"title": "Rust Developer", "requirements": {"must_have": ["Rust"]}},
+]
+
+
+def _candidates(count=300, seed=7):
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(count):
+        candidate = {
+            "Skills": {"Technical Skills": rng.sample(SKILLS, rng.randint(0, 4)),
+                       "Soft Skills": rng.sample(["Leadership", "python"], rng.randint(0, 1))},
+            "Professional Summary": {"Years of Experience": rng.choice([0, 1, 3, 5.5, 8, "12"])},
+            "Professional Title": rng.choice(TITLES),
+            "Work Experience": [{"Company Industry": rng.choice(INDUSTRIES)} for _ in range(rng.randint(0, 3))]
+        }
+        # Malformed parses that calculate_match_score turns into a zero score
+        defect = rng.random()
+        if defect < 0.03:
+            candidate["Skills"] = "Python, SQL"
+        elif defect < 0.06:
+            candidate["Professional Summary"]["Years of Experience"] = "ten"
+        elif defect < 0.09:
+            candidate["Work Experience"].insert(0, None)
+        candidates.append(candidate)
+    return candidates
+
+
+@pytest.fixture(scope="module")
+def personalizer():
+    return EmailPersonalizer(api_key="test-key")
+
+
+def test_scores_match_calculate_match_score(personalizer):
+    candidates = _candidates()
+    matrix = CandidateMatrix(candidates)
+    for role in ROLES:
+        role_scores = matrix.score_role(role)
+        for index, candidate in enumerate(candidates):
+            expected = personalizer.calculate_match_score(candidate, role)
+            result = matrix.match_result(role_scores, index)
+            assert result["total_score"] == expected["total_score"]
+            assert result["breakdown"] == expected["breakdown"]
+            assert sorted(result["matching_skills"]) == sorted(expected["matching_skills"])
+            assert sorted(result["bonus_skills"]) == sorted(expected["bonus_skills"])
+
+
+def test_scoring_some_rows_matches_scoring_all_of_them():
+    matrix = CandidateMatrix(_candidates())
+    rows = np.arange(0, len(matrix), 3)
+    for role in ROLES:
+        full, partial = matrix.score_role(role), matrix.score_role(role, rows)
+        np.testing.assert_array_equal(partial.total, full.total[rows])
+        np.testing.assert_array_equal(partial.valid, full.valid[rows])
+        assert matrix.match_result(partial, 9) == matrix.match_result(full, 9)
+
+
+def test_match_roles_only_ranks_candidates_with_a_must_have_skill(personalizer):
+    candidates = _candidates()
+    matrix = CandidateMatrix(candidates)
+    results = match_roles(matrix, ROLES, top_k=5, index=SkillIndex(matrix))
+
+    data_engineer = results[0]
+    expected_eligible = [index for index, candidate in enumerate(candidates)
+                         if isinstance(candidate["Skills"], dict)
+                         and {"python", "sql"} & {skill.lower() for kind in candidate["Skills"].values()
+                                                  for skill in kind}]
+    assert data_engineer["eligible"] == len(expected_eligible)
+    scores = [match["total_score"] for _, match in data_engineer["matches"]]
+    assert scores == sorted(scores, reverse=True)
+    best = max(personalizer.calculate_match_score(candidates[index], ROLES[0])["total_score"]
+               for index in expected_eligible)
+    assert scores[0] == best
+
+    assert results[2]["eligible"] == len(candidates)
+    assert results[3] == {"role": ROLES[3], "eligible": 0, "matches": []}
+
+
+def test_process_roles_skips_incomplete_candidates(personalizer, tmp_path):
+    def candidate(name, skills, title="Data Engineer"):
+        return {"Full Name": name, "Professional Title": title,
+                "Skills": {"Technical Skills": skills},
+                "Professional Summary": {"Years of Experience": 6},
+                "Work Experience": [{"Company Industry": "Fintech"}],
+                "_metadata": {"success": True, "source_path": f"{name or 'unnamed'}.pdf"}}
+
+    cvs = [candidate("Strong", ["Python", "SQL", "AWS", "Kafka"]),
+           candidate("Good", ["Python", "SQL"]),
+           candidate("", ["Python", "SQL", "AWS", "Kafka"], title="Senior Data Engineer")]
+    cv_file = tmp_path / "parsed_resumes.json"
+    cv_file.write_text(json.dumps({"resumes": cvs}))
+
+    output = personalizer.process_roles(str(cv_file), ROLES[:1], top_k=2, output_dir=str(tmp_path),
+                                        generate_emails=False)
+
+    data = json.loads(output.read_text())
+    assert [entry["candidate_name"] for entry in data["roles"][0]["top_candidates"]] == ["Strong", "Good"]
+    assert data["statistics"]["candidates"] == 2
+    assert data["statistics"]["incomplete_candidates"] == 1
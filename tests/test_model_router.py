@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app_parsing.services.api_tracker import APIUsageTracker
+from app_parsing.services.model_router import ModelRouter
+from app_parsing.services.resume_processor import parse_single_resume
+
+VALID_ANSWER = {"Full Name": "Jane Doe", "Contact Information": {}, "Professional Summary": {},
+                "Work Experience": [], "Education": [], "Skills": {"Technical Skills": ["Python"]}}
+
+
+class FakeClient:
+    """Chat completions client answering from a list, recording the models asked."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, **kwargs):
+        self.models.append(model)
+        content = self.answers.pop(0)
+        return SimpleNamespace(
+            model=model,
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def _parse(client, router):
+    return parse_single_resume({"file_path": Path("jane.txt"), "client": client, "api_tracker": APIUsageTracker(),
+                                "router": router, "resume_text": "Jane Doe, Python developer"})
+
+
+def test_routes_by_input_size():
+    router = ModelRouter()
+    assert router.models_for("parse", 500) == ["gpt-4o-mini", "gpt-4o"]
+    assert router.models_for("parse", 50_000) == ["gpt-4o"]
+
+
+def test_last_route_must_match_everything():
+    with pytest.raises(ValueError):
+        ModelRouter({"parse": {"routes": [{"max_input_tokens": 1000, "model": "gpt-4o-mini"}]}})
+
+
+def test_invalid_answer_is_escalated_to_the_stronger_model():
+    router = ModelRouter()
+    client = FakeClient([json.dumps({"Full Name": "", "Skills": []}), json.dumps(VALID_ANSWER)])
+
+    record = _parse(client, router)
+
+    assert client.models == ["gpt-4o-mini", "gpt-4o"]
+    metadata = record["_metadata"]
+    assert metadata["success"] and metadata["model"] == "gpt-4o"
+    assert metadata["escalated_from"] == ["gpt-4o-mini"]
+    assert metadata["api_calls"] == 2
+    stats = router.get_stats()["parse"]
+    assert stats["escalations"] == 1
+    assert stats["models"]["gpt-4o-mini"]["valid"] == 0
+    assert stats["models"]["gpt-4o"]["valid"] == 1
+
+
+def test_valid_answer_is_not_escalated():
+    router = ModelRouter()
+    client = FakeClient([json.dumps(VALID_ANSWER)])
+
+    record = _parse(client, router)
+
+    assert client.models == ["gpt-4o-mini"]
+    assert "escalated_from" not in record["_metadata"]
+    assert router.get_stats()["parse"]["escalations"] == 0
+
+
+def test_merged_routers_add_up():
+    first, second = ModelRouter(), ModelRouter()
+    first.record("parse", "gpt-4o-mini", True, 0.5)
+    second.record("parse", "gpt-4o-mini", False, 1.5)
+    second.record_escalation("parse")
+
+    merged = ModelRouter.from_dict(first.to_dict())
+    merged.merge(second)
+
+    stats = merged.get_stats()["parse"]
+    assert stats["escalations"] == 1
+    assert stats["models"]["gpt-4o-mini"]["answers"] == 2
+    assert stats["models"]["gpt-4o-mini"]["valid"] == 1
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app_parsing.services import rate_limiter
+from app_parsing.services.rate_limiter import AsyncRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # Real sleeps overshoot a little; an exact one can leave a float-sized debt
+        self.now += seconds + 1e-6
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def _requests_in(limiter, clock, seconds, tokens=10):
+    """Acquires back to back for ``seconds`` of fake time, returns how many got through."""
+    async def run():
+        end = clock.now + seconds
+        count = 0
+        while True:
+            await limiter.acquire(tokens)
+            if clock.now > end:
+                return count
+            limiter.settle(tokens, tokens)
+            count += 1
+    return asyncio.run(run())
+
+
+def test_bucket_refills_at_the_reduced_rate(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    bucket.set_rate_factor(0.5)
+    clock.now += 10
+
+    assert bucket.level == pytest.approx(0)
+    assert bucket.wait_time(10) == pytest.approx(10)
+    assert bucket.level == pytest.approx(5)
+
+
+def test_throughput_drops_after_429_and_recovers_after_successes(clock):
+    limiter = AsyncRateLimiter(rpm=600, tpm=1_000_000)
+    limiter.RECOVERY_STEP = 0.0
+    _requests_in(limiter, clock, 60)
+    nominal = _requests_in(limiter, clock, 60)
+
+    limiter.on_rate_limited(retry_after=0)
+    limiter.on_rate_limited(retry_after=0)
+    assert limiter.rate_factor == pytest.approx(0.25)
+    throttled = _requests_in(limiter, clock, 60)
+
+    assert nominal == pytest.approx(600, abs=2)
+    assert throttled == pytest.approx(150, abs=2)
+
+    limiter.RECOVERY_STEP = 0.05
+    _requests_in(limiter, clock, 60)
+    assert limiter.rate_factor == 1.0
+    assert _requests_in(limiter, clock, 60) == pytest.approx(600, abs=2)
+
+
+def test_release_does_not_restore_the_rate(clock):
+    limiter = AsyncRateLimiter(rpm=60, tpm=1000)
+    limiter.on_rate_limited(retry_after=0)
+    asyncio.run(limiter.acquire(100))
+    limiter.release(100)
+
+    assert limiter.rate_factor == 0.5
+    assert limiter.tokens.level == pytest.approx(1000)
+    assert limiter.get_stats()["rate_limited_responses"] == 1
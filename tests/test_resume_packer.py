@@ -0,0 +1,112 @@
+import json
+import re
+from pathlib import Path
+from types import SimpleNamespace
+
+from app_parsing.services import resume_packer
+from app_parsing.services.api_tracker import APIUsageTracker
+from app_parsing.services.resume_packer import (
+    PackItem, ResumePacker, build_packs, parse_packed_response, split_usage
+)
+
+
+def _items(*tokens):
+    return [PackItem(Path(f"cv{index}.txt"), "text", count) for index, count in enumerate(tokens)]
+
+
+def test_packs_respect_the_token_budget_and_keep_order():
+    packs = build_packs(_items(400, 300, 200, 500, 100), token_budget=1000, max_pack_size=10)
+    assert [[item.tokens for item in pack] for pack in packs] == [[400, 300, 200], [500, 100]]
+
+
+def test_packs_respect_the_pack_size():
+    packs = build_packs(_items(1, 1, 1, 1, 1), token_budget=1000, max_pack_size=2)
+    assert [len(pack) for pack in packs] == [2, 2, 1]
+
+
+def test_resume_over_the_budget_gets_its_own_pack():
+    packs = build_packs(_items(100, 5000, 100), token_budget=1000, max_pack_size=10)
+    assert [[item.tokens for item in pack] for pack in packs] == [[100], [5000], [100]]
+
+
+def test_split_usage_adds_up_to_the_request():
+    usage = {"tokens_used": 1001, "input_tokens": 700, "output_tokens": 301, "api_calls": 1}
+    shares = split_usage(usage, [1, 2, 0])
+
+    for key in ("tokens_used", "input_tokens", "output_tokens", "api_calls"):
+        assert sum(share[key] for share in shares) == usage[key]
+    assert [share["api_calls"] for share in shares] == [1, 0, 0]
+    assert shares[1]["input_tokens"] == 2 * shares[2]["input_tokens"]
+
+
+def test_split_usage_counts_empty_resumes_as_weight_one():
+    usage = {"tokens_used": 400, "input_tokens": 400, "output_tokens": 0, "api_calls": 1}
+    shares = split_usage(usage, [0, 3, 0])
+
+    assert [share["input_tokens"] for share in shares] == [80, 240, 80]
+
+
+def test_packed_response_is_split_by_resume_id():
+    content = json.dumps([{"resume_id": 0, "data": {"Full Name": "A"}},
+                          {"resume_id": 1, "data": {"Full Name": "B"}},
+                          {"resume_id": 2, "data": {}}])
+    assert parse_packed_response(content) == {"0": {"Full Name": "A"}, "1": {"Full Name": "B"}}
+
+
+def test_packed_response_wrapped_in_an_object():
+    content = json.dumps({"resumes": [{"resume_id": "7", "data": {"Full Name": "A"}}]})
+    assert parse_packed_response(content) == {"7": {"Full Name": "A"}}
+
+
+def test_truncated_packed_response_drops_the_cut_element():
+    content = ('```json\n[{"resume_id": 0, "data": {"Full Name": "A"}},'
+               ' {"resume_id": 1, "data": {"Full Name": "B", "Skills": {"Technical Skills": ["Py')
+    assert parse_packed_response(content) == {"0": {"Full Name": "A"}}
+
+
+class PackingClient:
+    """Answers a packed request with one parsed resume per resume id in the prompt."""
+
+    def __init__(self, extracted):
+        self.extracted = extracted
+        self.extracted_at_request = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.extracted_at_request.append(len(self.extracted))
+        ids = re.findall(r"=== RESUME (\d+) ===", messages[0]["content"])
+        content = json.dumps([{"resume_id": id_, "data": {"Full Name": f"Candidate {id_}"}} for id_ in ids])
+        return SimpleNamespace(
+            model=model,
+            usage=SimpleNamespace(prompt_tokens=100 * len(ids), completion_tokens=50, total_tokens=100 * len(ids) + 50),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def test_run_streams_extraction_into_packs(tmp_path, monkeypatch):
+    paths = []
+    for index in range(60):
+        path = tmp_path / f"cv{index}.txt"
+        path.write_text(f"Candidate {index}, Python developer")
+        paths.append(path)
+    paths.append(tmp_path / "missing.txt")
+    extracted = []
+
+    def load_resume_text(path):
+        extracted.append(path)
+        return path.read_text()
+
+    monkeypatch.setattr(resume_packer, "load_resume_text", load_resume_text)
+    client = PackingClient(extracted)
+    packer = ResumePacker(token_budget=1000, max_pack_size=2)
+    records = []
+
+    packer.run(paths, {"client": client, "api_tracker": APIUsageTracker()}, records.append, max_workers=2)
+
+    assert len(records) == 61
+    assert sum(record["_metadata"]["success"] for record in records) == 60
+    assert packer.get_stats()["packed_requests"] == 30
+    # Extraction stays a bounded number of resumes ahead of the requests:
+    # 4 packs queued for requests, 8 resumes queued for extraction and the open pack
+    ahead = [count - 2 * index for index, count in enumerate(client.extracted_at_request)]
+    assert max(ahead) <= 4 * 2 + 8 + 2 + 2
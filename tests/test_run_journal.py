@@ -0,0 +1,68 @@
+import pytest
+
+from app_parsing.services.api_tracker import APIUsageTracker
+from app_parsing.services.run_journal import RunJournal
+
+
+def _record(path, success, tokens=0):
+    return {"_metadata": {"source_path": path, "success": success, "model": "gpt-4o-mini",
+                          "input_tokens": tokens, "output_tokens": tokens, "tokens_used": 2 * tokens,
+                          "api_calls": 1 if tokens else 0}}
+
+
+def test_resumed_run_skips_only_successful_resumes(tmp_path):
+    paths = ["a.txt", "b.txt", "c.txt"]
+    journal = RunJournal.create(tmp_path, paths, {"output_format": "jsonl"})
+    journal.append(_record("a.txt", True, 10))
+    journal.append(_record("b.txt", False, 5))
+    journal.close()
+
+    resumed = RunJournal.open(tmp_path, journal.run_id)
+    assert resumed.cv_file_paths == paths
+    assert resumed.options == {"output_format": "jsonl"}
+    assert resumed.completed == ["a.txt"]
+    assert resumed.pending(paths) == ["b.txt", "c.txt"]
+    assert resumed.session == 1
+
+
+def test_last_entry_of_a_resume_wins(tmp_path):
+    journal = RunJournal.create(tmp_path, ["a.txt"])
+    journal.append(_record("a.txt", False))
+    journal.append(_record("a.txt", True))
+    journal.close()
+
+    resumed = RunJournal.open(tmp_path, journal.run_id)
+    assert resumed.pending(["a.txt"]) == []
+    assert [record["_metadata"]["success"] for record in resumed.iter_completed_records()] == [True]
+
+
+def test_torn_last_line_is_discarded(tmp_path):
+    journal = RunJournal.create(tmp_path, ["a.txt", "b.txt"])
+    journal.append(_record("a.txt", True))
+    journal.close()
+    with (journal.run_dir / RunJournal.JOURNAL_FILE).open("a") as f:
+        f.write('{"path": "b.txt", "record": {"_meta')
+
+    resumed = RunJournal.open(tmp_path, journal.run_id)
+    assert resumed.completed == ["a.txt"]
+    resumed.append(_record("b.txt", True))
+    resumed.close()
+    assert sorted(RunJournal.open(tmp_path, journal.run_id).completed) == ["a.txt", "b.txt"]
+
+
+def test_replay_usage_counts_every_paid_attempt(tmp_path):
+    journal = RunJournal.create(tmp_path, ["a.txt", "b.txt"])
+    journal.append(_record("a.txt", False, 5))
+    journal.append(_record("a.txt", True, 10))
+    journal.append(_record("b.txt", True))
+    journal.close()
+
+    tracker = APIUsageTracker()
+    RunJournal.open(tmp_path, journal.run_id).replay_usage(tracker)
+    assert tracker.total_calls == 2
+    assert tracker.input_tokens == 15
+
+
+def test_open_unknown_run_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RunJournal.open(tmp_path, "missing")
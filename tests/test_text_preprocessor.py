@@ -0,0 +1,29 @@
+from app_parsing.services.document_loader import DocumentLoader
+from app_parsing.services.text_preprocessor import TextPreprocessor
+
+
+def _pages(*pages):
+    return DocumentLoader.PAGE_BREAK.join("\n".join(lines) for lines in pages)
+
+
+def test_page_numbers_and_repeated_footers_are_dropped_at_page_edges():
+    text = _pages(
+        ["Jane Doe", "Experience", "Built data pipelines", "Jane Doe - Resume", "1"],
+        ["Python, SQL", "Led a team of engineers", "Jane Doe - Resume", "Page 2 of 3"],
+        ["Education", "MSc Computer Science", "Jane Doe - Resume", "3/3"],
+    )
+
+    cleaned, _ = TextPreprocessor().process(text)
+
+    assert "Jane Doe - Resume" not in cleaned
+    assert "Page 2 of 3" not in cleaned
+    assert "3/3" not in cleaned.splitlines()
+    assert "Jane Doe" in cleaned.splitlines()
+
+
+def test_numbers_in_the_page_body_are_kept():
+    body = ["Jane Doe", "Summary", "Team size", "12", "Projects delivered", "5", "Years", "7", "Skills", "Python"]
+
+    cleaned, _ = TextPreprocessor().process(_pages(body))
+
+    assert cleaned.splitlines()[3:6] == ["12", "Projects delivered", "5"]
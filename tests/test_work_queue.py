@@ -0,0 +1,78 @@
+import pytest
+
+from app_parsing.services.resume_processor import _failure_record
+from app_parsing.services.work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with WorkQueue(tmp_path / "queue.db", max_attempts=2) as work_queue:
+        yield work_queue
+
+
+def _paths(tmp_path, *names):
+    return [str(tmp_path / name) for name in names]
+
+
+def _record(path, success=True):
+    return {"_metadata": {"source_path": path, "success": success}}
+
+
+def test_enqueue_skips_queued_resumes(queue, tmp_path):
+    assert queue.enqueue(_paths(tmp_path, "a.txt", "b.txt")) == {"added": 2, "requeued": 0, "skipped": 0}
+    assert queue.enqueue(_paths(tmp_path, "a.txt", "c.txt")) == {"added": 1, "requeued": 0, "skipped": 1}
+
+
+def test_leased_items_are_hidden_from_other_workers(queue, tmp_path):
+    queue.enqueue(_paths(tmp_path, "a.txt", "b.txt", "c.txt"))
+
+    first = queue.lease("w1", 2, visibility_timeout=60)
+    second = queue.lease("w2", 2, visibility_timeout=60)
+
+    assert [path for _, path in first] == _paths(tmp_path, "a.txt", "b.txt")
+    assert [path for _, path in second] == _paths(tmp_path, "c.txt")
+    assert queue.lease("w3", 2, visibility_timeout=60) == []
+    assert queue.get_stats()["leased"] == 3
+
+
+def test_expired_lease_goes_back_to_the_queue(queue, tmp_path):
+    queue.enqueue(_paths(tmp_path, "a.txt"))
+    [(item_id, _)] = queue.lease("w1", 1, visibility_timeout=-1)
+
+    assert queue.lease("w2", 1, visibility_timeout=60) == [(item_id, _paths(tmp_path, "a.txt")[0])]
+    # The first worker lost its lease: it can neither renew it nor overwrite the result
+    assert queue.renew([item_id], "w1", 60) == 0
+    assert queue.complete(item_id, _record("a.txt"))
+    assert not queue.complete(item_id, _record("a.txt", success=False))
+    assert [record["_metadata"]["success"] for record in queue.iter_records()] == [True]
+
+
+def test_item_is_given_up_after_max_attempts(queue, tmp_path):
+    queue.enqueue(_paths(tmp_path, "a.txt"))
+    queue.lease("w1", 1, visibility_timeout=-1)
+    queue.lease("w2", 1, visibility_timeout=-1)
+
+    assert queue.lease("w3", 1, visibility_timeout=60) == []
+    assert not queue.has_unfinished()
+    [record] = queue.iter_records()
+    assert not record["_metadata"]["success"]
+    assert "Lease expired 2 times" in record["_metadata"]["error"]
+    assert queue.get_stats()["failed"] == 1
+
+
+def test_release_does_not_use_an_attempt(queue, tmp_path):
+    queue.enqueue(_paths(tmp_path, "a.txt"))
+    for _ in range(3):
+        [(item_id, _)] = queue.lease("w1", 1, visibility_timeout=60)
+        queue.release([item_id], "w1")
+    assert queue.lease("w1", 1, visibility_timeout=60) == [(item_id, _paths(tmp_path, "a.txt")[0])]
+
+
+def test_failed_resume_is_requeued_on_enqueue(queue, tmp_path):
+    [path] = _paths(tmp_path, "a.txt")
+    queue.enqueue([path])
+    [(item_id, _)] = queue.lease("w1", 1, visibility_timeout=60)
+    queue.complete(item_id, _failure_record(tmp_path / "a.txt", ValueError("unreadable")))
+
+    assert queue.enqueue([path]) == {"added": 0, "requeued": 1, "skipped": 0}
+    assert queue.lease("w1", 1, visibility_timeout=60) == [(item_id, path)]